@@ -1,26 +1,25 @@
 from django.contrib import admin
-from django.utils.html import format_html
-import json
-from .models import DocumentoLN
+from django.utils.html import format_html, format_html_join
+from .models import DocumentoLN, CorpusGlobalLN
 @admin.register(DocumentoLN)
 class DocumentoLNAdmin(admin.ModelAdmin):
-    list_display = ("id", "nombre_original", "created_at", "top10")
-    search_fields = ("nombre_original", "archivo")
-    readonly_fields = ("created_at", "tokens_preview", "top_json", "top_html")
+    # Las columnas son campos indexados (se ordenan en SQL); top10 lee el JSONField ya decodificado
+    list_display = ("id", "nombre_original", "created_at", "num_tokens", "vocabulario", "termino_top", "top10")
+    list_filter = ("created_at",)
+    search_fields = ("nombre_original", "archivo", "=termino_top", "=sha256")
+    readonly_fields = ("created_at", "sha256", "num_tokens", "vocabulario", "termino_top", "tokens_preview", "top_html")
+    exclude = ("estadisticas",)
     def top10(self, obj):
-        try:
-            top = json.loads(obj.top_json or "[]")[:10]
-        except Exception:
-            top = []
+        top = obj.top[:10]
         return ", ".join(f"{w}:{c}" for w, c in top) if top else "(sin datos)"
     top10.short_description = "Top10"
     def top_html(self, obj):
-        try:
-            top = json.loads(obj.top_json or "[]")
-        except Exception:
-            top = []
-        if not top:
+        if not obj.top:
             return "(sin datos)"
-        rows = "".join(f"<tr><td>{i+1}</td><td>{w}</td><td>{c}</td></tr>" for i,(w,c) in enumerate(top))
+        rows = format_html_join("", "<tr><td>{}</td><td>{}</td><td>{}</td></tr>", ((i + 1, w, c) for i, (w, c) in enumerate(obj.top)))
         return format_html('<table style="border-collapse:collapse"><thead><tr><th>#</th><th>Palabra</th><th>Frecuencia</th></tr></thead><tbody>{}</tbody></table>', rows)
     top_html.short_description = "Top completo (HTML)"
+@admin.register(CorpusGlobalLN)
+class CorpusGlobalLNAdmin(admin.ModelAdmin):
+    list_display = ("tokenizador", "documentos", "num_tokens", "num_tokens_wb", "updated_at")
+    readonly_fields = ("tokenizador", "documentos", "num_tokens", "num_tokens_wb", "updated_at")
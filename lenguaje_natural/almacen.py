@@ -0,0 +1,104 @@
+import hashlib, os, shutil, uuid
+from django.conf import settings
+
+# Almacén direccionado por contenido de los archivos de /lenguaje/: cada
+# contenido distinto se guarda una sola vez como MEDIA_ROOT/blobs/<ab>/<sha256>
+# y los nombres visibles (uploads_lenguaje/<nombre>, last.txt) son enlaces duros
+# al blob. Subir otra vez el mismo corpus no escribe nada nuevo en disco.
+BLOBS_DIR = "blobs"
+
+def sha256_file(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def blob_name(digest: str) -> str:
+    """ Ruta del blob relativa a MEDIA_ROOT (la que guarda DocumentoLN.archivo). """
+    return "/".join((BLOBS_DIR, digest[:2], digest))
+
+def blob_path(digest: str) -> str:
+    return os.path.join(settings.MEDIA_ROOT, BLOBS_DIR, digest[:2], digest)
+
+def _temp_name(path: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+def _link_or_copy(src: str, dest: str):
+    """ Crea `dest` (que no existe) como enlace duro a `src`, o como copia si el sistema de archivos no los admite. """
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def store_upload(uploaded):
+    """
+    Guarda un UploadedFile en el almacén: (sha256, ruta del blob, True si es nuevo).
+    El hash se calcula recorriendo los bloques (en memoria o en el temporal de
+    Django) y el contenido se escribe sólo si no estaba ya; si Django lo dejó en un
+    temporal del mismo sistema de archivos, el blob es un enlace a él (sin copiar).
+    """
+    h = hashlib.sha256()
+    for chunk in uploaded.chunks():
+        h.update(chunk)
+    digest = h.hexdigest()
+    path = blob_path(digest)
+    if os.path.exists(path):
+        return digest, path, False
+    tmp = _temp_name(path)
+    try:
+        try:
+            os.link(uploaded.temporary_file_path(), tmp)
+        except (AttributeError, OSError):
+            with open(tmp, "wb") as dest:
+                for chunk in uploaded.chunks():
+                    dest.write(chunk)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return digest, path, True
+
+def store_file(path: str, digest: str = None):
+    """ Igual que store_upload para un archivo que ya está en disco (enlazado, no copiado, si se puede). """
+    digest = digest or sha256_file(path)
+    blob = blob_path(digest)
+    if os.path.exists(blob):
+        return digest, blob, False
+    tmp = _temp_name(blob)
+    try:
+        _link_or_copy(path, tmp)
+        os.replace(tmp, blob)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return digest, blob, True
+
+def link_file(digest: str, dest: str):
+    """
+    Hace que `dest` apunte al blob `digest` (enlace duro, reemplazado de forma
+    atómica) y anota el hash en `dest`.sha256 para no tener que releerlo.
+    """
+    blob = blob_path(digest)
+    if not (os.path.exists(dest) and os.path.samefile(blob, dest)):
+        tmp = _temp_name(dest)
+        try:
+            _link_or_copy(blob, tmp)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    with open(f"{dest}.sha256", "w", encoding="ascii") as fh:
+        fh.write(digest)
+
+def file_digest(path: str) -> str:
+    """ sha256 de `path`: el anotado por link_file si sigue enlazado a ese blob; si no, se calcula. """
+    try:
+        with open(f"{path}.sha256", encoding="ascii") as fh:
+            digest = fh.read().strip()
+        if digest and os.path.samefile(path, blob_path(digest)):
+            return digest
+    except OSError:
+        pass
+    return sha256_file(path)
@@ -2,3 +2,6 @@ from django.apps import AppConfig
 class LenguajeNaturalConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'lenguaje_natural'
+    def ready(self):
+        # Actualización incremental del corpus global (lenguaje_natural.corpus_global)
+        from . import signals  # noqa: F401
@@ -0,0 +1,216 @@
+import os, threading, time
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Count, Max
+from ngram.services import iter_text_chunks, iter_tokens
+from ngram.tokenizers import get_tokenizer
+from .almacen import file_digest
+from .models import DocumentoLN, IndiceNgramasLN
+
+# Catálogo de corpus de los selectores (autocompletar, MLE): los DocumentoLN y los
+# archivos de MEDIA_ROOT/lenguaje que no son de ningún documento, con su tamaño y
+# número de tokens ya calculados. El listado se construye una vez por proceso y
+# se descarta al guardar o borrar un documento en este proceso
+# (lenguaje_natural.signals), cuando cambia el número o el último id de los
+# documentos (altas y bajas de otros procesos, como el trabajador de la cola; se
+# comprueba como mucho cada STAMP_INTERVAL segundos) y, para archivos copiados a
+# mano, cada LENGUAJE_CATALOGO_TTL segundos. El sha256 y los tokens de esos
+# archivos se guardan entre reconstrucciones y sólo se vuelven a leer si cambian
+# su tamaño o su fecha de modificación.
+
+CARPETA = "lenguaje"
+EXTENSIONES = (".txt", ".csv")
+STAMP_INTERVAL = 1.0
+
+def ttl() -> float:
+    return float(getattr(settings, "LENGUAJE_CATALOGO_TTL", 60))
+
+def corpus_dir() -> str:
+    return os.path.join(settings.MEDIA_ROOT, CARPETA)
+
+
+class CorpusEntry:
+    """
+    Un corpus del catálogo. `key` es el valor del selector: el id del documento o
+    "fs:<ruta relativa a MEDIA_ROOT/lenguaje>". `num_tokens` es None si el
+    documento no tiene índice (el modelo se cuenta la primera vez que se pide).
+    """
+    def __init__(self, key, label, kind, size, num_tokens, sha256, documento_id=None, path=None, created=None):
+        self.key, self.label, self.kind = key, label, kind
+        self.size, self.num_tokens, self.sha256 = size, num_tokens, sha256
+        self.documento_id, self.path, self.created = documento_id, path, created
+
+    def __repr__(self):
+        return f"CorpusEntry({self.key!r}, {self.label!r})"
+
+    @property
+    def indexed(self) -> bool:
+        return self.num_tokens is not None
+
+    def next_word_index(self, n, with_bound=False, modelo="mle"):
+        """
+        Modelo historia -> siguiente palabra (NextWordIndex o SmoothedLM, ver
+        indices.load_next_word_index) listo para consultar, o None si el documento
+        no tiene índice. Lanza DocumentoLN.DoesNotExist si el documento se borró.
+        """
+        from .indices import load_file_next_word_index, load_next_word_index
+        if self.documento_id is not None:
+            doc = DocumentoLN(pk=self.documento_id, sha256=self.sha256)
+            model = load_next_word_index(doc, n, with_bound=with_bound, modelo=modelo)
+            if model is None and not DocumentoLN.objects.filter(pk=self.documento_id).exists():
+                raise DocumentoLN.DoesNotExist(self.documento_id)
+            return model
+        return load_file_next_word_index(self.path, self.sha256, n, with_bound=with_bound, modelo=modelo)
+
+    def ngram_index(self, n=None, tokenizador="simple"):
+        """ Índice de n-gramas (dict): el guardado del documento o, si no hay, el del archivo contado ahora. """
+        from .indices import file_index, load_index
+        if self.documento_id is not None:
+            index = load_index(DocumentoLN(pk=self.documento_id), tokenizador, n)
+            if index is not None:
+                return index
+        return file_index(self.path or DocumentoLN.objects.get(pk=self.documento_id).archivo.path, tokenizador, n)
+
+    def read_text(self) -> str:
+        path = self.path or DocumentoLN.objects.get(pk=self.documento_id).archivo.path
+        with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+            return fh.read()
+
+
+class CorpusCatalog:
+    """ Listado inmutable: entradas (documentos más recientes primero) y alias por clave. """
+    def __init__(self, entries, aliases, built_at, stamp):
+        self.entries, self.built_at, self.stamp = entries, built_at, stamp
+        self.checked_at = built_at
+        self._by_key = {e.key: e for e in entries}
+        self._by_key.update({alias: self._by_key[key] for alias, key in aliases.items()})
+
+    def get(self, key):
+        return self._by_key.get(key)
+
+
+def _label(nombre, fecha, num_tokens):
+    tokens = f"{num_tokens:,} tokens".replace(",", ".") if num_tokens is not None else "sin índice"
+    return f"{nombre} ({fecha:%Y-%m-%d}, {tokens})"
+
+# Archivos sueltos ya leídos: {ruta: ((st_size, st_mtime_ns), sha256, num_tokens)};
+# num_tokens es None hasta que hace falta (los alias de un documento no se cuentan).
+_archivos = {}
+
+def _file_digest(path, firma):
+    hit = _archivos.get(path)
+    if hit is None or hit[0] != firma:
+        hit = _archivos[path] = (firma, file_digest(path), None)
+    return hit[1]
+
+def _file_tokens(path, firma):
+    """ Tokens ("simple") del archivo: los del índice de un documento con el mismo contenido o contados por bloques. """
+    _firma, digest, num_tokens = _archivos[path]
+    if num_tokens is None:
+        from .indices import index_for_file
+        index = index_for_file(path, "simple", digest=digest)
+        if index is not None:
+            num_tokens = index["num_tokens"]
+        else:
+            num_tokens = sum(1 for _ in iter_tokens(iter_text_chunks(path), get_tokenizer("simple")))
+        _archivos[path] = (firma, digest, num_tokens)
+    return num_tokens
+
+def build_catalog() -> CorpusCatalog:
+    """
+    Construye el catálogo: dos consultas y un recorrido de MEDIA_ROOT/lenguaje
+    (sólo se leen los archivos sin documento, y una vez mientras no cambien).
+    """
+    stamp = _stamp()
+    # tokens según el índice "simple", el que usan los modelos de /ngrams/
+    tokens = dict(IndiceNgramasLN.objects.filter(tokenizador="simple").values_list("documento_id", "num_tokens"))
+    entries, aliases, by_file, by_sha = [], {}, {}, {}
+    docs = DocumentoLN.objects.order_by("-created_at", "-id").values_list(
+        "id", "nombre_original", "archivo", "sha256", "created_at")
+    for pk, nombre, archivo, sha256, created in docs:
+        path = os.path.join(settings.MEDIA_ROOT, archivo) if archivo else None
+        try:
+            size = os.path.getsize(path) if path else 0
+        except OSError:
+            size = 0
+        num_tokens = tokens.get(pk)
+        entry = CorpusEntry(str(pk), _label(nombre or os.path.basename(archivo), created, num_tokens), "documento",
+                            size, num_tokens, sha256, documento_id=pk, created=created)
+        entries.append(entry)
+        by_file.setdefault(archivo, entry.key)
+        if sha256 and num_tokens is not None:
+            by_sha.setdefault(sha256, entry.key)
+    # Archivos de MEDIA_ROOT/lenguaje: los que son de un documento (por ruta o por
+    # contenido) son un alias de su entrada; el resto se listan aparte.
+    base = corpus_dir()
+    vistos = set()
+    for root, _dirs, files in os.walk(base):
+        for fname in sorted(files):
+            if not fname.lower().endswith(EXTENSIONES):
+                continue
+            path = os.path.join(root, fname)
+            rel = os.path.relpath(path, base).replace(os.sep, "/")
+            key = f"fs:{rel}"
+            owner = by_file.get(f"{CARPETA}/{rel}")
+            try:
+                st = os.stat(path)
+                firma = (st.st_size, st.st_mtime_ns)
+                digest = None if owner else _file_digest(path, firma)
+                vistos.add(path)
+                owner = owner or by_sha.get(digest)
+                num_tokens = None if owner else _file_tokens(path, firma)
+            except OSError:
+                continue
+            if owner:
+                aliases[key] = owner
+                continue
+            created = datetime.fromtimestamp(st.st_mtime)
+            entries.append(CorpusEntry(key, _label(rel, created, num_tokens), "archivo", st.st_size, num_tokens, digest,
+                                       path=path, created=created))
+    for path in set(_archivos) - vistos:
+        del _archivos[path]
+    return CorpusCatalog(entries, aliases, time.monotonic(), stamp)
+
+_catalog = None
+_lock = threading.Lock()
+
+def _stamp():
+    agg = DocumentoLN.objects.aggregate(num=Count("id"), ultimo=Max("id"))
+    return agg["num"], agg["ultimo"]
+
+def _stale(current) -> bool:
+    now = time.monotonic()
+    if now - current.built_at > ttl():
+        return True
+    if now - current.checked_at > STAMP_INTERVAL:
+        current.checked_at = now
+        return _stamp() != current.stamp
+    return False
+
+def catalog(refresh=False) -> CorpusCatalog:
+    """ El catálogo de este proceso (construido la primera vez y al caducar o invalidarse). """
+    global _catalog
+    current = _catalog
+    if refresh or current is None or _stale(current):
+        with _lock:
+            if _catalog is current:
+                _catalog = build_catalog()
+            current = _catalog
+    return current
+
+def invalidate():
+    """ Descarta el catálogo de este proceso; se reconstruye en la siguiente consulta. """
+    global _catalog
+    _catalog = None
+
+def get(key):
+    """ Entrada del catálogo para un valor del selector (id de documento o "fs:<ruta>"), o None. """
+    key = str(key or "").strip()
+    return catalog().get(key) if key else None
+
+def choices(limit=50, kinds=("documento", "archivo")):
+    """ [(clave, etiqueta)] para un ChoiceField: los `limit` documentos más recientes y los archivos sueltos. """
+    entries = catalog().entries
+    docs = [(e.key, e.label) for e in entries if e.kind == "documento" and "documento" in kinds][:limit]
+    files = [(e.key, e.label) for e in entries if e.kind == "archivo" and "archivo" in kinds]
+    return docs + files
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from .models import ConteoNgramaLN, DocumentoLN
+
+# Conteos de n-gramas por documento materializados en ConteoNgramaLN (una fila
+# por documento y n-grama) a partir del índice del tokenizador
+# LENGUAJE_CONTEOS_TOKENIZADOR ("limpio", el de /lenguaje/ y de las
+# estadísticas de DocumentoLN). Con los índices (n, ngrama) y (documento, n,
+# -conteo), "los bigramas más frecuentes de todos los documentos" o "qué
+# documentos contienen X" son una consulta SQL.
+
+# filas por INSERT (Django lo reduce si la base admite menos parámetros)
+BATCH_SIZE = 5000
+
+def tokenizer():
+    return getattr(settings, "LENGUAJE_CONTEOS_TOKENIZADOR", "limpio")
+
+def index_rows(documento_id, index):
+    """ Filas ConteoNgramaLN de un índice JSON (sólo la variante sin fronteras). """
+    for n, raw in (index.get("orders") or {}).items():
+        n = int(n)
+        for ngrama, conteo in raw.items():
+            yield ConteoNgramaLN(documento_id=documento_id, n=n, ngrama=ngrama, conteo=conteo)
+
+def store_counts(documento_id, index):
+    """ Reemplaza los conteos materializados de un documento, en una sola transacción. """
+    with transaction.atomic():
+        ConteoNgramaLN.objects.filter(documento_id=documento_id).delete()
+        ConteoNgramaLN.objects.bulk_create(index_rows(documento_id, index), batch_size=BATCH_SIZE)
+
+def top_ngrams(n, limit=20):
+    """ [(ngrama, conteo total, documentos)] más frecuentes de orden n en todos los documentos. """
+    rows = (ConteoNgramaLN.objects.filter(n=n).values("ngrama")
+            .annotate(total=Sum("conteo"), documentos=Count("documento"))
+            .order_by("-total", "ngrama")[:limit])
+    return [(r["ngrama"], r["total"], r["documentos"]) for r in rows]
+
+def top_for_document(documento_id, n, limit=20):
+    """ [(ngrama, conteo)] más frecuentes de orden n en un documento. """
+    rows = ConteoNgramaLN.objects.filter(documento_id=documento_id, n=n).order_by("-conteo", "ngrama")[:limit]
+    return list(rows.values_list("ngrama", "conteo"))
+
+def documents_with(ngrama):
+    """ Documentos que contienen el n-grama (texto con tokens separados por espacios), del que más lo usa al que menos. """
+    ngrama = " ".join(ngrama.split())
+    return (DocumentoLN.objects.filter(conteos__n=len(ngrama.split(" ")), conteos__ngrama=ngrama)
+            .annotate(veces=Sum("conteos__conteo")).order_by("-veces", "id"))
@@ -0,0 +1,171 @@
+import json
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from ngram.services import NgramCounts
+from .models import CorpusGlobalLN, ConteoGlobalLN, IndiceNgramasLN
+
+# Corpus global: la suma de los conteos de n-gramas de todos los documentos,
+# por tokenizador. No se recalcula nunca entero: al guardar el índice de un
+# documento se suman sus conteos y al borrarlo se restan (lenguaje_natural.signals),
+# así que cada actualización cuesta O(tamaño del documento).
+# LENGUAJE_CORPUS_GLOBAL = False desactiva la actualización automática.
+
+# n-gramas por consulta (SQLite admite 999 parámetros por sentencia)
+CHUNK_SIZE = 500
+
+def enabled() -> bool:
+    return getattr(settings, "LENGUAJE_CORPUS_GLOBAL", True)
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def index_tables(index):
+    """ (fronteras, n, {"w1 w2": conteo}) de cada tabla del índice JSON de un documento. """
+    for fronteras, key in ((False, "orders"), (True, "orders_wb")):
+        for n, raw in sorted((index.get(key) or {}).items()):
+            yield fronteras, int(n), raw
+
+def apply_counts(tokenizador: str, totals, tables, sign: int = 1):
+    """
+    Suma (sign=1) o resta (sign=-1) al corpus global `totals` ({"documentos",
+    "num_tokens", "num_tokens_wb"}) y `tables` ({(fronteras, n): {"w1 w2": conteo}}).
+    Las filas se actualizan con UPDATE ... conteo = conteo + c (una sentencia por
+    bloque de n-gramas con el mismo conteo), así que dos documentos guardados a la
+    vez no pierden conteos.
+    """
+    with transaction.atomic():
+        CorpusGlobalLN.objects.get_or_create(tokenizador=tokenizador)
+        CorpusGlobalLN.objects.filter(tokenizador=tokenizador).update(
+            documentos=F("documentos") + sign * totals.get("documentos", 0),
+            num_tokens=F("num_tokens") + sign * totals.get("num_tokens", 0),
+            num_tokens_wb=F("num_tokens_wb") + sign * totals.get("num_tokens_wb", 0),
+        )
+        for (fronteras, n), raw in sorted(tables.items()):
+            rows = ConteoGlobalLN.objects.filter(tokenizador=tokenizador, fronteras=fronteras, n=n)
+            if sign > 0:
+                ConteoGlobalLN.objects.bulk_create(
+                    [ConteoGlobalLN(tokenizador=tokenizador, fronteras=fronteras, n=n, ngrama=ng) for ng in raw],
+                    batch_size=CHUNK_SIZE, ignore_conflicts=True,
+                )
+            # la mayoría de los n-gramas de un documento tienen conteo 1: pocas sentencias
+            by_count = defaultdict(list)
+            for ng, c in raw.items():
+                by_count[c].append(ng)
+            for c, ngramas in by_count.items():
+                for chunk in _chunks(ngramas):
+                    rows.filter(ngrama__in=chunk).update(conteo=F("conteo") + sign * c)
+            if sign < 0:
+                for chunk in _chunks(raw):
+                    rows.filter(ngrama__in=chunk, conteo__lte=0).delete()
+
+def apply_index(tokenizador: str, index, sign: int = 1):
+    """ Suma (sign=1) o resta (sign=-1) al corpus global los conteos del índice de un documento. """
+    totals = {"documentos": 1, "num_tokens": index.get("num_tokens", 0), "num_tokens_wb": index.get("num_tokens_wb", 0)}
+    apply_counts(tokenizador, totals, {(f, n): raw for f, n, raw in index_tables(index)}, sign)
+
+def apply_indices(tokenizador: str, indices):
+    """
+    Suma al corpus global los índices de varios documentos a la vez (carga masiva):
+    se juntan primero en memoria, así que cada n-grama se actualiza una sola vez
+    por llamada en lugar de una vez por documento.
+    """
+    totals, tables = _merge(indices)
+    if totals["documentos"]:
+        apply_counts(tokenizador, totals, tables)
+
+def _merge(indices, merged=None):
+    """ Acumula los índices en (totales, {(fronteras, n): Counter}). """
+    totals, tables = merged or (Counter(), defaultdict(Counter))
+    for index in indices:
+        totals.update(documentos=1, num_tokens=index.get("num_tokens", 0), num_tokens_wb=index.get("num_tokens_wb", 0))
+        for fronteras, n, raw in index_tables(index):
+            tables[(fronteras, n)].update(raw)
+    return totals, tables
+
+def replace_index(tokenizador: str, old, new):
+    """ Cambia el índice `old` de un documento por `new` (None = no había / ya no hay). """
+    if old is not None:
+        apply_index(tokenizador, old, -1)
+    if new is not None:
+        apply_index(tokenizador, new, 1)
+
+def expected_counts(rows):
+    """
+    Recuento completo a partir de [(tokenizador, datos_json)] de los índices:
+    {tokenizador: (totales, {(fronteras, n): Counter})}. Es lo que el corpus
+    global debe contener; lo usan la verificación y la migración inicial.
+    """
+    out = {}
+    for tokenizador, datos_json in rows:
+        out[tokenizador] = _merge([json.loads(datos_json)], out.get(tokenizador))
+    return out
+
+def global_counts(tokenizador: str, with_bound: bool = False) -> NgramCounts:
+    """ Conteos del corpus global como NgramCounts (todos los órdenes guardados). """
+    orders = defaultdict(Counter)
+    rows = ConteoGlobalLN.objects.filter(tokenizador=tokenizador, fronteras=with_bound)
+    for n, ngrama, conteo in rows.values_list("n", "ngrama", "conteo").iterator():
+        orders[n][tuple(ngrama.split(" "))] = conteo
+    corpus = CorpusGlobalLN.objects.filter(tokenizador=tokenizador).first()
+    num_tokens = (corpus.num_tokens_wb if with_bound else corpus.num_tokens) if corpus else 0
+    return NgramCounts(dict(orders), num_tokens)
+
+def check(tokenizador: str = None, max_diferencias: int = 20):
+    """
+    Compara el corpus global con un recuento completo de los índices guardados.
+    Devuelve {tokenizador: {"ok", "totales", "ngramas", "diferencias", "ejemplos"}}
+    con los ejemplos como (fronteras, n, ngrama, global, esperado).
+    """
+    indices = IndiceNgramasLN.objects.all()
+    corpora = CorpusGlobalLN.objects.all()
+    if tokenizador:
+        indices, corpora = indices.filter(tokenizador=tokenizador), corpora.filter(tokenizador=tokenizador)
+    expected = expected_counts(indices.values_list("tokenizador", "datos_json").iterator())
+    names = set(expected) | set(corpora.values_list("tokenizador", flat=True))
+    report = {}
+    for name in sorted(names):
+        totals, tables = expected.get(name, (Counter(), {}))
+        corpus = corpora.filter(tokenizador=name).first()
+        stored = {f: getattr(corpus, f, 0) for f in ("documentos", "num_tokens", "num_tokens_wb")}
+        diffs, seen = [], set()
+        rows = ConteoGlobalLN.objects.filter(tokenizador=name).values_list("fronteras", "n", "ngrama", "conteo")
+        for fronteras, n, ngrama, conteo in rows.iterator():
+            seen.add((fronteras, n, ngrama))
+            want = tables.get((fronteras, n), {}).get(ngrama, 0)
+            if conteo != want:
+                diffs.append((fronteras, n, ngrama, conteo, want))
+        for (fronteras, n), table in tables.items():
+            for ngrama, want in table.items():
+                if (fronteras, n, ngrama) not in seen:
+                    diffs.append((fronteras, n, ngrama, 0, want))
+        report[name] = {
+            "ok": not diffs and all(stored[f] == totals.get(f, 0) for f in stored),
+            "totales": {f: (stored[f], totals.get(f, 0)) for f in stored},
+            "ngramas": len(seen),
+            "diferencias": len(diffs),
+            "ejemplos": diffs[:max_diferencias],
+        }
+    return report
+
+def rebuild(tokenizador: str = None):
+    """ Reescribe el corpus global desde cero a partir de los índices guardados. """
+    indices = IndiceNgramasLN.objects.all()
+    if tokenizador:
+        indices = indices.filter(tokenizador=tokenizador)
+    expected = expected_counts(indices.values_list("tokenizador", "datos_json").iterator())
+    with transaction.atomic():
+        for model in (ConteoGlobalLN, CorpusGlobalLN):
+            qs = model.objects.all()
+            (qs.filter(tokenizador=tokenizador) if tokenizador else qs).delete()
+        for name, (totals, tables) in expected.items():
+            CorpusGlobalLN.objects.create(tokenizador=name, **totals)
+            ConteoGlobalLN.objects.bulk_create(
+                (ConteoGlobalLN(tokenizador=name, fronteras=f, n=n, ngrama=ng, conteo=c)
+                 for (f, n), table in tables.items() for ng, c in table.items()),
+                batch_size=CHUNK_SIZE,
+            )
+    return {name: sum(len(t) for t in tables.values()) for name, (_, tables) in expected.items()}
@@ -0,0 +1,342 @@
+import json, collections, os, threading
+from itertools import chain
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from ngram.services import np, INDEX_VERSION, build_ngram_index_from_counts, count_file, CorpusCounts, NextWordIndex, SmoothedLM
+from ngram.mapped import write_model, open_model
+from ngram.tokenizers import get_tokenizer
+from .almacen import blob_name, sha256_file, store_file
+from .models import DocumentoLN, IndiceNgramasLN, ConteoNgramaLN
+from . import catalogo, conteos, corpus_global
+
+# Tokenizadores (nombres de ngram.tokenizers) con los que se indexa cada documento,
+# y si se guarda también la variante con fronteras:
+# "simple" lo usan /ngrams/ (MLE, autocompletar); "limpio" lo usa /lenguaje/ (histograma).
+TOKENIZADORES = {
+    "simple": True,
+    "limpio": False,
+}
+
+def index_max_n():
+    return int(getattr(settings, "NGRAM_INDEX_MAX_N", 3))
+
+def ngram_workers():
+    return int(getattr(settings, "NGRAM_WORKERS", 1))
+
+def build_indexes(doc, text=None, max_n=None, workers=None):
+    """
+    Calcula y guarda (reemplazando) los índices de n-gramas de `doc` para cada tokenizador.
+    Sin `text`, el archivo del documento se lee por bloques (memoria acotada) y,
+    con workers > 1, los archivos grandes se cuentan en paralelo.
+    """
+    max_n = max_n or index_max_n()
+    workers = workers or ngram_workers()
+    out = {}
+    for name, boundaries in TOKENIZADORES.items():
+        tokenize = get_tokenizer(name)
+        if text is None:
+            corpus = count_file(doc.archivo.path, max_n, tokenize=tokenize, boundaries=boundaries, workers=workers)
+        else:
+            corpus = CorpusCounts(tokenize(text), max_n)
+        index = build_ngram_index_from_counts(corpus, boundaries=boundaries)
+        IndiceNgramasLN.objects.update_or_create(
+            documento=doc, tokenizador=name,
+            defaults={
+                "version": INDEX_VERSION,
+                "n_max": max_n,
+                "num_tokens": index["num_tokens"],
+                "datos_json": json.dumps(index, ensure_ascii=False),
+            },
+        )
+        build_mapped_model(doc, name, index)
+        out[name] = index
+    return out
+
+def load_index(doc, tokenizador="simple", n=None):
+    """
+    Devuelve el índice guardado (dict) o None si no existe, es de otra versión
+    o no cubre el orden `n` pedido.
+    """
+    row = IndiceNgramasLN.objects.filter(documento=doc, tokenizador=tokenizador).first()
+    if row is None or row.version != INDEX_VERSION:
+        return None
+    if n is not None and n > row.n_max:
+        return None
+    try:
+        return json.loads(row.datos_json)
+    except Exception:
+        return None
+
+# --- Modelos binarios mapeados en memoria (ngram.mapped) ---
+# Un archivo por documento y tokenizador en NGRAM_MODEL_DIR (por defecto
+# MEDIA_ROOT/modelos). Cada proceso lo abre una vez con mmap y todos comparten
+# las mismas páginas; si el archivo se reescribe se vuelve a abrir.
+_mapped_models = {}
+
+def model_dir():
+    return str(getattr(settings, "NGRAM_MODEL_DIR", None) or os.path.join(settings.MEDIA_ROOT, "modelos"))
+
+def _model_file(sha256, pk, tokenizador):
+    return os.path.join(model_dir(), f"{sha256 or f'doc{pk}'}.{tokenizador}.ngm")
+
+def model_path(doc, tokenizador="simple"):
+    return _model_file(doc.sha256, doc.pk, tokenizador)
+
+def build_mapped_model(doc, tokenizador="simple", index=None):
+    """
+    Escribe el modelo binario de `doc` a partir de su índice (el guardado si no se
+    pasa `index`). Devuelve la ruta, o None si no hay índice, NumPy no está
+    instalado o el vocabulario no cabe en claves de 64 bits.
+    """
+    if np is None:
+        return None
+    index = index if index is not None else load_index(doc, tokenizador)
+    if index is None:
+        return None
+    path = model_path(doc, tokenizador)
+    try:
+        write_model(path, index)
+    except ValueError:
+        return None
+    return path
+
+def load_mapped_model(doc, tokenizador="simple", n=None):
+    """ Modelo mapeado de `doc` (abierto una vez por proceso) o None si no existe o no cubre `n`. """
+    if np is None:
+        return None
+    path = model_path(doc, tokenizador)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+    hit = _mapped_models.get(path)
+    if hit is None or hit[0] != stamp:
+        try:
+            hit = _mapped_models[path] = (stamp, open_model(path))
+        except (OSError, ValueError):
+            return None
+    model = hit[1]
+    if model.index_version != INDEX_VERSION or (n is not None and max(n, 1) > model.max_n):
+        return None
+    return model
+
+def discard_mapped_model(sha256, pk, tokenizador):
+    """
+    Tras borrar el índice `tokenizador` de un documento: borra su modelo binario,
+    salvo que otro documento con el mismo contenido (sha256) conserve ese índice,
+    y olvida en este proceso el archivo abierto y los modelos del LRU. Los demás
+    procesos dejan de usar el archivo al no encontrarlo (load_mapped_model).
+    """
+    if sha256 and IndiceNgramasLN.objects.filter(documento__sha256=sha256, tokenizador=tokenizador).exists():
+        return
+    path = _model_file(sha256, pk, tokenizador)
+    _mapped_models.pop(path, None)
+    name = sha256 or f"id:{pk}"
+    with _next_word_lock:
+        for key in [key for key in _next_word_cache if key[0] == name and key[1] == tokenizador]:
+            del _next_word_cache[key]
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# Índices historia -> siguiente palabra ya construidos, reutilizados entre peticiones (LRU).
+# Varias peticiones (hilos de ASGI o del servidor) lo usan a la vez: se consulta y
+# se modifica bajo _next_word_lock; los modelos se construyen fuera del candado.
+NEXT_WORD_CACHE_SIZE = 32
+_next_word_cache = collections.OrderedDict()
+_next_word_lock = threading.Lock()
+
+def _cached_next_word(key):
+    with _next_word_lock:
+        hit = _next_word_cache.get(key)
+        if hit is not None:
+            _next_word_cache.move_to_end(key)
+        return hit
+
+def _remember_next_word(models):
+    """ Guarda {clave: modelo} en el LRU y descarta los usados hace más tiempo. """
+    with _next_word_lock:
+        for key, model in models.items():
+            _next_word_cache[key] = model
+            _next_word_cache.move_to_end(key)
+        while len(_next_word_cache) > NEXT_WORD_CACHE_SIZE:
+            _next_word_cache.popitem(last=False)
+
+def load_next_word_index(doc, n, with_bound=False, tokenizador="simple", modelo="mle"):
+    """
+    Devuelve el NextWordIndex (modelo="mle") o el SmoothedLM ("kneser_ney",
+    "backoff") de orden n del documento, construyéndolo a partir del índice
+    guardado sólo la primera vez. Si el documento tiene modelo binario, el MLE
+    se consulta directamente sobre el archivo mapeado y los modelos suavizados
+    se construyen desde sus conteos. None si el documento no tiene índice.
+    """
+    mapped = load_mapped_model(doc, tokenizador, n)
+    if mapped is not None and not mapped.has_variant(with_bound):
+        mapped = None
+    if mapped is not None and modelo == "mle":
+        # el archivo ya es el índice: no hay nada que construir ni guardar en el LRU
+        return mapped.next_word_index(n, with_bound)
+    key = (doc.sha256 or f"id:{doc.pk}", tokenizador, n, with_bound, modelo, INDEX_VERSION)
+    hit = _cached_next_word(key)
+    if hit is not None:
+        return hit
+    if mapped is not None:
+        lm = SmoothedLM.from_counts(mapped.counts(with_bound), n, modelo)
+        _remember_next_word({key: lm})
+        return lm
+    index = load_index(doc, tokenizador, n)
+    if index is None:
+        return None
+    return _cache_next_word_indexes(key, index, n, with_bound, modelo)
+
+def _cache_next_word_indexes(key, index, n, with_bound, modelo):
+    # Se construyen a la vez todas las variantes disponibles para no volver a parsear el índice
+    result, models = None, {}
+    for wb in (False, True):
+        if wb and "orders_wb" not in index:
+            continue
+        if modelo == "mle":
+            nwi = NextWordIndex.from_ngram_index(index, n, with_bound=wb)
+        else:
+            nwi = SmoothedLM.from_ngram_index(index, n, with_bound=wb, method=modelo)
+        models[key[:3] + (wb, modelo, INDEX_VERSION)] = nwi
+        if wb == with_bound:
+            result = nwi
+    _remember_next_word(models)
+    return result
+
+def load_file_next_word_index(path, digest, n, with_bound=False, tokenizador="simple", modelo="mle"):
+    """
+    Igual que load_next_word_index para un archivo sin DocumentoLN: el archivo se
+    cuenta (por bloques) la primera vez y el modelo queda en el mismo LRU, con el
+    sha256 del contenido como clave.
+    """
+    key = (digest, tokenizador, n, with_bound, modelo, INDEX_VERSION)
+    hit = _cached_next_word(key)
+    if hit is not None:
+        return hit
+    return _cache_next_word_indexes(key, file_index(path, tokenizador, n), n, with_bound, modelo)
+
+def file_index(path, tokenizador="simple", n=None):
+    """ Índice (como el de build_indexes) de un archivo contado en el momento, sin guardarlo. """
+    boundaries = TOKENIZADORES.get(tokenizador, True)
+    corpus = count_file(path, max(n or 1, index_max_n()), tokenize=get_tokenizer(tokenizador), boundaries=boundaries)
+    return build_ngram_index_from_counts(corpus, boundaries=boundaries)
+
+def index_for_file(path, tokenizador="limpio", n=None, digest=None):
+    """Busca el índice del documento cuyo contenido coincide (sha256) con `path`."""
+    digest = digest or sha256_file(path)
+    doc = DocumentoLN.objects.filter(sha256=digest).order_by("-created_at").first()
+    if doc is None:
+        return None
+    return load_index(doc, tokenizador, n)
+
+def _indexed(documentos):
+    """ Los DocumentoLN de `documentos` que tienen al día el índice de cada tokenizador. """
+    return (documentos.filter(indices__version=INDEX_VERSION, indices__tokenizador__in=list(TOKENIZADORES))
+            .annotate(num_indices=Count("indices")).filter(num_indices=len(TOKENIZADORES)))
+
+def find_document(digest):
+    """ El DocumentoLN más reciente con ese contenido (sha256) y todos sus índices al día, o None. """
+    return _indexed(DocumentoLN.objects.filter(sha256=digest)).order_by("-created_at").first()
+
+def indexed_digests():
+    """ sha256 de todos los contenidos que ya tienen un documento indexado. """
+    return set(_indexed(DocumentoLN.objects.exclude(sha256="")).values_list("sha256", flat=True))
+
+def document_stats(limpio):
+    """ Campos de estadísticas de un DocumentoLN a partir de su índice "limpio". """
+    unigrams = limpio["orders"].get("1", {})
+    top = [[w, c] for w, c in sorted(unigrams.items(), key=lambda kv: (-kv[1], kv[0]))[:30]]
+    return {
+        "estadisticas": {"preview": list(limpio.get("preview", [])), "top": top},
+        "num_tokens": limpio.get("num_tokens", 0),
+        "vocabulario": len(unigrams),
+        "termino_top": top[0][0][:255] if top else "",
+    }
+
+def set_document_stats(doc, limpio):
+    for field, value in document_stats(limpio).items():
+        setattr(doc, field, value)
+
+def ingest_document(nombre, path, workers=None, digest=None):
+    """
+    Registra el archivo `path` como DocumentoLN: si ya hay un documento con el
+    mismo contenido (sha256) e índices, se devuelve ése sin recalcular nada; si
+    no, el archivo pasa al almacén por contenido (ver almacen.py), se guardan sus
+    estadísticas básicas y se precalculan sus índices de n-gramas.
+    """
+    digest = digest or sha256_file(path)
+    doc = find_document(digest)
+    if doc is not None:
+        return doc
+    store_file(path, digest)
+    doc = DocumentoLN(nombre_original=nombre, sha256=digest)
+    doc.archivo.name = blob_name(digest)
+    doc.save()
+    limpio = build_indexes(doc, workers=workers)["limpio"]
+    set_document_stats(doc, limpio)
+    doc.save()
+    return doc
+
+# --- Carga masiva (backfill_lenguaje --todo) ---
+def analyze_file(path, known=(), max_n=None):
+    """
+    Trabajo del pool de la carga masiva: sha256 del archivo y, si el contenido no
+    está en `known`, sus índices de cada tokenizador (el archivo se lee por bloques).
+    """
+    digest = sha256_file(path)
+    result = {"path": path, "size": os.path.getsize(path), "sha256": digest, "indices": None}
+    if digest not in known:
+        max_n = max_n or index_max_n()
+        result["indices"] = {
+            name: build_ngram_index_from_counts(
+                count_file(path, max_n, tokenize=get_tokenizer(name), boundaries=boundaries), boundaries=boundaries)
+            for name, boundaries in TOKENIZADORES.items()
+        }
+    return result
+
+def register_documents(results):
+    """
+    Crea de una vez (bulk_create, en una transacción) los DocumentoLN, sus índices
+    y sus conteos materializados a partir de resultados de analyze_file, y suma
+    sus conteos al corpus global y descarta el catálogo de corpus (bulk_create
+    no emite las señales de save()).
+    Los contenidos repetidos dentro del lote se registran una sola vez.
+    Devuelve los documentos creados.
+    """
+    nuevos, digests = [], set()
+    for r in results:
+        if r["indices"] is None or r["sha256"] in digests:
+            continue
+        digests.add(r["sha256"])
+        store_file(r["path"], r["sha256"])
+        doc = DocumentoLN(nombre_original=os.path.basename(r["path"]), sha256=r["sha256"])
+        doc.archivo.name = blob_name(r["sha256"])
+        set_document_stats(doc, r["indices"]["limpio"])
+        nuevos.append((doc, r["indices"]))
+    if not nuevos:
+        return []
+    with transaction.atomic():
+        DocumentoLN.objects.bulk_create([doc for doc, _ in nuevos])
+        IndiceNgramasLN.objects.bulk_create([
+            IndiceNgramasLN(documento=doc, tokenizador=name, version=INDEX_VERSION, n_max=index["max_n"],
+                            num_tokens=index["num_tokens"], datos_json=json.dumps(index, ensure_ascii=False))
+            for doc, indices in nuevos for name, index in indices.items()
+        ])
+        ConteoNgramaLN.objects.bulk_create(
+            chain.from_iterable(conteos.index_rows(doc.id, indices[conteos.tokenizer()])
+                                for doc, indices in nuevos if conteos.tokenizer() in indices),
+            batch_size=conteos.BATCH_SIZE,
+        )
+        if corpus_global.enabled():
+            for name in TOKENIZADORES:
+                corpus_global.apply_indices(name, [indices[name] for _, indices in nuevos if name in indices])
+    for doc, indices in nuevos:
+        for name, index in indices.items():
+            build_mapped_model(doc, name, index)
+    catalogo.invalidate()
+    return [doc for doc, _ in nuevos]
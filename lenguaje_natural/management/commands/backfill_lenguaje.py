@@ -1,35 +1,146 @@
+import json, os, time
+from functools import partial
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from django.core.files.base import ContentFile
 from lenguaje_natural.models import DocumentoLN
-from lenguaje_natural.utils import clean_and_tokenize
-import collections, json, os
+from lenguaje_natural.indices import (ingest_document, build_indexes, load_index, sha256_file,
+                                      analyze_file, indexed_digests, ngram_workers, register_documents,
+                                      set_document_stats)
 from pathlib import Path
 
+# Carpetas de MEDIA_ROOT que recorre --todo y extensiones que se importan (las que admite /lenguaje/upload/)
+CARPETAS = ("lenguaje", "uploads_lenguaje")
+EXTENSIONES = (".txt", ".csv")
+
 class Command(BaseCommand):
-    help = "Importa archivos legacy (p.ej. media/uploads/last.txt) a DocumentoLN."
+    help = "Importa archivos legacy (p.ej. media/uploads/last.txt) a DocumentoLN y precalcula sus índices de n-gramas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Procesos para contar archivos grandes en paralelo (por defecto settings.NGRAM_WORKERS).")
+        parser.add_argument("--todo", action="store_true",
+                            help="Recorre media/lenguaje/** y media/uploads_lenguaje e importa todos los archivos.")
+        parser.add_argument("--lote", type=int, default=50,
+                            help="Archivos por transacción en --todo.")
+        parser.add_argument("--checkpoint", default=None,
+                            help="Archivo de progreso de --todo (por defecto MEDIA_ROOT/.backfill_lenguaje.json).")
+        parser.add_argument("--reiniciar", action="store_true",
+                            help="Ignora el progreso guardado y vuelve a recorrer todos los archivos.")
 
     def handle(self, *args, **options):
+        workers = options.get("workers")
         media = settings.MEDIA_ROOT
-        candidates = [
-            Path(media) / "uploads_lenguaje" / "last.txt",
-            Path(media) / "uploads" / "last.txt",
-        ]
-        imported = 0
-        for path in candidates:
-            if not path.exists():
+        # Primero los documentos existentes sin índice (o con un índice de versión
+        # anterior): así --todo reconoce su contenido y no los vuelve a importar.
+        indexed = 0
+        for doc in DocumentoLN.objects.all():
+            if all(load_index(doc, name) is not None for name in ("simple", "limpio")):
                 continue
-            if DocumentoLN.objects.filter(nombre_original=path.name).exists():
-                self.stdout.write(self.style.WARNING(f"Ya existe registro para {path.name}, omitiendo."))
-                continue
-            text = path.read_text(encoding="utf-8", errors="ignore")
-            tokens = clean_and_tokenize(text)
-            top = collections.Counter(tokens).most_common(30)
-            doc = DocumentoLN(nombre_original=path.name); doc.save()
-            doc.archivo.save(path.name, ContentFile(text.encode("utf-8")), save=False)
-            doc.tokens_preview = ", ".join(tokens[:50])
-            doc.top_json = json.dumps(top, ensure_ascii=False)
-            doc.save()
-            imported += 1
-            self.stdout.write(self.style.SUCCESS(f"Importado: {path}"))
-        self.stdout.write(self.style.SUCCESS(f"Listo. Importados: {imported}"))
+            try:
+                if not doc.sha256:
+                    doc.sha256 = sha256_file(doc.archivo.path)
+                    doc.save(update_fields=["sha256"])
+                set_document_stats(doc, build_indexes(doc, workers=workers)["limpio"])
+                doc.save(update_fields=["estadisticas", "num_tokens", "vocabulario", "termino_top"])
+                indexed += 1
+            except Exception as ex:
+                self.stdout.write(self.style.WARNING(f"No se pudo indexar {doc}: {ex}"))
+
+        imported = 0
+        if options["todo"]:
+            imported = self.importar_todo(Path(media), workers or ngram_workers(), max(1, options["lote"]),
+                                          options["checkpoint"] or os.path.join(media, ".backfill_lenguaje.json"),
+                                          options["reiniciar"])
+        else:
+            candidates = [
+                Path(media) / "uploads_lenguaje" / "last.txt",
+                Path(media) / "uploads" / "last.txt",
+            ]
+            for path in candidates:
+                if not path.exists():
+                    continue
+                if DocumentoLN.objects.filter(nombre_original=path.name).exists():
+                    self.stdout.write(self.style.WARNING(f"Ya existe registro para {path.name}, omitiendo."))
+                    continue
+                ingest_document(path.name, str(path), workers=workers)
+                imported += 1
+                self.stdout.write(self.style.SUCCESS(f"Importado: {path}"))
+        self.stdout.write(self.style.SUCCESS(f"Listo. Importados: {imported}. Indexados: {indexed}"))
+
+    def importar_todo(self, media, workers, lote, checkpoint, reiniciar):
+        """
+        Importa todos los archivos de CARPETAS: se cuentan en un pool de procesos y se
+        registran por lotes (bulk_create, una transacción por lote). Tras cada lote se
+        guarda en `checkpoint` qué archivos (ruta, tamaño, mtime) quedaron hechos, así
+        que una ejecución interrumpida sigue donde se quedó.
+        """
+        hechos = {}
+        if not reiniciar and os.path.exists(checkpoint):
+            with open(checkpoint, encoding="utf-8") as fh:
+                hechos = json.load(fh).get("hechos", {})
+        pendientes = []
+        for carpeta in CARPETAS:
+            for path in sorted((media / carpeta).rglob("*")):
+                if not path.is_file() or path.suffix.lower() not in EXTENSIONES or path.name.startswith("."):
+                    continue
+                st = path.stat()
+                rel = path.relative_to(media).as_posix()
+                if hechos.get(rel) != [st.st_size, st.st_mtime_ns]:
+                    pendientes.append((rel, str(path), st.st_size, st.st_mtime_ns))
+        total_bytes = sum(p[2] for p in pendientes)
+        self.stdout.write(f"{len(pendientes)} archivos pendientes ({total_bytes / 2**20:.1f} MB), "
+                          f"{len(hechos)} ya hechos según {checkpoint}")
+        if not pendientes:
+            return 0
+
+        known = indexed_digests()
+        analizar = partial(analyze_file, known=frozenset(known))
+        lotes = [pendientes[i:i + lote] for i in range(0, len(pendientes), lote)]
+        start, done, done_bytes, imported = time.perf_counter(), 0, 0, 0
+        pool = None
+        if workers > 1:
+            from trabajos.cola import executor
+            pool = executor(workers)
+        try:
+            # El pool va un lote por delante: cuenta el siguiente mientras se registra el
+            # actual, sin acumular en memoria los resultados de todos los archivos.
+            def enviar(infos):
+                return [pool.submit(analizar, info[1]) for info in infos]
+            siguiente = enviar(lotes[0]) if pool else None
+            for i, infos in enumerate(lotes):
+                if pool:
+                    actual, siguiente = siguiente, (enviar(lotes[i + 1]) if i + 1 < len(lotes) else None)
+                    results = [f.result() for f in actual]
+                else:
+                    results = [analizar(info[1]) for info in infos]
+                for r in results:
+                    # contenido repetido (ya importado en un lote anterior): sólo se marca como hecho
+                    if r["sha256"] in known:
+                        r["indices"] = None
+                imported += len(register_documents(results))
+                known.update(r["sha256"] for r in results)
+                for rel, _, size, mtime in infos:
+                    hechos[rel] = [size, mtime]
+                self._guardar_checkpoint(checkpoint, hechos)
+                done += len(infos)
+                done_bytes += sum(info[2] for info in infos)
+                elapsed = max(time.perf_counter() - start, 1e-9)
+                self.stdout.write(f"{done}/{len(pendientes)} archivos, {done_bytes / 2**20:.1f} MB: "
+                                  f"{done / elapsed:.1f} archivos/s, {done_bytes / 2**20 / elapsed:.2f} MB/s")
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(
+                f"Interrumpido tras {done} archivos; el progreso está guardado en {checkpoint}."))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"Carga masiva: {done} archivos ({imported} documentos nuevos) en {elapsed:.1f} s, "
+            f"{done / elapsed:.1f} archivos/s, {done_bytes / 2**20 / elapsed:.2f} MB/s"))
+        return imported
+
+    def _guardar_checkpoint(self, checkpoint, hechos):
+        tmp = f"{checkpoint}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"hechos": hechos}, fh)
+        os.replace(tmp, checkpoint)
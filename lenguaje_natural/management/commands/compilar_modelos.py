@@ -0,0 +1,46 @@
+import os, time
+from django.core.management.base import BaseCommand, CommandError
+from lenguaje_natural.models import DocumentoLN
+from lenguaje_natural.indices import TOKENIZADORES, build_indexes, build_mapped_model, load_index, load_mapped_model, model_dir
+from ngram.services import np
+
+class Command(BaseCommand):
+    help = "Escribe el modelo binario (mmap) de n-gramas de cada documento a partir de su índice guardado."
+
+    def add_arguments(self, parser):
+        parser.add_argument("documentos", nargs="*", type=int,
+                            help="Ids de DocumentoLN (por defecto, todos).")
+        parser.add_argument("--forzar", action="store_true",
+                            help="Reescribe también los modelos que ya existen.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Procesos para contar los documentos sin índice (por defecto settings.NGRAM_WORKERS).")
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("El modelo binario requiere NumPy (pip install numpy)")
+        docs = DocumentoLN.objects.order_by("id")
+        if options["documentos"]:
+            docs = docs.filter(id__in=options["documentos"])
+        self.stdout.write(f"Modelos en {model_dir()}")
+        escritos = omitidos = 0
+        for doc in docs:
+            for name in TOKENIZADORES:
+                if not options["forzar"] and load_mapped_model(doc, name) is not None:
+                    omitidos += 1
+                    continue
+                start = time.perf_counter()
+                try:
+                    if load_index(doc, name) is None:
+                        # sin índice (o de una versión anterior): build_indexes también escribe los modelos
+                        build_indexes(doc, workers=options.get("workers"))
+                    path = build_mapped_model(doc, name)
+                except Exception as ex:
+                    self.stdout.write(self.style.WARNING(f"No se pudo compilar {doc} ({name}): {ex}"))
+                    continue
+                if path is None:
+                    self.stdout.write(self.style.WARNING(f"{doc} ({name}): vocabulario demasiado grande, se usa el índice JSON"))
+                    continue
+                escritos += 1
+                self.stdout.write(self.style.SUCCESS(
+                    f"{doc} ({name}): {os.path.getsize(path) / 1024:.1f} KiB en {time.perf_counter() - start:.2f} s"))
+        self.stdout.write(self.style.SUCCESS(f"Listo. Escritos: {escritos}. Omitidos: {omitidos}"))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from lenguaje_natural import corpus_global
+
+class Command(BaseCommand):
+    help = "Compara el corpus global incremental con un recuento completo de los índices de todos los documentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tokenizador", default=None,
+                            help="Sólo el corpus de este tokenizador (por defecto, todos).")
+        parser.add_argument("--reparar", action="store_true",
+                            help="Si hay diferencias, reconstruye el corpus global desde los índices.")
+
+    def handle(self, *args, **options):
+        tokenizador = options["tokenizador"]
+        start = time.perf_counter()
+        report = corpus_global.check(tokenizador)
+        self.stdout.write(f"Verificado en {time.perf_counter() - start:.2f} s")
+        inconsistentes = []
+        for name, r in report.items():
+            totales = ", ".join(f"{f}={g}/{e}" for f, (g, e) in r["totales"].items())
+            if r["ok"]:
+                self.stdout.write(self.style.SUCCESS(f"{name}: correcto ({r['ngramas']} n-gramas; {totales})"))
+                continue
+            inconsistentes.append(name)
+            self.stdout.write(self.style.WARNING(
+                f"{name}: {r['diferencias']} diferencias en {r['ngramas']} n-gramas (global/esperado: {totales})"))
+            for fronteras, n, ngrama, got, want in r["ejemplos"]:
+                self.stdout.write(f"  n={n}{' con fronteras' if fronteras else ''} {ngrama!r}: {got} / {want}")
+        if not inconsistentes:
+            self.stdout.write(self.style.SUCCESS("Listo. El corpus global coincide con los índices."))
+            return
+        if not options["reparar"]:
+            raise CommandError(f"Corpus global inconsistente: {', '.join(inconsistentes)} (usa --reparar)")
+        for name in inconsistentes:
+            filas = corpus_global.rebuild(name).get(name, 0)
+            self.stdout.write(self.style.SUCCESS(f"{name}: reconstruido ({filas} n-gramas)"))
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenguaje_natural', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentoln',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='IndiceNgramasLN',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tokenizador', models.CharField(max_length=32)),
+                ('version', models.PositiveIntegerField()),
+                ('n_max', models.PositiveSmallIntegerField()),
+                ('num_tokens', models.IntegerField(default=0)),
+                ('datos_json', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indices', to='lenguaje_natural.documentoln')),
+            ],
+            options={
+                'unique_together': {('documento', 'tokenizador')},
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+import json
+from collections import Counter, defaultdict
+from django.db import migrations, models
+
+# Copia congelada del recuento de lenguaje_natural.corpus_global (CHUNK_SIZE,
+# index_tables, expected_counts) tal como estaba al crear esta migración: si el
+# módulo cambia después, la migración sigue produciendo lo mismo.
+CHUNK_SIZE = 500
+
+def _tablas(index):
+    for fronteras, key in ((False, 'orders'), (True, 'orders_wb')):
+        for n, raw in sorted((index.get(key) or {}).items()):
+            yield fronteras, int(n), raw
+
+def _conteos_esperados(rows):
+    """ {tokenizador: (totales, {(fronteras, n): Counter})} a partir de [(tokenizador, datos_json)]. """
+    out = {}
+    for tokenizador, datos_json in rows:
+        totals, tables = out.setdefault(tokenizador, (Counter(), defaultdict(Counter)))
+        index = json.loads(datos_json)
+        totals.update(documentos=1, num_tokens=index.get('num_tokens', 0), num_tokens_wb=index.get('num_tokens_wb', 0))
+        for fronteras, n, raw in _tablas(index):
+            tables[(fronteras, n)].update(raw)
+    return out
+
+def poblar_corpus_global(apps, schema_editor):
+    # Los índices que ya existían entran en el corpus global de una sola vez
+    Indice = apps.get_model('lenguaje_natural', 'IndiceNgramasLN')
+    CorpusGlobal = apps.get_model('lenguaje_natural', 'CorpusGlobalLN')
+    Conteo = apps.get_model('lenguaje_natural', 'ConteoGlobalLN')
+    expected = _conteos_esperados(Indice.objects.values_list('tokenizador', 'datos_json').iterator())
+    for name, (totals, tables) in expected.items():
+        CorpusGlobal.objects.create(tokenizador=name, **totals)
+        Conteo.objects.bulk_create(
+            (Conteo(tokenizador=name, fronteras=f, n=n, ngrama=ng, conteo=c)
+             for (f, n), table in tables.items() for ng, c in table.items()),
+            batch_size=CHUNK_SIZE,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenguaje_natural', '0002_indice_ngramas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorpusGlobalLN',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tokenizador', models.CharField(max_length=32, unique=True)),
+                ('documentos', models.IntegerField(default=0)),
+                ('num_tokens', models.BigIntegerField(default=0)),
+                ('num_tokens_wb', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConteoGlobalLN',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tokenizador', models.CharField(max_length=32)),
+                ('fronteras', models.BooleanField(default=False)),
+                ('n', models.PositiveSmallIntegerField()),
+                ('ngrama', models.TextField()),
+                ('conteo', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('tokenizador', 'fronteras', 'n', 'ngrama')},
+            },
+        ),
+        migrations.RunPython(poblar_corpus_global, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+import json
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada de lenguaje_natural.conteos (BATCH_SIZE y el tokenizador por
+# defecto) tal como estaba al crear esta migración
+BATCH_SIZE = 5000
+TOKENIZADOR = 'limpio'
+
+def materializar_conteos(apps, schema_editor):
+    # Conteos de los documentos que ya tenían índice
+    Indice = apps.get_model('lenguaje_natural', 'IndiceNgramasLN')
+    Conteo = apps.get_model('lenguaje_natural', 'ConteoNgramaLN')
+    for documento_id, datos_json in Indice.objects.filter(tokenizador=TOKENIZADOR).values_list('documento_id', 'datos_json').iterator():
+        orders = json.loads(datos_json).get('orders') or {}
+        Conteo.objects.bulk_create(
+            (Conteo(documento_id=documento_id, n=int(n), ngrama=ng, conteo=c) for n, raw in orders.items() for ng, c in raw.items()),
+            batch_size=BATCH_SIZE,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenguaje_natural', '0003_corpus_global'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoNgramaLN',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('n', models.PositiveSmallIntegerField()),
+                ('ngrama', models.TextField()),
+                ('conteo', models.IntegerField()),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conteos', to='lenguaje_natural.documentoln')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['n', 'ngrama'], name='lenguaje_na_n_aba9e0_idx'), models.Index(fields=['documento', 'n', '-conteo'], name='lenguaje_na_documen_158aa0_idx')],
+            },
+        ),
+        migrations.RunPython(materializar_conteos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+import json
+from django.db import migrations, models
+
+# Copia congelada de lenguaje_natural.indices.document_stats tal como estaba al
+# crear esta migración: si la función cambia después, la migración no.
+TOP_TERMINOS = 30
+
+def _estadisticas(limpio):
+    unigrams = limpio['orders'].get('1', {})
+    top = [[w, c] for w, c in sorted(unigrams.items(), key=lambda kv: (-kv[1], kv[0]))[:TOP_TERMINOS]]
+    return {
+        'estadisticas': {'preview': list(limpio.get('preview', [])), 'top': top},
+        'num_tokens': limpio.get('num_tokens', 0),
+        'vocabulario': len(unigrams),
+        'termino_top': top[0][0][:255] if top else '',
+    }
+
+def llenar_estadisticas(apps, schema_editor):
+    # Desde el índice "limpio" si existe; si no, desde los antiguos top_json / tokens_preview
+    Documento = apps.get_model('lenguaje_natural', 'DocumentoLN')
+    Indice = apps.get_model('lenguaje_natural', 'IndiceNgramasLN')
+    limpios = dict(Indice.objects.filter(tokenizador='limpio').values_list('documento_id', 'datos_json'))
+    for doc in Documento.objects.all().iterator():
+        if doc.id in limpios:
+            campos = _estadisticas(json.loads(limpios[doc.id]))
+        else:
+            try:
+                top = [list(wc) for wc in json.loads(doc.top_json or '[]')]
+            except ValueError:
+                top = []
+            preview = [t for t in doc.tokens_preview.split(', ') if t]
+            campos = {'estadisticas': {'preview': preview, 'top': top},
+                      'termino_top': top[0][0][:255] if top else ''}
+        for campo, valor in campos.items():
+            setattr(doc, campo, valor)
+        doc.save(update_fields=list(campos))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenguaje_natural', '0004_conteos_ngramas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentoln',
+            name='estadisticas',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='documentoln',
+            name='num_tokens',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='documentoln',
+            name='termino_top',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='documentoln',
+            name='vocabulario',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(llenar_estadisticas, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='documentoln',
+            name='tokens_preview',
+        ),
+        migrations.RemoveField(
+            model_name='documentoln',
+            name='top_json',
+        ),
+    ]
@@ -6,8 +6,65 @@ def ln_upload_path(instance, filename):
 class DocumentoLN(models.Model):
     archivo = models.FileField(upload_to=ln_upload_path)
     nombre_original = models.CharField(max_length=255, blank=True)
-    tokens_preview = models.TextField(blank=True)
-    top_json = models.TextField(blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Estadísticas del índice "limpio", calculadas al ingerir (indices.document_stats):
+    # {"preview": [tokens], "top": [[palabra, conteo], ...]} y columnas indexadas para el admin.
+    estadisticas = models.JSONField(default=dict, blank=True)
+    num_tokens = models.IntegerField(default=0, db_index=True)
+    vocabulario = models.IntegerField(default=0, db_index=True)
+    termino_top = models.CharField(max_length=255, blank=True, db_index=True)
     def __str__(self):
         return f"{self.nombre_original or self.archivo.name} ({self.created_at:%Y-%m-%d %H:%M})"
+    @property
+    def tokens_preview(self):
+        return ", ".join(self.estadisticas.get("preview", []))
+    @property
+    def top(self):
+        return self.estadisticas.get("top", [])
+class IndiceNgramasLN(models.Model):
+    """Conteos de n-gramas (órdenes 1..n_max) precalculados para un DocumentoLN y un tokenizador."""
+    documento = models.ForeignKey(DocumentoLN, on_delete=models.CASCADE, related_name="indices")
+    tokenizador = models.CharField(max_length=32)
+    version = models.PositiveIntegerField()
+    n_max = models.PositiveSmallIntegerField()
+    num_tokens = models.IntegerField(default=0)
+    datos_json = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        unique_together = ("documento", "tokenizador")
+    def __str__(self):
+        return f"Índice {self.tokenizador} v{self.version} (n<={self.n_max}) de {self.documento_id}"
+class CorpusGlobalLN(models.Model):
+    """Totales del corpus global (la suma de los índices de todos los DocumentoLN) de un tokenizador."""
+    tokenizador = models.CharField(max_length=32, unique=True)
+    documentos = models.IntegerField(default=0)
+    num_tokens = models.BigIntegerField(default=0)
+    num_tokens_wb = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    def __str__(self):
+        return f"Corpus global {self.tokenizador} ({self.documentos} documentos, {self.num_tokens} tokens)"
+class ConteoGlobalLN(models.Model):
+    """Conteo de un n-grama en el corpus global; se actualiza al guardar o borrar cada índice."""
+    tokenizador = models.CharField(max_length=32)
+    fronteras = models.BooleanField(default=False)
+    n = models.PositiveSmallIntegerField()
+    ngrama = models.TextField()
+    conteo = models.BigIntegerField(default=0)
+    class Meta:
+        unique_together = ("tokenizador", "fronteras", "n", "ngrama")
+    def __str__(self):
+        return f"{self.ngrama!r} ({self.tokenizador}, n={self.n}): {self.conteo}"
+class ConteoNgramaLN(models.Model):
+    """Conteo de un n-grama en un DocumentoLN (tabla materializada del índice, consultable con SQL)."""
+    documento = models.ForeignKey(DocumentoLN, on_delete=models.CASCADE, related_name="conteos")
+    n = models.PositiveSmallIntegerField()
+    ngrama = models.TextField()
+    conteo = models.IntegerField()
+    class Meta:
+        indexes = [
+            models.Index(fields=["n", "ngrama"]),
+            models.Index(fields=["documento", "n", "-conteo"]),
+        ]
+    def __str__(self):
+        return f"{self.ngrama!r} (n={self.n}) en {self.documento_id}: {self.conteo}"
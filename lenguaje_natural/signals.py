@@ -0,0 +1,62 @@
+import json
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from . import catalogo, conteos, corpus_global, indices
+from .models import DocumentoLN, IndiceNgramasLN
+
+# Mantienen el corpus global al día: cada índice que se guarda o se borra (también
+# en cascada al borrar su DocumentoLN) suma o resta sus conteos. Al guardar el
+# índice de conteos.tokenizer() también se materializan sus filas ConteoNgramaLN
+# (al borrar el documento se borran en cascada).
+
+def _parse(datos_json):
+    try:
+        return json.loads(datos_json) if datos_json else None
+    except ValueError:
+        return None
+
+@receiver(pre_save, sender=IndiceNgramasLN)
+def recordar_indice_anterior(sender, instance, raw=False, **kwargs):
+    # update_or_create ya trae los datos nuevos en la instancia: el índice anterior se lee de la base
+    instance._datos_anteriores = None
+    if raw or instance.pk is None or not corpus_global.enabled():
+        return
+    instance._datos_anteriores = sender.objects.filter(pk=instance.pk).values_list("datos_json", flat=True).first()
+
+@receiver(post_save, sender=IndiceNgramasLN)
+def sumar_indice(sender, instance, raw=False, **kwargs):
+    if raw or not corpus_global.enabled():
+        return
+    corpus_global.replace_index(instance.tokenizador, _parse(getattr(instance, "_datos_anteriores", None)),
+                                _parse(instance.datos_json))
+
+@receiver(post_save, sender=IndiceNgramasLN)
+def materializar_conteos(sender, instance, raw=False, **kwargs):
+    if raw or instance.tokenizador != conteos.tokenizer():
+        return
+    index = _parse(instance.datos_json)
+    if index is not None:
+        conteos.store_counts(instance.documento_id, index)
+
+@receiver(post_delete, sender=IndiceNgramasLN)
+def restar_indice(sender, instance, **kwargs):
+    if not corpus_global.enabled():
+        return
+    corpus_global.replace_index(instance.tokenizador, _parse(instance.datos_json), None)
+
+# El modelo binario (.ngm) de un índice borrado se elimina cuando la baja se
+# confirma; si la transacción se revierte, el archivo sigue sirviendo.
+@receiver(post_delete, sender=IndiceNgramasLN)
+def borrar_modelo_mapeado(sender, instance, **kwargs):
+    # en cascada, los índices se borran antes que su documento: el sha256 todavía se puede leer
+    sha256 = DocumentoLN.objects.filter(pk=instance.documento_id).values_list("sha256", flat=True).first()
+    pk, tokenizador = instance.documento_id, instance.tokenizador
+    transaction.on_commit(lambda: indices.discard_mapped_model(sha256, pk, tokenizador))
+
+# El catálogo de corpus (lenguaje_natural.catalogo) se reconstruye tras cualquier
+# alta, cambio o baja de un documento.
+@receiver(post_save, sender=DocumentoLN)
+@receiver(post_delete, sender=DocumentoLN)
+def invalidar_catalogo(sender, **kwargs):
+    catalogo.invalidate()
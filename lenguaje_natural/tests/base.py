@@ -0,0 +1,30 @@
+import os, shutil, tempfile
+from django.test import TestCase, override_settings
+from lenguaje_natural import catalogo, indices
+from lenguaje_natural.indices import ingest_document
+
+TEXTO = "el perro come carne. el gato come pescado. el perro duerme en la casa.\n"
+
+
+class DocumentosTestCase(TestCase):
+    """MEDIA_ROOT temporal por prueba y cachés del proceso vacíos."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media, NGRAM_MODEL_DIR=None)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        indices._next_word_cache.clear()
+        indices._mapped_models.clear()
+        catalogo.invalidate()
+
+    def escribir(self, nombre, texto=TEXTO):
+        path = os.path.join(self.media, "entrada", nombre)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(texto)
+        return path
+
+    def ingestar(self, nombre="a.txt", texto=TEXTO):
+        return ingest_document(nombre, self.escribir(nombre, texto))
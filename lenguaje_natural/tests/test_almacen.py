@@ -0,0 +1,96 @@
+import os, unittest
+from unittest import mock
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from lenguaje_natural import views
+from lenguaje_natural.almacen import BLOBS_DIR, blob_path, file_digest, link_file, sha256_file, store_file, store_upload
+from lenguaje_natural.models import DocumentoLN
+from .base import DocumentosTestCase, TEXTO
+
+
+class AlmacenTests(DocumentosTestCase):
+    def blobs(self):
+        return sorted(os.path.join(d, f) for d, _, files in os.walk(os.path.join(self.media, BLOBS_DIR)) for f in files)
+
+    def test_store_upload_guarda_cada_contenido_una_vez(self):
+        digest, path, nuevo = store_upload(SimpleUploadedFile("a.txt", TEXTO.encode()))
+        self.assertTrue(nuevo)
+        self.assertEqual(path, blob_path(digest))
+        self.assertEqual(sha256_file(path), digest)
+        again = store_upload(SimpleUploadedFile("otro_nombre.txt", TEXTO.encode()))
+        self.assertEqual(again, (digest, path, False))
+        self.assertEqual(self.blobs(), [path])
+
+    def test_store_upload_enlaza_el_temporal(self):
+        # temporal en el mismo sistema de archivos que MEDIA_ROOT
+        with override_settings(FILE_UPLOAD_TEMP_DIR=self.media):
+            upload = TemporaryUploadedFile("grande.txt", "text/plain", len(TEXTO), "utf-8")
+        upload.write(TEXTO.encode()); upload.flush(); upload.seek(0)
+        self.addCleanup(upload.close)
+        digest, path, nuevo = store_upload(upload)
+        self.assertTrue(nuevo)
+        self.assertTrue(os.path.samefile(upload.temporary_file_path(), path))
+        self.assertEqual([f for f in os.listdir(os.path.dirname(path)) if f.endswith(".tmp")], [])
+
+    def test_store_file(self):
+        src = self.escribir("a.txt")
+        digest, path, nuevo = store_file(src)
+        self.assertEqual((digest, nuevo), (sha256_file(src), True))
+        self.assertTrue(os.path.samefile(src, path))
+        self.assertEqual(store_file(self.escribir("b.txt")), (digest, path, False))
+
+    def test_link_file_y_file_digest(self):
+        a, _, _ = store_upload(SimpleUploadedFile("a.txt", b"uno dos"))
+        b, _, _ = store_upload(SimpleUploadedFile("b.txt", b"tres cuatro"))
+        dest = os.path.join(self.media, "uploads_lenguaje", "last.txt")
+        os.makedirs(os.path.dirname(dest))
+        link_file(a, dest)
+        self.assertTrue(os.path.samefile(dest, blob_path(a)))
+        with mock.patch("lenguaje_natural.almacen.sha256_file") as rehash:
+            self.assertEqual(file_digest(dest), a)
+        rehash.assert_not_called()
+        # volver a enlazar reemplaza el archivo sin tocar el blob anterior
+        link_file(b, dest)
+        self.assertTrue(os.path.samefile(dest, blob_path(b)))
+        with open(blob_path(a), "rb") as fh:
+            self.assertEqual(fh.read(), b"uno dos")
+        self.assertEqual(file_digest(dest), b)
+
+    def test_file_digest_no_confia_en_una_anotacion_vieja(self):
+        a, _, _ = store_upload(SimpleUploadedFile("a.txt", b"uno dos"))
+        dest = os.path.join(self.media, "last.txt")
+        link_file(a, dest)
+        os.remove(dest)
+        with open(dest, "wb") as fh:
+            fh.write(b"otro contenido")
+        self.assertEqual(file_digest(dest), sha256_file(dest))
+        self.assertNotEqual(file_digest(dest), a)
+
+
+@override_settings(TRABAJOS_UMBRAL_BYTES=None)
+class SubidaTests(DocumentosTestCase):
+    def setUp(self):
+        super().setUp()
+        upload_dir = os.path.join(self.media, "uploads_lenguaje")
+        for name, value in (("UPLOAD_DIR", upload_dir), ("LAST_UPLOAD_PATH", os.path.join(upload_dir, "last.txt"))):
+            patcher = mock.patch.object(views, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_subir_dos_veces_el_mismo_contenido(self):
+        r = self.client.post(reverse("lenguaje_natural:upload"), {"file": SimpleUploadedFile("a.txt", TEXTO.encode())})
+        self.assertEqual(r.status_code, 200)
+        doc = DocumentoLN.objects.get()
+        r = self.client.post(reverse("lenguaje_natural:upload"), {"file": SimpleUploadedFile("b.txt", TEXTO.encode())})
+        self.assertContains(r, f"documento #{doc.id}")
+        self.assertEqual(DocumentoLN.objects.count(), 1)
+        blob = blob_path(doc.sha256)
+        for name in ("a.txt", "b.txt", "last.txt"):
+            self.assertTrue(os.path.samefile(os.path.join(views.UPLOAD_DIR, name), blob))
+        self.assertEqual(os.stat(blob).st_nlink, 4)
@@ -0,0 +1,98 @@
+import io, json, os, unittest
+from unittest import mock
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.core.management import call_command
+from lenguaje_natural import corpus_global
+from lenguaje_natural.management.commands import backfill_lenguaje
+from lenguaje_natural.models import DocumentoLN, IndiceNgramasLN
+from .base import DocumentosTestCase, TEXTO
+
+ARCHIVOS = {
+    "lenguaje/a.txt": TEXTO,
+    "lenguaje/sub/b.txt": "la casa del perro. el perro come.\n",
+    "lenguaje/sub/copia_de_a.txt": TEXTO,
+    "uploads_lenguaje/c.csv": "uno,dos,tres\ncuatro,cinco\n",
+    "lenguaje/.oculto.txt": "no se importa",
+    "lenguaje/notas.md": "no se importa",
+}
+IMPORTABLES = [rel for rel in ARCHIVOS if rel.endswith((".txt", ".csv")) and "/." not in rel]
+
+
+class BackfillTodoTests(DocumentosTestCase):
+    def setUp(self):
+        super().setUp()
+        for rel, texto in ARCHIVOS.items():
+            path = os.path.join(self.media, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(texto)
+        self.checkpoint = os.path.join(self.media, ".backfill_lenguaje.json")
+        self.analizados = []
+        analyze_file = backfill_lenguaje.analyze_file
+        def contar(path, **kwargs):
+            self.analizados.append(os.path.relpath(path, self.media))
+            return analyze_file(path, **kwargs)
+        patcher = mock.patch.object(backfill_lenguaje, "analyze_file", contar)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command("backfill_lenguaje", "--todo", "--workers", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def hechos(self):
+        with open(self.checkpoint, encoding="utf-8") as fh:
+            return json.load(fh)["hechos"]
+
+    def test_importa_todo_una_vez_por_contenido(self):
+        self.backfill("--lote", "2")
+        self.assertEqual(DocumentoLN.objects.count(), 3)
+        self.assertEqual(IndiceNgramasLN.objects.count(), 6)
+        self.assertEqual(sorted(self.hechos()), sorted(IMPORTABLES))
+        self.assertTrue(all(r["ok"] for r in corpus_global.check().values()))
+        # sin cambios no queda nada pendiente
+        self.analizados.clear()
+        self.assertIn("0 archivos pendientes", self.backfill())
+        self.assertEqual(self.analizados, [])
+
+    def test_retoma_tras_interrumpirse(self):
+        register = backfill_lenguaje.register_documents
+        lotes = []
+        def registrar(results):
+            if len(lotes) == 2:
+                raise KeyboardInterrupt
+            lotes.append(results)
+            return register(results)
+        with mock.patch.object(backfill_lenguaje, "register_documents", registrar):
+            out = self.backfill("--lote", "1")
+        self.assertIn("Interrumpido tras 2 archivos", out)
+        hechos = self.hechos()
+        self.assertEqual(len(hechos), 2)
+
+        self.analizados.clear()
+        out = self.backfill("--lote", "1")
+        self.assertIn("2 archivos pendientes", out)
+        self.assertEqual(len(self.analizados), 2)
+        self.assertFalse(set(self.analizados) & set(hechos))
+        self.assertEqual(DocumentoLN.objects.count(), 3)
+        self.assertTrue(all(r["ok"] for r in corpus_global.check().values()))
+
+    def test_archivo_modificado_y_reiniciar(self):
+        self.backfill()
+        path = os.path.join(self.media, "lenguaje/sub/b.txt")
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write("el gato también.\n")
+        self.analizados.clear()
+        self.backfill()
+        self.assertEqual(self.analizados, ["lenguaje/sub/b.txt"])
+        self.assertEqual(DocumentoLN.objects.count(), 4)
+        # --reiniciar recorre todo otra vez, pero el contenido ya importado no se duplica
+        self.analizados.clear()
+        self.backfill("--reiniciar")
+        self.assertEqual(sorted(self.analizados), sorted(IMPORTABLES))
+        self.assertEqual(DocumentoLN.objects.count(), 4)
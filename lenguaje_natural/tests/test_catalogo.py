@@ -0,0 +1,85 @@
+import os, unittest
+from unittest import mock
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.test import override_settings
+from lenguaje_natural import catalogo
+from lenguaje_natural.indices import analyze_file, register_documents
+from lenguaje_natural.models import DocumentoLN
+from .base import DocumentosTestCase, TEXTO
+
+
+@override_settings(LENGUAJE_CATALOGO_TTL=3600)
+class CatalogoTests(DocumentosTestCase):
+    def claves(self):
+        return [e.key for e in catalogo.catalog().entries]
+
+    def copiar_a_mano(self, nombre, texto):
+        path = os.path.join(catalogo.corpus_dir(), nombre)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(texto)
+        return path
+
+    def test_se_reutiliza_mientras_no_cambia(self):
+        self.ingestar()
+        self.assertIs(catalogo.catalog(), catalogo.catalog())
+        self.assertIsNot(catalogo.catalog(refresh=True), catalogo.catalog(refresh=True))
+
+    def test_alta_y_baja_invalidan(self):
+        self.assertEqual(self.claves(), [])
+        doc = self.ingestar()
+        self.assertEqual(self.claves(), [str(doc.id)])
+        self.assertEqual(catalogo.get(doc.id).num_tokens, doc.indices.get(tokenizador="simple").num_tokens)
+        doc.delete()
+        self.assertEqual(self.claves(), [])
+        self.assertIsNone(catalogo.get(doc.id))
+
+    def test_carga_masiva_invalida(self):
+        self.claves()
+        docs = register_documents([analyze_file(self.escribir("a.txt"))])
+        self.assertEqual(self.claves(), [str(docs[0].id)])
+
+    def test_cambios_de_otro_proceso(self):
+        viejo = catalogo.catalog()
+        # bulk_create no emite señales: es lo que ve este proceso cuando otro da de alta un documento
+        doc, = DocumentoLN.objects.bulk_create([DocumentoLN(nombre_original="otro.txt", archivo="blobs/x")])
+        with mock.patch.object(catalogo, "STAMP_INTERVAL", 3600):
+            self.assertIs(catalogo.catalog(), viejo)
+        with mock.patch.object(catalogo, "STAMP_INTERVAL", 0):
+            self.assertIn(str(doc.id), self.claves())
+
+    def test_archivos_copiados_a_mano_esperan_al_ttl(self):
+        doc = self.ingestar()
+        self.claves()
+        self.copiar_a_mano("suelto.txt", "un corpus copiado a mano.\n")
+        self.copiar_a_mano("sub/mismo.txt", TEXTO)
+        self.assertNotIn("fs:suelto.txt", self.claves())
+        with override_settings(LENGUAJE_CATALOGO_TTL=0):
+            self.assertEqual(self.claves(), [str(doc.id), "fs:suelto.txt"])
+        # el mismo contenido que un documento es un alias de su entrada
+        self.assertIs(catalogo.get("fs:sub/mismo.txt"), catalogo.get(doc.id))
+        self.assertEqual(catalogo.get("fs:suelto.txt").num_tokens, 6)
+        self.assertIn("6 tokens", catalogo.get("fs:suelto.txt").label)
+
+    def test_archivos_sueltos_se_leen_una_vez_mientras_no_cambian(self):
+        path = self.copiar_a_mano("suelto.txt", "un corpus copiado a mano.\n")
+        leidos = []
+        def file_digest(p):
+            leidos.append(os.path.basename(p))
+            return digest(p)
+        digest = catalogo.file_digest
+        with mock.patch.object(catalogo, "file_digest", file_digest), override_settings(LENGUAJE_CATALOGO_TTL=0):
+            self.assertEqual(catalogo.get("fs:suelto.txt").num_tokens, 6)
+            catalogo.catalog(refresh=True)
+            self.assertEqual(leidos, ["suelto.txt"])
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write("y una línea más.\n")
+            self.assertEqual(catalogo.get("fs:suelto.txt").num_tokens, 11)
+            self.assertEqual(leidos, ["suelto.txt", "suelto.txt"])
+            os.remove(path)
+            self.assertIsNone(catalogo.get("fs:suelto.txt"))
+            self.assertNotIn(path, catalogo._archivos)
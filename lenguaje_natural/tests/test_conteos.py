@@ -0,0 +1,45 @@
+import unittest
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.test import TestCase
+from lenguaje_natural import conteos
+from lenguaje_natural.models import DocumentoLN
+
+
+class ConsultasTests(TestCase):
+    def documento(self, nombre, index):
+        doc = DocumentoLN.objects.create(nombre_original=nombre, sha256=nombre, archivo=f"blobs/{nombre}")
+        conteos.store_counts(doc.id, index)
+        return doc
+
+    def setUp(self):
+        self.a = self.documento("a", {"orders": {"1": {"perro": 3, "gato": 1}, "2": {"perro come": 2, "gato come": 1}}})
+        self.b = self.documento("b", {"orders": {"1": {"gato": 4, "casa": 1}, "2": {"gato come": 3, "perro come": 2}},
+                                      "orders_wb": {"2": {"<s> gato": 4}}})
+        self.c = self.documento("c", {"orders": {"1": {"casa": 2}, "2": {"la casa": 2}}})
+
+    def test_top_ngrams(self):
+        self.assertEqual(conteos.top_ngrams(2), [("gato come", 4, 2), ("perro come", 4, 2), ("la casa", 2, 1)])
+        self.assertEqual(conteos.top_ngrams(1, limit=2), [("gato", 5, 2), ("casa", 3, 2)])
+        self.assertEqual(conteos.top_ngrams(3), [])
+
+    def test_top_for_document(self):
+        self.assertEqual(conteos.top_for_document(self.b.id, 2), [("gato come", 3), ("perro come", 2)])
+        self.assertEqual(conteos.top_for_document(self.a.id, 1, limit=1), [("perro", 3)])
+
+    def test_documents_with(self):
+        docs = conteos.documents_with("gato  come")
+        self.assertEqual([(d.id, d.veces) for d in docs], [(self.b.id, 3), (self.a.id, 1)])
+        self.assertEqual([d.id for d in conteos.documents_with("casa")], [self.c.id, self.b.id])
+        # sólo se materializa la variante sin fronteras
+        self.assertFalse(conteos.documents_with("<s> gato").exists())
+        self.assertFalse(conteos.documents_with("perro duerme").exists())
+
+    def test_store_counts_reemplaza(self):
+        conteos.store_counts(self.a.id, {"orders": {"1": {"pez": 1}}})
+        self.assertEqual(conteos.top_for_document(self.a.id, 1), [("pez", 1)])
+        self.assertEqual(conteos.top_for_document(self.a.id, 2), [])
+        self.assertEqual(conteos.top_ngrams(2)[0], ("gato come", 3, 1))
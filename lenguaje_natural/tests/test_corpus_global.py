@@ -0,0 +1,105 @@
+import unittest
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.test import TestCase, override_settings
+from lenguaje_natural import corpus_global
+from lenguaje_natural.indices import build_indexes, load_index
+from lenguaje_natural.models import ConteoGlobalLN, ConteoNgramaLN, CorpusGlobalLN
+from .base import DocumentosTestCase
+
+
+def _tabla(tokenizador="t", fronteras=False, n=2):
+    rows = ConteoGlobalLN.objects.filter(tokenizador=tokenizador, fronteras=fronteras, n=n)
+    return dict(rows.values_list("ngrama", "conteo"))
+
+def _totales(tokenizador="t"):
+    corpus = CorpusGlobalLN.objects.get(tokenizador=tokenizador)
+    return corpus.documentos, corpus.num_tokens, corpus.num_tokens_wb
+
+def _indice(num_tokens, bigramas, bigramas_wb=None):
+    index = {"num_tokens": num_tokens, "orders": {"2": bigramas}}
+    if bigramas_wb is not None:
+        index["num_tokens_wb"] = num_tokens + 3
+        index["orders_wb"] = {"2": bigramas_wb}
+    return index
+
+
+class ApplyCountsTests(TestCase):
+    def test_suma_y_resta(self):
+        totals = {"documentos": 1, "num_tokens": 5, "num_tokens_wb": 8}
+        corpus_global.apply_counts("t", totals, {(False, 2): {"a b": 2, "b c": 1}})
+        corpus_global.apply_counts("t", totals, {(False, 2): {"a b": 1, "c d": 3}})
+        self.assertEqual(_tabla(), {"a b": 3, "b c": 1, "c d": 3})
+        self.assertEqual(_totales(), (2, 10, 16))
+        corpus_global.apply_counts("t", totals, {(False, 2): {"a b": 2, "b c": 1}}, sign=-1)
+        # los n-gramas que quedan en cero se borran
+        self.assertEqual(_tabla(), {"a b": 1, "c d": 3})
+        self.assertEqual(_totales(), (1, 5, 8))
+
+    def test_muchos_ngramas_por_bloques(self):
+        raw = {f"w{i} x": 1 + i % 3 for i in range(corpus_global.CHUNK_SIZE * 2 + 7)}
+        corpus_global.apply_counts("t", {"documentos": 1}, {(False, 2): raw})
+        self.assertEqual(_tabla(), raw)
+        corpus_global.apply_counts("t", {"documentos": 1}, {(False, 2): raw}, sign=-1)
+        self.assertEqual(_tabla(), {})
+
+    def test_replace_index(self):
+        viejo = _indice(4, {"a b": 2, "b c": 1}, {"<s> a": 1})
+        nuevo = _indice(3, {"a b": 1, "c d": 1}, {"<s> c": 1})
+        corpus_global.replace_index("t", None, viejo)
+        self.assertEqual(_tabla(fronteras=True), {"<s> a": 1})
+        corpus_global.replace_index("t", viejo, nuevo)
+        self.assertEqual(_tabla(), {"a b": 1, "c d": 1})
+        self.assertEqual(_tabla(fronteras=True), {"<s> c": 1})
+        self.assertEqual(_totales(), (1, 3, 6))
+        corpus_global.replace_index("t", nuevo, None)
+        self.assertEqual((_tabla(), _tabla(fronteras=True)), ({}, {}))
+        self.assertEqual(_totales(), (0, 0, 0))
+
+    def test_apply_indices_junta_los_documentos(self):
+        corpus_global.apply_indices("t", [_indice(2, {"a b": 1}), _indice(3, {"a b": 2, "b c": 1})])
+        self.assertEqual(_tabla(), {"a b": 3, "b c": 1})
+        self.assertEqual(_totales()[:2], (2, 5))
+
+
+class SenalesTests(DocumentosTestCase):
+    def assertCorpusCorrecto(self):
+        report = corpus_global.check()
+        self.assertTrue(report, "el corpus global está vacío")
+        self.assertTrue(all(r["ok"] for r in report.values()), report)
+
+    def test_alta_cambio_y_baja_de_indices(self):
+        doc = self.ingestar("a.txt")
+        otro = self.ingestar("b.txt", "la casa del perro. el perro come.\n")
+        self.assertCorpusCorrecto()
+        self.assertEqual(CorpusGlobalLN.objects.get(tokenizador="simple").documentos, 2)
+        # reescribir el índice (update_or_create) resta el anterior y suma el nuevo
+        build_indexes(doc, text="el gato duerme. el gato come.")
+        self.assertCorpusCorrecto()
+        self.assertEqual(CorpusGlobalLN.objects.get(tokenizador="simple").documentos, 2)
+        doc.delete()
+        self.assertCorpusCorrecto()
+        self.assertEqual(CorpusGlobalLN.objects.get(tokenizador="simple").documentos, 1)
+        otro.delete()
+        self.assertFalse(ConteoGlobalLN.objects.exists())
+
+    def test_conteos_materializados(self):
+        doc = self.ingestar()
+        index = load_index(doc, "limpio")
+        rows = dict(ConteoNgramaLN.objects.filter(documento=doc, n=2).values_list("ngrama", "conteo"))
+        self.assertEqual(rows, index["orders"]["2"])
+        build_indexes(doc, text="un texto distinto")
+        rows = dict(ConteoNgramaLN.objects.filter(documento=doc, n=1).values_list("ngrama", "conteo"))
+        self.assertEqual(rows, load_index(doc, "limpio")["orders"]["1"])
+        self.assertNotIn("perro", rows)
+        doc.delete()
+        self.assertFalse(ConteoNgramaLN.objects.exists())
+
+    @override_settings(LENGUAJE_CORPUS_GLOBAL=False)
+    def test_desactivado(self):
+        self.ingestar()
+        self.assertFalse(ConteoGlobalLN.objects.exists())
+        self.assertFalse(CorpusGlobalLN.objects.exists())
@@ -0,0 +1,84 @@
+import os, sys, threading, unittest
+from unittest import mock
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from ngram.services import np
+from lenguaje_natural import indices
+from lenguaje_natural.indices import (TOKENIZADORES, build_indexes, discard_mapped_model, load_file_next_word_index,
+                                      load_next_word_index, model_path)
+from lenguaje_natural.models import DocumentoLN
+from .base import DocumentosTestCase
+
+
+@unittest.skipIf(np is None, "los modelos binarios requieren numpy")
+class ModeloMapeadoTests(DocumentosTestCase):
+    def test_borrar_documento_borra_sus_modelos(self):
+        doc = self.ingestar()
+        paths = [model_path(doc, name) for name in TOKENIZADORES]
+        self.assertTrue(all(os.path.exists(p) for p in paths))
+        load_next_word_index(doc, 2, modelo="kneser_ney")
+        self.assertTrue(any(k[0] == doc.sha256 for k in indices._next_word_cache))
+        with self.captureOnCommitCallbacks(execute=True):
+            doc.delete()
+        self.assertFalse(any(os.path.exists(p) for p in paths))
+        self.assertFalse(any(k[0] == doc.sha256 for k in indices._next_word_cache))
+        self.assertFalse(any(p in indices._mapped_models for p in paths))
+
+    def test_borrar_un_indice_solo_borra_su_modelo(self):
+        doc = self.ingestar()
+        with self.captureOnCommitCallbacks(execute=True):
+            doc.indices.filter(tokenizador="limpio").delete()
+        self.assertFalse(os.path.exists(model_path(doc, "limpio")))
+        self.assertTrue(os.path.exists(model_path(doc, "simple")))
+
+    def test_modelo_compartido_por_el_mismo_contenido(self):
+        doc = self.ingestar()
+        copia = DocumentoLN.objects.create(nombre_original="copia.txt", sha256=doc.sha256, archivo=doc.archivo.name)
+        build_indexes(copia)
+        path = model_path(doc, "simple")
+        with self.captureOnCommitCallbacks(execute=True):
+            doc.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            copia.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_sin_confirmar_no_se_borra(self):
+        doc = self.ingestar()
+        with self.captureOnCommitCallbacks(execute=False) as pendientes:
+            doc.delete()
+        self.assertTrue(os.path.exists(model_path(doc, "simple")))
+        self.assertEqual(len(pendientes), len(TOKENIZADORES))
+
+
+class NextWordCacheTests(DocumentosTestCase):
+    def test_uso_concurrente(self):
+        paths = [self.escribir(f"{i}.txt", f"texto {i} de prueba. otro {i} más.") for i in range(6)]
+        errores = []
+        def consultar(i):
+            try:
+                for j in range(60):
+                    k = (i + j) % len(paths)
+                    lm = load_file_next_word_index(paths[k], f"sha{k}", 2, with_bound=j % 2 == 0)
+                    lm.probs(("texto",))
+                    if j % 5 == 0:
+                        discard_mapped_model(f"sha{k}", None, "simple")
+            except Exception as ex:
+                errores.append(ex)
+        # ningún otro documento conserva el índice: discard_mapped_model recorre y vacía el LRU
+        sin_indices = mock.Mock(**{"filter.return_value.exists.return_value": False})
+        # cambios de hilo mucho más frecuentes para que las carreras aparezcan
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        with mock.patch.object(indices, "NEXT_WORD_CACHE_SIZE", 4), \
+                mock.patch.object(indices.IndiceNgramasLN, "objects", sin_indices):
+            hilos = [threading.Thread(target=consultar, args=(i,)) for i in range(8)]
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+        self.assertEqual(errores, [])
+        self.assertLessEqual(len(indices._next_word_cache), 4)
@@ -9,4 +9,5 @@ urlpatterns = [
     path("upload/", views.upload, name="upload"),
     path("cargar/", views.upload, name="cargar"),
     path("histograma/", views.histograma, name="histograma"),
+    path("exportar/", views.exportar, name="exportar"),
 ]
@@ -27,11 +27,10 @@ STOPWORDS_ES = {
     "usan","usar","usas","uso","usted","ustedes","va","vais","valor","vamos","van","varias","varios","vaya","verdad","verdadera",
     "vosotras","vosotros","voy","vuestra","vuestras","vuestro","vuestros","y","ya","yo"
 }
-NON_WORD_RE = re.compile(r"[^\wáéíóúñÁÉÍÓÚÑ\s]", flags=re.UNICODE)
+# Una sola pasada: los signos ya separan palabras (no son \w), así que no hace
+# falta sustituirlos antes, y {3,} descarta las palabras de 1-2 letras.
+CLEAN_TOKEN_RE = re.compile(r"\w{3,}", flags=re.UNICODE)
 def clean_and_tokenize(text: str):
     if not isinstance(text, str):
         text = str(text or "")
-    text = text.lower()
-    text = NON_WORD_RE.sub(" ", text)
-    tokens = re.findall(r"[\wáéíóúñÁÉÍÓÚÑ]+", text, flags=re.UNICODE)
-    return [t for t in tokens if t not in STOPWORDS_ES and len(t) > 2]
+    return [t for t in CLEAN_TOKEN_RE.findall(text.lower()) if t not in STOPWORDS_ES]
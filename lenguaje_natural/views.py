@@ -1,12 +1,23 @@
-import os, json, collections
+import os, json, collections, itertools
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django import forms
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_protect
 from django.core.files.base import ContentFile
-from .utils import clean_and_tokenize
 from .models import DocumentoLN
-from ngram.services import ngram_frequencies
+from ngram.services import frequencies_from_counts, index_counts, count_file, iter_ranked, iter_text_chunks, iter_tokens, rank_ngrams
+from ngram.cache import cached_result
+from ngram.export import export_response, EXPORT_FORMATS
+from ngram.tokenizers import get_tokenizer
+from trabajos.cola import encolar, en_segundo_plano
+from .almacen import file_digest, link_file, store_upload
+from .indices import find_document, ingest_document, index_for_file, ngram_workers
+
+# Tokenizador (ngram.tokenizers) de las tablas de /lenguaje/
+TOKENIZER = "limpio"
 
 class UploadForm(forms.Form):
     file = forms.FileField(label="Archivo (.txt o .csv)")
@@ -43,31 +54,39 @@ def _parse_n(request, default_n=2):
         n = int(default_n)
     return max(1, min(n, 10))
 
-def _ngram_table(tokens, n):
-    if n == 1:
-        import collections
-        return sorted(collections.Counter(tokens).items(), key=lambda kv: (-kv[1], kv[0]))[:50]
-    from ngram.services import ngram_frequencies
-    freqs = ngram_frequencies(tokens, n)
-    return sorted(freqs.items(), key=lambda kv: (-kv[1], kv[0]))[:50]
+def _ngram_table(counts, n):
+    return counts.frequencies(n, limit=50)
 
 
 
-def _compute_all(text, n=None):
-    tokens = clean_and_tokenize(text)
-    top_unigrams = collections.Counter(tokens).most_common(30)
+def _compute_all(path, n=None):
+    """Lee el archivo por bloques y cuenta (una sola vez) todos los órdenes que se muestran."""
+    corpus = count_file(path, max(3, n or 1), tokenize=get_tokenizer(TOKENIZER), workers=ngram_workers())
+    counts = corpus.plain
+    top_unigrams = counts.frequencies(1, limit=30)
     # tablas fijas
-    bigram_tabla = _ngram_table(tokens, 2)
-    trigram_tabla = _ngram_table(tokens, 3)
+    bigram_tabla = _ngram_table(counts, 2)
+    trigram_tabla = _ngram_table(counts, 3)
     # tabla configurable
-    ngram_tabla = _ngram_table(tokens, n) if n else None
-    return tokens, top_unigrams, bigram_tabla, trigram_tabla, ngram_tabla
+    ngram_tabla = _ngram_table(counts, n) if n else None
+    return corpus.preview, top_unigrams, bigram_tabla, trigram_tabla, ngram_tabla
+
+
+def _compute_from_index(index, n=None):
+    """Igual que _compute_all pero leyendo los conteos precalculados del índice."""
+    def table(k, limit):
+        return frequencies_from_counts(index_counts(index, k), limit=limit)
+    top_unigrams = table(1, 30)
+    ngram_tabla = table(n, 50) if n else None
+    return index.get("preview", []), top_unigrams, table(2, 50), table(3, 50), ngram_tabla
 
 
 
 
-def _render_index(request, msg=None, tokens=None, tabla=None, bigram_tabla=None, trigram_tabla=None, ngram_tabla=None, ngram_n=None, status_code=200):
+def _render_index(request, msg=None, tokens=None, tabla=None, bigram_tabla=None, trigram_tabla=None, ngram_tabla=None, ngram_n=None, status_code=200, pagina=None):
     ctx = {
+        "pagina": pagina,
+        "ngram_offset": pagina["offset"] if pagina else 0,
         "form": UploadForm(),
         "msg": msg,
         "tokens": tokens,
@@ -99,39 +118,108 @@ def upload(request):
     if not (fname.endswith(".txt") or fname.endswith(".csv")):
         return _render_index(request, "Solo se permiten .txt o .csv", None, None, None, None, status_code=400)
 
-    # Guardar archivo en carpeta uploads
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    save_path = os.path.join(UPLOAD_DIR, f.name)
-    with open(save_path, "wb") as dest:
-        for chunk in f.chunks():
-            dest.write(chunk)
+    # Guardar el contenido una sola vez (almacén por sha256); la copia en la carpeta
+    # uploads y el "último" para otros módulos son enlaces al mismo blob
+    digest, blob, _ = store_upload(f)
+    link_file(digest, os.path.join(UPLOAD_DIR, os.path.basename(f.name)))
+    link_file(digest, LAST_UPLOAD_PATH)
 
-    # Guardar como "último" para otros módulos si hace falta
-    with open(LAST_UPLOAD_PATH, "wb") as dest:
-        for chunk in f.chunks():
-            dest.write(chunk)
+    # Mismo contenido que un documento ya indexado: se reutiliza tal cual
+    doc = find_document(digest)
+    if doc is not None:
+        msg = f"Archivo subido con éxito (mismo contenido que el documento #{doc.id}: se reutilizan sus índices)."
+        return _render_index(request, msg, None, None, None, None)
+
+    # Archivo grande: registrar e indexar en la cola de trabajos y responder con su id
+    if en_segundo_plano(f.size):
+        trabajo = encolar("lenguaje.ingestar", nombre=f.name, path=blob)
+        msg = (f"Archivo recibido: se procesa en segundo plano (trabajo #{trabajo.id}). "
+               f"Estado en {reverse('trabajos:estado', args=[trabajo.id])}")
+        return _render_index(request, msg, None, None, None, None, status_code=202)
+
+    # Registrar el documento y precalcular su índice de n-gramas
+    ingest_document(f.name, blob, digest=digest)
 
     return _render_index(request, "Archivo subido con éxito. Ahora puedes procesarlo en la sección que necesites.", None, None, None, None)
 def histograma(request):
     if not os.path.exists(LAST_UPLOAD_PATH):
         return _render_index(request, "No hay archivo. Sube uno primero.", None, None, None, None, status_code=400)
-    text = open(LAST_UPLOAD_PATH, "r", encoding="utf-8", errors="ignore").read()
-    tokens, tabla, bigram_tabla, trigram_tabla, ngram_tabla = _compute_all(text, _get_n_from_request(request))
-    return _render_index(request, None, tokens[:50], tabla, bigram_tabla, trigram_tabla, ngram_tabla, ngram_n=_get_n_from_request(request))
+    n = _get_n_from_request(request)
+    digest = file_digest(LAST_UPLOAD_PATH)
+
+    def compute():
+        index = index_for_file(LAST_UPLOAD_PATH, TOKENIZER, max(n, 3), digest=digest)
+        if index is not None:
+            tokens, *tablas = _compute_from_index(index, n)
+        else:
+            tokens, *tablas = _compute_all(LAST_UPLOAD_PATH, n)
+        return (tokens[:50], *tablas)
+
+    tokens, tabla, bigram_tabla, trigram_tabla, ngram_tabla = cached_result("histograma", digest, n, compute, tokenizer=TOKENIZER)
+    return _render_index(request, None, tokens[:50], tabla, bigram_tabla, trigram_tabla, ngram_tabla, ngram_n=n)
+
+
+# Filas por página de la tabla de n-gramas en /lenguaje/calcular/
+CALCULAR_PAGE_SIZE = 100
 
 
 @csrf_protect
 def calcular(request):
-    """Calcula n-gramas (n>=2) bajo demanda usando el último archivo subido."""
+    """
+    Calcula n-gramas (n>=2) bajo demanda usando el último archivo subido. Los
+    conteos salen del índice guardado (_conteos_ultimo_archivo) y cada página se
+    guarda en la caché de resultados.
+    """
     n = _get_n_from_request(request)
     if not os.path.exists(LAST_UPLOAD_PATH):
         return _render_index(request, "No hay archivo. Sube uno primero.", None, None, None, None, status_code=400)
-    text = open(LAST_UPLOAD_PATH, "r", encoding="utf-8", errors="ignore").read()
-    tokens = clean_and_tokenize(text)
-    from ngram.services import ngram_frequencies as _freq
-    unis = _freq(tokens, 1)[:30]  # Top 30 palabras (unigramas)
-    ngram_tabla = _freq(tokens, n)
+    try:
+        page = max(1, int(request.GET.get("page", "1")))
+    except ValueError:
+        page = 1
+    offset = (page - 1) * CALCULAR_PAGE_SIZE
+    digest = file_digest(LAST_UPLOAD_PATH)
+
+    def compute():
+        counts = _conteos_ultimo_archivo(n, digest)
+        unigramas = counts if n == 1 else _conteos_ultimo_archivo(1, digest)
+        # los primeros tokens sólo necesitan el comienzo del archivo
+        tokens = list(itertools.islice(iter_tokens(iter_text_chunks(LAST_UPLOAD_PATH), get_tokenizer(TOKENIZER)), 50))
+        unis = rank_ngrams(unigramas.items(), limit=30)  # Top 30 palabras (unigramas)
+        return tokens, unis, rank_ngrams(counts.items(), limit=CALCULAR_PAGE_SIZE, offset=offset), len(counts)
+
+    tokens, unis, ngram_tabla, total = cached_result("calcular", digest, n, compute, tokenizer=TOKENIZER,
+                                                     page=(offset, CALCULAR_PAGE_SIZE))
+    pagina = {
+        "page": page,
+        "offset": offset,
+        "total": total,
+        "prev": page - 1 if page > 1 else None,
+        "next": page + 1 if offset + CALCULAR_PAGE_SIZE < total else None,
+    }
     bigram_tabla = []
     trigram_tabla = []
     msg = f"Cálculo realizado con n={n}."
-    return _render_index(request, msg, tokens[:50], unis, bigram_tabla, trigram_tabla, ngram_tabla, ngram_n=n)
+    return _render_index(request, msg, tokens, unis, bigram_tabla, trigram_tabla, ngram_tabla, ngram_n=n, pagina=pagina)
+
+
+def _conteos_ultimo_archivo(n, digest=None):
+    index = index_for_file(LAST_UPLOAD_PATH, TOKENIZER, n, digest=digest)
+    if index is not None:
+        return index_counts(index, n)
+    return count_file(LAST_UPLOAD_PATH, n, tokenize=get_tokenizer(TOKENIZER), workers=ngram_workers()).plain[n]
+
+
+async def exportar(request):
+    """
+    Descarga en streaming (CSV o NDJSON) la tabla completa de n-gramas del último archivo subido.
+    Es async: los conteos se cargan en un hilo y las filas se envían por bloques.
+    """
+    if not os.path.exists(LAST_UPLOAD_PATH):
+        return HttpResponse("No hay archivo. Sube uno primero.", status=400)
+    n = _get_n_from_request(request)
+    formato = request.GET.get("formato", "csv")
+    if formato not in EXPORT_FORMATS:
+        return HttpResponse("Formato no soportado (usa csv o ndjson).", status=400)
+    counts = await sync_to_async(_conteos_ultimo_archivo)(n)
+    return export_response(iter_ranked(counts.items()), ("ngrama", "frecuencia"), formato, f"ngramas_n{n}", asynchronous=True)
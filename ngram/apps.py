@@ -3,4 +3,10 @@ from django.apps import AppConfig
 class NgramConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ngram"
-    verbose_name = "N-gram Analysis"
\ No newline at end of file
+    verbose_name = "N-gram Analysis"
+    def ready(self):
+        from . import tokenizers
+        # Tokenizadores importados una sola vez por proceso. Los presets no se
+        # precargan aquí (ready() corre también en cada comando y en cada proceso
+        # del pool o de la cola): los precargan sistema/asgi.py y sistema/wsgi.py.
+        tokenizers.load_tokenizers()
@@ -0,0 +1,88 @@
+import hashlib, pickle, threading
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches, InvalidCacheBackendError
+from .services import INDEX_VERSION
+
+# Caché de resultados direccionada por contenido: la misma entrada (texto o
+# archivo), el mismo n, la misma variante de fronteras y el mismo tokenizador
+# producen la misma clave, así que un análisis repetido no se recalcula.
+# Se guardan páginas de tablas (o resultados ya acotados), no tablas completas;
+# una entrada que serializada supera NGRAM_CACHE_MAX_BYTES no se guarda, porque
+# MAX_ENTRIES sólo limita el número de entradas, no su tamaño.
+# Subir CACHE_VERSION invalida todo lo guardado al cambiar los algoritmos.
+CACHE_VERSION = 2
+
+# Aciertos/fallos de este proceso: fuera de la caché, para que no se expulsen ni
+# se descarten junto con los resultados
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def max_entry_bytes() -> int:
+    return int(getattr(settings, "NGRAM_CACHE_MAX_BYTES", 1 << 20))
+
+def results_cache():
+    """Backend de la caché de resultados (alias NGRAM_CACHE_ALIAS, por defecto 'ngram')."""
+    alias = getattr(settings, "NGRAM_CACHE_ALIAS", "ngram")
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def tokens_digest(tokens) -> str:
+    # los tokens no contienen espacios: unirlos con \x00 no es ambiguo
+    return hashlib.sha256("\x00".join(map(str, tokens)).encode("utf-8")).hexdigest()
+
+def result_key(kind, digest, n, boundaries=False, tokenizer="simple", page=None):
+    # page = (offset, limit) de la página guardada; None para resultados sin paginar
+    page = "" if page is None else ":{}+{}".format(*page)
+    return f"ngram:{kind}:{digest}:{n}:{int(bool(boundaries))}:{tokenizer}{page}:{INDEX_VERSION}.{CACHE_VERSION}"
+
+def _fits(value) -> bool:
+    return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) <= max_entry_bytes()
+
+def cached_result(kind, digest, n, compute, boundaries=False, tokenizer="simple", page=None):
+    """
+    Devuelve el resultado guardado para (kind, digest, n, boundaries, tokenizer, page)
+    o lo calcula con `compute()` y lo guarda si cabe en NGRAM_CACHE_MAX_BYTES.
+    Lleva contadores de aciertos/fallos.
+    """
+    cache = results_cache()
+    key = result_key(kind, digest, n, boundaries, tokenizer, page)
+    value = cache.get(key)
+    if value is not None:
+        _count("hits")
+        return value
+    _count("misses")
+    value = compute()
+    if _fits(value):
+        cache.set(key, value, None)
+    return value
+
+async def acached_result(kind, digest, n, compute, boundaries=False, tokenizer="simple", page=None):
+    """Versión async de cached_result: `compute` es una función async (p. ej. sobre run_in_pool)."""
+    cache = results_cache()
+    key = result_key(kind, digest, n, boundaries, tokenizer, page)
+    value = await cache.aget(key)
+    if value is not None:
+        _count("hits")
+        return value
+    _count("misses")
+    value = await compute()
+    if _fits(value):
+        await cache.aset(key, value, None)
+    return value
+
+def cache_stats():
+    """ Aciertos y fallos de la caché de resultados en este proceso desde que arrancó. """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": (hits / total) if total else 0.0}
@@ -0,0 +1,67 @@
+import csv, io, json
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+# Descarga de tablas completas (frecuencias, probabilidades) en streaming:
+# las filas salen de un generador y se envían en bloques, sin construir la
+# lista de filas ni la página HTML.
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+EXPORT_CHUNK_ROWS = 1000
+
+def _chunks(rows, size=EXPORT_CHUNK_ROWS):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_csv(rows, header):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    yield buf.getvalue()
+    for chunk in _chunks(rows):
+        buf.seek(0); buf.truncate()
+        writer.writerows(chunk)
+        yield buf.getvalue()
+
+def iter_ndjson(rows, header):
+    for chunk in _chunks(rows):
+        yield "".join(json.dumps(dict(zip(header, row)), ensure_ascii=False) + "\n" for row in chunk)
+
+# Bajo ASGI, Django consume un iterador síncrono entero (sync_to_async(list))
+# antes de enviar el primer byte. Las variantes async avanzan el iterador
+# síncrono bloque a bloque en un hilo, así el streaming es real y el ordenamiento
+# y el formateo no bloquean el event loop.
+async def _in_thread(body):
+    body = iter(body)
+    step = sync_to_async(lambda: next(body, None), thread_sensitive=False)
+    while (piece := await step()) is not None:
+        yield piece
+
+def aiter_csv(rows, header):
+    return _in_thread(iter_csv(rows, header))
+
+def aiter_ndjson(rows, header):
+    return _in_thread(iter_ndjson(rows, header))
+
+def export_response(rows, header, formato, filename, asynchronous=False):
+    """
+    StreamingHttpResponse (adjunto) con las filas en CSV o NDJSON.
+    Desde vistas async, pasar asynchronous=True para que el cuerpo sea un
+    iterador async y no se arme completo en memoria.
+    """
+    if formato not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {formato!r} (usa csv o ndjson)")
+    if asynchronous:
+        body = aiter_csv(rows, header) if formato == "csv" else aiter_ndjson(rows, header)
+    else:
+        body = iter_csv(rows, header) if formato == "csv" else iter_ndjson(rows, header)
+    response = StreamingHttpResponse(body, content_type=EXPORT_FORMATS[formato])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{formato}"'
+    return response
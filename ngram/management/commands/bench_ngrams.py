@@ -0,0 +1,56 @@
+import random, time, tracemalloc
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ngram.services import default_simple_tokenize, count_ngrams, np
+
+class Command(BaseCommand):
+    help = "Compara tiempo y memoria del conteo de n-gramas con Counter de tuplas vs. representación compacta (NumPy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", action="append", default=[], help="Archivo de texto a usar como corpus (repetible).")
+        parser.add_argument("--tokens", type=int, default=300000, help="Tamaño del corpus sintético si no se indica --file.")
+        parser.add_argument("--vocab", type=int, default=20000, help="Vocabulario del corpus sintético (distribución tipo Zipf).")
+        parser.add_argument("--max-n", type=int, default=3)
+
+    def _measure(self, tokens, max_n, compact):
+        # tiempo sin tracemalloc (lo distorsiona); memoria en una segunda corrida
+        t0 = time.perf_counter()
+        counts = count_ngrams(tokens, max_n, compact=compact)
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        counts.frequencies(2 if max_n >= 2 else 1)
+        table = time.perf_counter() - t0
+        del counts
+        tracemalloc.start()
+        counts = count_ngrams(tokens, max_n, compact=compact)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return build, table, retained, peak
+
+    def _synthetic(self, size, vocab):
+        # Palabras a partir del vocabulario de los corpus de ejemplo, con frecuencias tipo Zipf
+        base = default_simple_tokenize((Path(settings.BASE_DIR) / "docs" / "corpus_julieta_fierro.txt").read_text(encoding="utf-8"))
+        words = [f"{base[i % len(base)]}{i // len(base) or ''}" for i in range(vocab)] if base else [f"w{i}" for i in range(vocab)]
+        rng = random.Random(0)
+        return rng.choices(words, weights=[1 / (r + 1) for r in range(vocab)], k=size)
+
+    def handle(self, *args, **opts):
+        if np is None:
+            raise CommandError("Este benchmark requiere NumPy (pip install numpy).")
+        if opts["file"]:
+            text = "\n".join(Path(p).read_text(encoding="utf-8", errors="ignore") for p in opts["file"])
+            tokens = default_simple_tokenize(text)
+        else:
+            tokens = self._synthetic(opts["tokens"], opts["vocab"])
+        max_n = opts["max_n"]
+        self.stdout.write(f"tokens={len(tokens)} vocabulario={len(set(tokens))} max_n={max_n}")
+        self.stdout.write(f"{'modo':<10}{'conteo (s)':>12}{'tabla n=2 (s)':>15}{'memoria (MB)':>15}{'pico (MB)':>12}")
+        rows = {}
+        for name, compact in (("counter", False), ("compacto", True)):
+            build, table, retained, peak = rows[name] = self._measure(tokens, max_n, compact)
+            self.stdout.write(f"{name:<10}{build:>12.4f}{table:>15.4f}{retained / 2**20:>15.2f}{peak / 2**20:>12.2f}")
+        (b0, _, m0, _), (b1, _, m1, _) = rows["counter"], rows["compacto"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacto: {m0 / max(m1, 1):.1f}x menos memoria retenida, {b0 / max(b1, 1e-9):.1f}x en tiempo de conteo."
+        ))
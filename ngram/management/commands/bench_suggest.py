@@ -0,0 +1,91 @@
+import random, time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from ngram.presets import all_presets, preset_max_n
+from ngram.suggest import catalogo, get_suggester, sentences, suggest_query
+
+class Command(BaseCommand):
+    help = ("Latencia de /ngrams/autocomplete/suggest: simula pulsaciones (prefijos de oraciones del propio corpus) "
+            "y mide p50/p95/p99 del modelo y de la petición HTTP completa.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", action="append", default=[],
+                            help="Preset o clave del catálogo (repetible). Por defecto, los presets y los 5 documentos más recientes.")
+        parser.add_argument("--queries", type=int, default=2000, help="Consultas por corpus.")
+        parser.add_argument("--k", type=int, default=5)
+        parser.add_argument("--n", type=int, default=None, help="Orden del modelo (por defecto NGRAM_INDEX_MAX_N).")
+        parser.add_argument("--target-ms", type=float, default=5.0, help="Objetivo de p99 de la petición completa.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def _corpora(self, keys):
+        if keys:
+            return keys
+        keys = list(all_presets())
+        if catalogo:
+            keys += [e.key for e in catalogo.catalog().entries if e.kind == "documento"][:5]
+        return keys
+
+    def _text(self, key):
+        preset = all_presets().get(key)
+        if preset is not None:
+            return preset.text
+        entry = catalogo.get(key) if catalogo else None
+        if entry is None:
+            raise CommandError(f"Corpus no encontrado: {key}")
+        return entry.read_text()
+
+    def _keystrokes(self, text, count, rng):
+        # Texto escrito hasta una pulsación cualquiera de una oración del corpus
+        typed = [" ".join(s) for s in sentences(text) if s] or ["el"]
+        out = []
+        for _ in range(count):
+            s = rng.choice(typed)
+            out.append(s[:rng.randint(0, len(s))])
+        return out
+
+    @staticmethod
+    def _percentiles(samples):
+        samples = sorted(samples)
+        pick = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+        return pick(0.50), pick(0.95), pick(0.99), samples[-1] * 1000
+
+    def handle(self, *args, **opts):
+        n, k = opts["n"] or preset_max_n(), opts["k"]
+        rng = random.Random(opts["seed"])
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ("*",) and not h.startswith(".")), "localhost")
+        client, url = Client(HTTP_HOST=host), reverse("ngram:suggest_api")
+        self.stdout.write(f"n={n} k={k} consultas por corpus={opts['queries']}")
+        self.stdout.write(f"{'corpus':<24}{'carga (ms)':>11}{'modelo p50/p99 (ms)':>22}{'HTTP p50/p95/p99/máx (ms)':>30}")
+        worst = 0.0
+        for key in self._corpora(opts["corpus"]):
+            queries = self._keystrokes(self._text(key), opts["queries"], rng)
+            t0 = time.perf_counter()
+            suggester = get_suggester(key, n, True)
+            load = (time.perf_counter() - t0) * 1000
+            if suggester is None:
+                raise CommandError(f"Corpus no encontrado: {key}")
+            model = []
+            for q in queries:
+                t0 = time.perf_counter()
+                history, prefix = suggest_query(q, n, True)
+                suggester.suggest(history, k, prefix)
+                model.append(time.perf_counter() - t0)
+            http = []
+            for q in queries:
+                t0 = time.perf_counter()
+                response = client.get(f"{url}?{urlencode({'corpus': key, 'q': q, 'k': k, 'n': n})}")
+                http.append(time.perf_counter() - t0)
+                if response.status_code != 200:
+                    raise CommandError(f"{key}: HTTP {response.status_code} para q={q!r}")
+            m50, _, m99, _ = self._percentiles(model)
+            h50, h95, h99, hmax = self._percentiles(http)
+            worst = max(worst, h99)
+            self.stdout.write(f"{key[:23]:<24}{load:>11.2f}{f'{m50:.3f} / {m99:.3f}':>22}"
+                              f"{f'{h50:.2f} / {h95:.2f} / {h99:.2f} / {hmax:.2f}':>30}")
+        if worst <= opts["target_ms"]:
+            self.stdout.write(self.style.SUCCESS(f"p99 máximo {worst:.2f} ms <= objetivo {opts['target_ms']} ms"))
+        else:
+            raise CommandError(f"p99 máximo {worst:.2f} ms > objetivo {opts['target_ms']} ms")
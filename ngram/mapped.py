@@ -0,0 +1,278 @@
+import json, mmap, os, tempfile
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Dict, List, Tuple
+from .services import np, INDEX_VERSION, CompactNgramCounts
+
+# Formato binario de un índice de n-gramas para abrir con mmap: todos los
+# procesos que sirven peticiones comparten la misma copia en la caché de páginas
+# del sistema y abrir el modelo no parsea nada.
+#
+#   MAGIC (8 bytes) | longitud de la cabecera (uint64 LE) | cabecera JSON | arrays
+#
+# La cabecera describe cada array (desplazamiento desde el inicio de los datos,
+# dtype y longitud); cada array empieza alineado a 8 bytes. Arrays:
+#   vocab.offsets / vocab.bytes   palabras en UTF-8 ordenadas (id = posición)
+#   <variante>.keys.<k>           claves uint64 ordenadas (ids empaquetados, como CompactNgramCounts)
+#   <variante>.counts.<k>         conteo de cada clave
+#   <variante>.rank.<k>           posiciones ordenadas por P(w|h) desc y luego por n-grama
+# con variante "plain" (sin fronteras) o "wb" (con fronteras).
+MAGIC = b"NGRMMAP\x00"
+FORMAT_VERSION = 1
+VARIANTS = {False: "plain", True: "wb"}
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+def _pack_table(raw: Dict[str, int], k: int, ids: Dict[str, int], bits: int):
+    """ Claves empaquetadas ordenadas y conteos de una tabla {"w1 w2": conteo} del índice JSON. """
+    m = len(raw)
+    rows = np.fromiter((ids[w] for ng in raw for w in ng.split(" ")), dtype=np.uint64, count=m * k).reshape(m, k)
+    keys = np.zeros(m, dtype=np.uint64)
+    for j in range(k):
+        keys = (keys << np.uint64(bits)) | rows[:, j]
+    counts = np.fromiter(raw.values(), dtype=np.int64, count=m)
+    order = np.argsort(keys)
+    return keys[order], counts[order]
+
+def _mle_rank(keys, counts, prefix_keys, prefix_counts, bits: int, k: int):
+    """ Orden de las filas de la tabla MLE de orden k (P desc; a igual P, por n-grama). """
+    if k == 1:
+        denom = max(int(counts.sum()), 1)
+    else:
+        denom = prefix_counts[np.searchsorted(prefix_keys, keys >> np.uint64(bits))]
+    # las claves ya están ordenadas: un argsort estable deja los empates en orden de n-grama
+    return np.argsort(-(counts / denom), kind="stable").astype(np.uint32)
+
+def write_model(path: str, index: Dict) -> int:
+    """
+    Escribe el índice `index` (formato de build_ngram_index) como modelo binario en
+    `path` (a un temporal y luego os.replace, así quien ya lo tiene abierto no ve
+    un archivo a medias). Devuelve el tamaño en bytes.
+    """
+    if np is None:
+        raise RuntimeError("El modelo binario requiere NumPy (pip install numpy)")
+    max_n = index["max_n"]
+    variants = [wb for wb in (False, True) if ("orders_wb" if wb else "orders") in index]
+    words = sorted({w for wb in variants for w in index["orders_wb" if wb else "orders"].get("1", {})})
+    ids = {w: i for i, w in enumerate(words)}
+    bits = max(1, (len(words) - 1).bit_length())
+    if bits * max_n > 64:
+        raise ValueError(f"Vocabulario demasiado grande ({len(words)}) para empaquetar {max_n}-gramas en 64 bits")
+
+    encoded = [w.encode("utf-8") for w in words]
+    arrays = {
+        "vocab.offsets": np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64),
+        "vocab.bytes": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+    num_tokens = {}
+    for wb in variants:
+        name, orders = VARIANTS[wb], index["orders_wb" if wb else "orders"]
+        num_tokens[name] = index.get("num_tokens_wb" if wb else "num_tokens", 0)
+        prev = (None, None)
+        for k in range(1, max_n + 1):
+            keys, counts = _pack_table(orders.get(str(k), {}), k, ids, bits)
+            arrays[f"{name}.keys.{k}"] = keys
+            arrays[f"{name}.counts.{k}"] = counts
+            arrays[f"{name}.rank.{k}"] = _mle_rank(keys, counts, prev[0], prev[1], bits, k)
+            prev = (keys, counts)
+
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = [offset, arr.dtype.newbyteorder("<").str, len(arr)]
+        offset = _align(offset + arr.nbytes)
+    header = json.dumps({
+        "format": FORMAT_VERSION, "index_version": index.get("version", INDEX_VERSION),
+        "max_n": max_n, "bits": bits, "num_tokens": num_tokens, "arrays": layout,
+    }).encode("utf-8")
+    start = _align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(len(header).to_bytes(8, "little"))
+            fh.write(header)
+            for name, arr in arrays.items():
+                fh.seek(start + layout[name][0])
+                fh.write(arr.astype(layout[name][1], copy=False).tobytes())
+            fh.truncate(start + offset)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return start + offset
+
+class _MappedWords(Sequence):
+    """ Palabras del vocabulario leídas del archivo bajo demanda (secuencia ordenada). """
+    def __init__(self, buf, offsets, start: int):
+        self._buf, self._offsets, self._start = buf, offsets, start
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        a, b = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._buf[self._start + a:self._start + b].decode("utf-8")
+
+class _MappedIds:
+    """ palabra -> id por búsqueda binaria sobre el vocabulario ordenado (interfaz dict.get). """
+    def __init__(self, words: _MappedWords):
+        self._words = words
+
+    def get(self, word: str, default=None):
+        i = bisect_left(self._words, word)
+        return i if i < len(self._words) and self._words[i] == word else default
+
+class MappedVocabulary:
+    """ Vocabulario de un modelo mapeado: misma interfaz de lectura que Vocabulary (words, ids). """
+    def __init__(self, words: _MappedWords):
+        self.words = words
+        self.ids = _MappedIds(words)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+def _top_positions(values, k: int = None):
+    """ Posiciones de `values` ordenadas desc (empates por posición); con k, sólo las k primeras. """
+    if k is None or k >= len(values):
+        return np.argsort(-values, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    # argpartition: sólo se ordenan los candidatos con valor >= al k-ésimo mayor (empates incluidos)
+    threshold = values[np.argpartition(-values, k - 1)[:k]].min()
+    idx = np.nonzero(values >= threshold)[0]
+    return idx[np.argsort(-values[idx], kind="stable")][:k]
+
+class MappedNgramModel:
+    """
+    Modelo binario abierto con mmap. Los conteos de cada variante son un
+    CompactNgramCounts cuyos arrays apuntan directamente al archivo (sin copiar).
+    """
+    def __init__(self, path: str):
+        if np is None:
+            raise RuntimeError("El modelo binario requiere NumPy (pip install numpy)")
+        self.path = path
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self._mmap
+        if buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} no es un modelo de n-gramas")
+        size = int.from_bytes(buf[len(MAGIC):len(MAGIC) + 8], "little")
+        header = json.loads(buf[len(MAGIC) + 8:len(MAGIC) + 8 + size].decode("utf-8"))
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path}: versión de formato no soportada ({header.get('format')})")
+        start = _align(len(MAGIC) + 8 + size)
+        layout = header["arrays"]
+
+        def array(name):
+            offset, dtype, length = layout[name]
+            return np.frombuffer(buf, dtype=np.dtype(dtype), count=length, offset=start + offset)
+
+        self.index_version = header["index_version"]
+        self.max_n = header["max_n"]
+        self.bits = header["bits"]
+        offsets = array("vocab.offsets")
+        self.vocab = MappedVocabulary(_MappedWords(buf, offsets, start + layout["vocab.bytes"][0]))
+        self._counts: Dict[bool, CompactNgramCounts] = {}
+        self._ranks: Dict[Tuple[bool, int], "np.ndarray"] = {}
+        for wb, name in VARIANTS.items():
+            if name not in header["num_tokens"]:
+                continue
+            orders = range(1, self.max_n + 1)
+            self._counts[wb] = CompactNgramCounts(
+                self.vocab, self.bits,
+                {k: array(f"{name}.keys.{k}") for k in orders},
+                {k: array(f"{name}.counts.{k}") for k in orders},
+                header["num_tokens"][name],
+            )
+            for k in orders:
+                self._ranks[(wb, k)] = array(f"{name}.rank.{k}")
+
+    def has_variant(self, with_bound: bool = False) -> bool:
+        return with_bound in self._counts
+
+    def counts(self, with_bound: bool = False) -> CompactNgramCounts:
+        return self._counts[with_bound]
+
+    def next_word_index(self, n: int, with_bound: bool = False) -> "MappedNextWordIndex":
+        return MappedNextWordIndex(self, n, with_bound)
+
+def open_model(path: str) -> MappedNgramModel:
+    return MappedNgramModel(path)
+
+class MappedNextWordIndex:
+    """
+    Interfaz de NextWordIndex (top, probs, conditional_probabilities, table_page)
+    sobre un modelo mapeado: las continuaciones de una historia son el rango
+    contiguo de claves [h << bits, (h + 1) << bits), que se encuentra con dos
+    búsquedas binarias; la tabla completa se pagina con el orden precalculado.
+    """
+    def __init__(self, model: MappedNgramModel, n: int, with_bound: bool = False):
+        self.n = max(n, 1)
+        if self.n > model.max_n:
+            raise KeyError(f"El modelo no contiene el orden n={self.n} (max_n={model.max_n})")
+        self.model = model
+        self.with_bound = with_bound
+        self.counts = model.counts(with_bound)
+        self.num_tokens = self.counts.num_tokens
+        self._total = None
+
+    def _denominator(self, history: Tuple[str, ...]) -> int:
+        if self.n <= 1:
+            if self._total is None:
+                self._total = int(self.counts.counts[1].sum())
+            return self._total
+        return self.counts.get(history)
+
+    def top(self, history, k: int = None) -> List[Tuple[str, float]]:
+        """ [(palabra, P(palabra|history))] ordenada desc; k=None devuelve todas. """
+        h = () if self.n <= 1 else tuple(history)
+        if len(h) != self.n - 1:
+            return []
+        prefix = 0
+        for w in h:
+            i = self.counts.vocab.ids.get(w)
+            if i is None:
+                return []
+            prefix = (prefix << self.model.bits) | i
+        denom = self._denominator(h)
+        if denom <= 0:
+            return []
+        bits, keys = self.model.bits, self.counts.keys[self.n]
+        lo, hi = prefix << bits, (prefix + 1) << bits
+        i = int(np.searchsorted(keys, np.uint64(lo)))
+        j = len(keys) if hi >> 64 else int(np.searchsorted(keys, np.uint64(hi)))
+        counts = self.counts.counts[self.n][i:j]
+        sel = _top_positions(counts, k)
+        mask, words = (1 << bits) - 1, self.counts.vocab.words
+        return [(words[key & mask], c / denom) for key, c in zip(keys[i:j][sel].tolist(), counts[sel].tolist())]
+
+    def probs(self, history) -> Dict[str, float]:
+        return dict(self.top(history))
+
+    def conditional_probabilities(self) -> Dict[Tuple[str, ...], float]:
+        """ Tabla completa P(w|h) (se decodifica entera; para páginas usar table_page). """
+        return self.counts.mle(self.n)
+
+    def table_page(self, limit: int = None, offset: int = 0) -> Tuple[List[Tuple[str, float]], int]:
+        """ Filas [offset, offset+limit) de la tabla P(w|h) ordenada y su número total de filas. """
+        rank = self.model._ranks[(self.with_bound, self.n)]
+        sel = rank[offset:None if limit is None else offset + limit]
+        n, bits = self.n, self.model.bits
+        keys = self.counts.keys[n][sel]
+        counts = self.counts.counts[n][sel]
+        if n <= 1:
+            probs = counts / max(self._denominator(()), 1)
+        else:
+            prefix_keys = self.counts.keys[n - 1]
+            probs = counts / self.counts.counts[n - 1][np.searchsorted(prefix_keys, keys >> np.uint64(bits))]
+        mask, words = (1 << bits) - 1, self.counts.vocab.words
+        rows = [(" ".join(words[(key >> (bits * (n - 1 - j))) & mask] for j in range(n)), p)
+                for key, p in zip(keys.tolist(), probs.tolist())]
+        return rows, len(rank)
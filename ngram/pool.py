@@ -0,0 +1,39 @@
+import asyncio, atexit, os, threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import django
+from django.conf import settings
+
+# Pool de procesos compartido por las vistas async: el trabajo de CPU
+# (tokenizar, contar, analizar código) se ejecuta fuera del proceso que atiende
+# peticiones y la vista sólo espera (await) el resultado, de modo que el bucle
+# de eventos sigue sirviendo las peticiones ligeras.
+# NGRAM_POOL_WORKERS = 0 usa hilos en lugar de procesos (útil en desarrollo).
+_executor = None
+_lock = threading.Lock()
+
+def pool_workers() -> int:
+    workers = getattr(settings, "NGRAM_POOL_WORKERS", None)
+    return (os.cpu_count() or 1) if workers is None else int(workers)
+
+def _init_worker():
+    # con "spawn"/"forkserver" el proceso hijo arranca sin Django configurado
+    django.setup()
+
+def get_executor():
+    """El ProcessPoolExecutor compartido (se crea en el primer uso), o None si se usan hilos."""
+    global _executor
+    if _executor is None and pool_workers() > 0:
+        with _lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=pool_workers(), initializer=_init_worker)
+                atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+    return _executor
+
+async def run_in_pool(func, *args, **kwargs):
+    """
+    Ejecuta func(*args, **kwargs) en el pool y espera su resultado. `func`, los
+    argumentos y el resultado deben poder serializarse con pickle.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
@@ -0,0 +1,113 @@
+import os
+from pathlib import Path
+from django.conf import settings
+from .services import CorpusCounts, Suggester, format_prob_table
+from .tokenizers import get_tokenizer, default_tokenizer_name
+
+# Corpus de ejemplo que se ofrecen en la UI: clave -> (etiqueta, archivo en docs/)
+PRESET_FILES = {
+    "literario": ("Texto literario", "corpus_julieta_fierro.txt"),
+    "tecnico": ("Texto técnico", "corpus_tecnico_algoritmos.txt"),
+}
+DOCS_DIR = Path(__file__).resolve().parents[1] / "docs"
+
+def preset_max_n():
+    return int(getattr(settings, "NGRAM_INDEX_MAX_N", 3))
+
+
+class PresetCorpus:
+    """
+    Corpus de ejemplo en memoria: texto, conteos por tokenizador y tablas MLE ya
+    ordenadas. Todo se descarta y se vuelve a leer si cambia el mtime del archivo.
+    """
+    def __init__(self, key: str, label: str, path: Path):
+        self.key, self.label, self.path = key, label, path
+        self.mtime = None
+        self.text = ""
+        self._loaded = False
+        self._counts = {}
+        self._tables = {}
+        self._models = {}
+
+    def refresh(self) -> "PresetCorpus":
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._loaded and mtime == self.mtime:
+            return self
+        try:
+            text = self.path.read_text(encoding="utf-8")
+        except Exception:
+            text = ""
+        self.text, self.mtime, self._loaded = text, mtime, True
+        self._counts, self._tables, self._models = {}, {}, {}
+        return self
+
+    def counts(self, tokenizer: str, n: int) -> CorpusCounts:
+        """Conteos (órdenes 1..max(n, NGRAM_INDEX_MAX_N)) del texto con el tokenizador `tokenizer`."""
+        corpus = self._counts.get(tokenizer)
+        if corpus is None or corpus.max_n < n:
+            corpus = CorpusCounts(get_tokenizer(tokenizer)(self.text), max(n, preset_max_n()))
+            self._counts[tokenizer] = corpus
+        return corpus
+
+    def prob_table(self, tokenizer: str, n: int, with_bound: bool = False, limit: int = None, modelo: str = "mle"):
+        """
+        Tabla [(n-grama, P(w|h))] ordenada, calculada una sola vez por combinación.
+        modelo: "mle" o un método de SmoothedLM ("kneser_ney", "backoff").
+        """
+        key = (tokenizer, n, with_bound, limit, modelo)
+        table = self._tables.get(key)
+        if table is None:
+            counts = self.counts(tokenizer, n).counts(with_bound)
+            probs = counts.mle(n) if modelo == "mle" else self.language_model(tokenizer, n, with_bound, modelo).conditional_probabilities()
+            table = format_prob_table(probs, limit=limit)
+            self._tables[key] = table
+        return table
+
+    def language_model(self, tokenizer: str, n: int, with_bound: bool = False, method: str = "kneser_ney"):
+        """SmoothedLM de orden n (compilado una sola vez por combinación)."""
+        key = (tokenizer, n, with_bound, method)
+        lm = self._models.get(key)
+        if lm is None:
+            lm = self._models[key] = self.counts(tokenizer, n).counts(with_bound).language_model(n, method)
+        return lm
+
+    def suggester(self, tokenizer: str, n: int, with_bound: bool = True) -> Suggester:
+        """Suggester de órdenes 1..n para /ngrams/autocomplete/suggest (construido una sola vez por combinación)."""
+        key = ("suggest", tokenizer, n, with_bound)
+        suggester = self._models.get(key)
+        if suggester is None:
+            suggester = self._models[key] = Suggester.from_counts(self.counts(tokenizer, n).counts(with_bound), n)
+        return suggester
+
+    def size(self, tokenizer: str, n: int, with_bound: bool = False) -> int:
+        return self.counts(tokenizer, n).counts(with_bound).num_tokens
+
+
+_presets = {key: PresetCorpus(key, label, DOCS_DIR / fname) for key, (label, fname) in PRESET_FILES.items()}
+
+def get_preset(key: str):
+    """Devuelve el PresetCorpus `key` (recargado si su archivo cambió) o None."""
+    preset = _presets.get(key)
+    return preset.refresh() if preset is not None else None
+
+def all_presets():
+    return {key: preset.refresh() for key, preset in _presets.items()}
+
+def preload(tokenizers=None):
+    """
+    Lee los presets y precalcula sus conteos (con y sin fronteras) y sus
+    Suggester para cada tokenizador nombrado (por defecto el de /ngrams/ y el del
+    autocompletado). Lo llama el servidor web al arrancar (sistema/asgi.py,
+    sistema/wsgi.py); en el resto de procesos los presets se cargan en su primer
+    uso. NGRAM_PRELOAD_PRESETS = False lo desactiva.
+    """
+    if not getattr(settings, "NGRAM_PRELOAD_PRESETS", True):
+        return
+    tokenizers = tokenizers or (default_tokenizer_name(), "autocompletar")
+    for preset in all_presets().values():
+        for name in tokenizers:
+            preset.counts(name, preset_max_n()).with_bound
+            preset.suggester(name, preset_max_n())
@@ -1,7 +1,15 @@
 
-import re
+import heapq, os, re
+from bisect import bisect_left
 from collections import Counter
-from typing import List, Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, filterfalse, islice, repeat
+from typing import List, Tuple, Dict, Iterable, Iterator, Callable
+
+try:
+    import numpy as np
+except Exception:  # representación compacta opcional
+    np = None
 
 TOKEN_RE = re.compile(r"<\/?s>|[\wáéíóúñüÁÉÍÓÚÑÜ]+|[\.\!\?]", flags=re.UNICODE)
 
@@ -32,36 +40,954 @@ def add_sentence_boundaries(sent_tokens: List[List[str]]) -> List[str]:
 def generate_ngrams_from_tokens(tokens: List[str], n: int) -> List[Tuple[str, ...]]:
     if not isinstance(n, int) or n < 1:
         raise ValueError("n debe ser >= 1")
-    if n == 1:
-        return [(t,) for t in tokens]
-    N = len(tokens)
-    return [tuple(tokens[i:i+n]) for i in range(0, max(0, N - n + 1))]
-
-def ngram_frequencies(tokens: List[str], n: int, join_with: str = " ") -> List[Tuple[str, int]]:
-    """ Devuelve lista [("token1 token2", conteo), ...] ordenada desc por conteo. """
-    ngrams = generate_ngrams_from_tokens(tokens, n)
-    c = Counter(ngrams)
-    items = [(join_with.join(ng), cnt) for ng, cnt in c.items()]
-    items.sort(key=lambda kv: (-kv[1], kv[0]))
-    return items
-
-def mle_conditional_probabilities(tokens: List[str], n: int) -> Dict[Tuple[str, ...], float]:
+    return list(zip(*[tokens[i:] for i in range(n)]))
+
+# --- Motor de conteo multi-orden ---
+class NgramCounts:
+    """
+    Conteos {tupla: conteo} de los órdenes 1..max_n de un mismo flujo de tokens.
+    Se calcula una vez por petición y lo comparten ngram_frequencies,
+    mle_conditional_probabilities y NextWordIndex.
+    """
+    def __init__(self, orders: Dict[int, Counter], num_tokens: int):
+        self.orders = orders
+        self.num_tokens = num_tokens
+
+    @property
+    def max_n(self) -> int:
+        return max(self.orders) if self.orders else 0
+
+    def __getitem__(self, n: int) -> Counter:
+        if n not in self.orders:
+            raise KeyError(f"No se contaron n-gramas de orden n={n} (max_n={self.max_n})")
+        return self.orders[n]
+
+    def frequencies(self, n: int, join_with: str = " ", limit: int = None, offset: int = 0) -> List[Tuple[str, int]]:
+        return frequencies_from_counts(self[n], join_with, limit, offset)
+
+    def mle(self, n: int) -> Dict[Tuple[str, ...], float]:
+        if n <= 1:
+            uni = self[1]
+            total = sum(uni.values()) or 1
+            return {ng: c/total for ng, c in uni.items()}
+        return mle_from_counts(self[n], self[n - 1])
+
+    def next_word_index(self, n: int) -> "NextWordIndex":
+        k = max(n, 1)
+        return NextWordIndex.from_counts(self[k], self[k - 1] if k > 1 else self[1], k, self.num_tokens)
+
+    def language_model(self, n: int, method: str = "kneser_ney") -> "SmoothedLM":
+        return SmoothedLM.from_counts(self, n, method)
+
+def count_ngrams(tokens: List[str], max_n: int, compact: bool = False) -> NgramCounts:
+    """
+    Cuenta todos los órdenes 1..max_n a partir de un único flujo de tokens.
+    Las vistas desplazadas del flujo se construyen una sola vez y se comparten entre
+    órdenes; cada orden se cuenta con zip (en C), sin crear un slice por ventana.
+    Un único recorrido en Python que actualice los max_n contadores por token da
+    los mismos conteos pero es varias veces más lento que estas max_n pasadas en C.
+    compact=True devuelve un CompactNgramCounts (NumPy) con la misma interfaz.
+    """
+    if not isinstance(max_n, int) or max_n < 1:
+        raise ValueError("max_n debe ser >= 1")
+    if compact:
+        return count_ngrams_compact(tokens, max_n)
+    tokens = list(tokens)
+    shifted = [tokens[i:] for i in range(max_n)]
+    orders = {k: Counter(zip(*shifted[:k])) for k in range(1, max_n + 1)}
+    return NgramCounts(orders, len(tokens))
+
+def count_ngram_order(tokens: List[str], n: int) -> NgramCounts:
+    """ Conteos sólo del orden n (basta para consultar frecuencias de un único orden). """
+    if not isinstance(n, int) or n < 1:
+        raise ValueError("n debe ser >= 1")
+    tokens = list(tokens)
+    return NgramCounts({n: Counter(zip(*[tokens[i:] for i in range(n)]))}, len(tokens))
+
+class CorpusCounts:
+    """
+    Conteos de un corpus sin fronteras y, bajo demanda, con fronteras <s>, </s>
+    (derivados de los mismos tokens, sin volver a tokenizar).
+    """
+    def __init__(self, tokens: List[str], max_n: int):
+        self.tokens = tokens
+        self.max_n = max_n
+        self.plain = count_ngrams(tokens, max_n)
+        self._with_bound = None
+
+    @property
+    def with_bound(self) -> NgramCounts:
+        if self._with_bound is None:
+            self._with_bound = count_ngrams(add_sentence_boundaries(_split_sentences(self.tokens)), self.max_n)
+        return self._with_bound
+
+    def counts(self, with_bound: bool = False) -> NgramCounts:
+        return self.with_bound if with_bound else self.plain
+
+    @property
+    def preview(self) -> List[str]:
+        return self.tokens[:50]
+
+# --- Conteo en flujo (memoria acotada por el vocabulario, no por el archivo) ---
+SENTENCE_END = {".", "!", "?"}
+
+def iter_text_chunks(path: str, chunk_size: int = 1 << 18, encoding: str = "utf-8") -> Iterator[str]:
+    """ Lee un archivo de texto en bloques de `chunk_size` caracteres. """
+    with open(path, "r", encoding=encoding, errors="ignore") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), ""):
+            yield chunk
+
+def iter_tokens(chunks: Iterable[str], tokenize: Callable[[str], List[str]] = default_simple_tokenize) -> Iterator[str]:
+    """
+    Tokeniza bloque a bloque. Cada bloque se corta en su último espacio y el resto
+    (una palabra posiblemente partida) se antepone al siguiente; como ningún token
+    contiene espacios, el resultado es idéntico a tokenizar el texto completo.
+    """
+    carry = ""
+    for chunk in chunks:
+        buf = carry + chunk
+        cut = max(buf.rfind(" "), buf.rfind("\n"), buf.rfind("\t"), buf.rfind("\r"))
+        if cut < 0:
+            carry = buf
+            continue
+        carry = buf[cut + 1:]
+        yield from tokenize(buf[:cut + 1])
+    if carry:
+        yield from tokenize(carry)
+
+class _BoundaryState:
+    """
+    Versión incremental de add_sentence_boundaries(_split_sentences(tokens)):
+    recuerda si quedó una oración abierta al final del lote anterior.
+    """
+    def __init__(self):
+        self.in_sentence = False
+
+    def feed(self, tokens: Iterable[str]) -> List[str]:
+        out = []
+        for t in tokens:
+            if t in SENTENCE_END:
+                if self.in_sentence:
+                    out.append("</s>")
+                    self.in_sentence = False
+            else:
+                if not self.in_sentence:
+                    out.extend(("<s>", "<s>"))
+                    self.in_sentence = True
+                out.append(t)
+        return out
+
+    def close(self) -> List[str]:
+        if self.in_sentence:
+            self.in_sentence = False
+            return ["</s>"]
+        return []
+
+class StreamingNgramCounter:
+    """
+    Acumula conteos de los órdenes 1..max_n a partir de lotes de tokens,
+    conservando los últimos max_n-1 tokens entre lotes para contar las
+    ventanas que cruzan el borde.
+    """
+    def __init__(self, max_n: int):
+        if not isinstance(max_n, int) or max_n < 1:
+            raise ValueError("max_n debe ser >= 1")
+        self.max_n = max_n
+        self.orders = {k: Counter() for k in range(1, max_n + 1)}
+        self.num_tokens = 0
+        self._carry: List[str] = []
+
+    def update(self, batch: List[str]):
+        if not batch:
+            return
+        seq = self._carry + list(batch)
+        c = len(self._carry)
+        for k, counter in self.orders.items():
+            # sólo las ventanas que incluyen al menos un token nuevo
+            start = max(0, c - k + 1)
+            counter.update(zip(*[seq[start + j:] for j in range(k)]))
+        self.num_tokens += len(batch)
+        self._carry = seq[-(self.max_n - 1):] if self.max_n > 1 else []
+
+    def result(self) -> NgramCounts:
+        return NgramCounts(self.orders, self.num_tokens)
+
+class StreamedCorpusCounts:
+    """
+    Equivalente a CorpusCounts construido sin materializar la lista de tokens:
+    conteos sin fronteras y (opcionalmente) con fronteras en una sola lectura,
+    más los primeros `preview` tokens.
+    """
+    def __init__(self, tokens: Iterable[str], max_n: int, boundaries: bool = False, preview: int = 50, batch_size: int = 65536):
+        self.max_n = max_n
+        self.preview: List[str] = []
+        plain = StreamingNgramCounter(max_n)
+        wb = StreamingNgramCounter(max_n) if boundaries else None
+        state = _BoundaryState()
+        it = iter(tokens)
+        while True:
+            batch = list(islice(it, batch_size))
+            if not batch:
+                break
+            if len(self.preview) < preview:
+                self.preview.extend(batch[:preview - len(self.preview)])
+            plain.update(batch)
+            if wb is not None:
+                wb.update(state.feed(batch))
+        if wb is not None:
+            wb.update(state.close())
+        self.plain = plain.result()
+        self._with_bound = wb.result() if wb is not None else None
+
+    @property
+    def with_bound(self) -> NgramCounts:
+        if self._with_bound is None:
+            raise ValueError("Conteo construido sin boundaries=True")
+        return self._with_bound
+
+    def counts(self, with_bound: bool = False) -> NgramCounts:
+        return self.with_bound if with_bound else self.plain
+
+    @classmethod
+    def from_counts(cls, plain: NgramCounts, with_bound: NgramCounts = None, preview: List[str] = None) -> "StreamedCorpusCounts":
+        obj = cls.__new__(cls)
+        obj.max_n = plain.max_n
+        obj.preview = list(preview or [])
+        obj.plain = plain
+        obj._with_bound = with_bound
+        return obj
+
+def count_file(path: str, max_n: int, tokenize: Callable[[str], List[str]] = default_simple_tokenize,
+               boundaries: bool = False, chunk_size: int = 1 << 18, workers: int = 1,
+               min_parallel_bytes: int = 4 << 20) -> StreamedCorpusCounts:
+    """
+    Cuenta n-gramas de un archivo leyéndolo por bloques (memoria acotada).
+    Con workers > 1 y archivos de al menos `min_parallel_bytes`, se reparte en
+    fragmentos contados en paralelo (count_file_parallel); el resultado es idéntico.
+    """
+    if workers and workers > 1 and os.path.getsize(path) >= min_parallel_bytes:
+        return count_file_parallel(path, max_n, tokenize, boundaries=boundaries, workers=workers)
+    return StreamedCorpusCounts(iter_tokens(iter_text_chunks(path, chunk_size), tokenize), max_n, boundaries=boundaries)
+
+# --- Conteo paralelo map-reduce por fragmentos (ProcessPoolExecutor) ---
+SENTENCE_CUT_RE = re.compile(rb"[.!?][ \t\r\n]")
+SPACE_CUT_RE = re.compile(rb"[ \t\r\n]")
+
+def _find_cut(fh, offset: int, size: int, boundaries: bool, window: int = 1 << 16) -> int:
+    """
+    Primer punto de corte en o después de `offset`: justo tras un fin de oración
+    seguido de espacio. Sin fronteras basta con cualquier espacio. Los bytes
+    ASCII buscados nunca forman parte de una secuencia UTF-8 multibyte.
+    """
+    patterns = (SENTENCE_CUT_RE,) if boundaries else (SENTENCE_CUT_RE, SPACE_CUT_RE)
+    for pattern in patterns:
+        pos = offset
+        while pos < size:
+            fh.seek(pos)
+            data = fh.read(window + 1)
+            m = pattern.search(data)
+            if m:
+                return pos + m.end()
+            pos += window
+    return size
+
+def shard_offsets(path: str, shards: int, boundaries: bool = False) -> List[Tuple[int, int]]:
+    """ Divide el archivo en `shards` rangos de bytes [inicio, fin) cortados en fronteras de oración. """
+    size = os.path.getsize(path)
+    cuts = [0]
+    with open(path, "rb") as fh:
+        for i in range(1, max(1, shards)):
+            cut = _find_cut(fh, max(cuts[-1], size * i // shards), size, boundaries)
+            if cut >= size:
+                break
+            if cut > cuts[-1]:
+                cuts.append(cut)
+    cuts.append(size)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def _edges(tokens: List[str], m: int) -> Tuple[List[str], List[str]]:
+    return (tokens[:m], tokens[-m:]) if m > 0 else ([], [])
+
+def _count_shard(args) -> Dict:
+    """ Tarea de un proceso: tokeniza y cuenta un rango de bytes del archivo. """
+    path, start, end, max_n, tokenize, boundaries = args
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        text = fh.read(end - start).decode("utf-8", errors="ignore")
+    tokens = tokenize(text)
+    m = max_n - 1
+    out = {"plain": (count_ngrams(tokens, max_n).orders, *_edges(tokens, m), len(tokens)), "preview": tokens[:50]}
+    if boundaries:
+        state = _BoundaryState()
+        wb = state.feed(tokens)
+        # si el fragmento termina con una oración abierta, el corte no es frontera para este tokenizador
+        out["wb_open"] = state.in_sentence
+        wb += state.close()
+        out["wb"] = (count_ngrams(wb, max_n).orders, *_edges(wb, m), len(wb))
+    return out
+
+def _merge_shards(parts: List[Tuple], max_n: int) -> NgramCounts:
+    """
+    Suma los conteos de cada fragmento y añade los n-gramas que cruzan los cortes:
+    cada ventana se cuenta una sola vez, al fusionar el fragmento que contiene su
+    último token, si empieza en los max_n-1 tokens previos (`carry`).
+    """
+    orders = {k: Counter() for k in range(1, max_n + 1)}
+    carry: List[str] = []
+    total = 0
+    for counts, head, tail, num_tokens in parts:
+        for k, c in counts.items():
+            orders[k].update(c)
+        if carry and head:
+            seq = carry + head
+            c0 = len(carry)
+            for k in range(2, max_n + 1):
+                for i in range(max(0, c0 - k + 1), min(c0, len(seq) - k + 1)):
+                    orders[k][tuple(seq[i:i + k])] += 1
+        # si el fragmento es más corto que max_n-1, tail son todos sus tokens
+        carry = (carry + tail)[-(max_n - 1):] if max_n > 1 else []
+        total += num_tokens
+    return NgramCounts(orders, total)
+
+def count_file_parallel(path: str, max_n: int, tokenize: Callable[[str], List[str]] = default_simple_tokenize,
+                        boundaries: bool = False, workers: int = None, shards: int = None) -> StreamedCorpusCounts:
+    """
+    Versión map-reduce de count_file: corta el archivo en fragmentos en fronteras
+    de oración, los cuenta en un ProcessPoolExecutor y fusiona los resultados.
+    `tokenize` debe ser una función de módulo (serializable con pickle). Si el
+    tokenizador descarta la puntuación y una oración cruza un corte, la variante
+    con fronteras no es separable y se recurre al conteo secuencial.
+    """
+    if not isinstance(max_n, int) or max_n < 1:
+        raise ValueError("max_n debe ser >= 1")
+    workers = workers or os.cpu_count() or 1
+    ranges = shard_offsets(path, shards or workers * 4, boundaries)
+    tasks = [(path, a, b, max_n, tokenize, boundaries) for a, b in ranges]
+    if workers <= 1 or len(tasks) <= 1:
+        results = [_count_shard(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_count_shard, tasks))
+    if boundaries and any(r["wb_open"] for r in results[:-1]):
+        return StreamedCorpusCounts(iter_tokens(iter_text_chunks(path), tokenize), max_n, boundaries=True)
+    preview: List[str] = []
+    for r in results:
+        preview.extend(r["preview"][:50 - len(preview)])
+    plain = _merge_shards([r["plain"] for r in results], max_n)
+    wb = _merge_shards([r["wb"] for r in results], max_n) if boundaries else None
+    return StreamedCorpusCounts.from_counts(plain, wb, preview)
+
+# --- Representación compacta: vocabulario entero y claves empaquetadas (NumPy) ---
+class Vocabulary:
+    """ Mapa token <-> id (int32), compartible entre varios conteos compactos. """
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.words: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add(self, token: str) -> int:
+        i = self.ids.get(token)
+        if i is None:
+            i = self.ids[token] = len(self.words)
+            self.words.append(token)
+        return i
+
+    def encode(self, tokens: List[str]):
+        add = self.add
+        return np.fromiter((add(t) for t in tokens), dtype=np.int32, count=len(tokens))
+
+class CompactNgramCounts:
+    """
+    Conteos de los órdenes 1..max_n con cada n-grama empaquetado en una clave
+    uint64 de ancho fijo (bits_por_id * n) y los conteos en arrays NumPy
+    ordenados por clave (construidos con np.unique). Expone la misma interfaz
+    que NgramCounts; las tablas de texto se generan sólo bajo demanda.
+    """
+    def __init__(self, vocab: Vocabulary, bits: int, keys: Dict[int, "np.ndarray"], counts: Dict[int, "np.ndarray"], num_tokens: int):
+        self.vocab = vocab
+        self.bits = bits
+        self.keys = keys
+        self.counts = counts
+        self.num_tokens = num_tokens
+
+    @property
+    def max_n(self) -> int:
+        return max(self.keys) if self.keys else 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.keys.values()) + sum(a.nbytes for a in self.counts.values())
+
+    def _check(self, n: int):
+        if n not in self.keys:
+            raise KeyError(f"No se contaron n-gramas de orden n={n} (max_n={self.max_n})")
+
+    def decode(self, n: int):
+        """ Matriz (num_ngramas, n) de ids a partir de las claves empaquetadas. """
+        self._check(n)
+        keys = self.keys[n]
+        mask = np.uint64((1 << self.bits) - 1)
+        cols = [(keys >> np.uint64(self.bits * (n - 1 - j))) & mask for j in range(n)]
+        return np.stack(cols, axis=1).astype(np.int64) if cols else np.empty((0, n), dtype=np.int64)
+
+    def _tuples(self, n: int) -> List[Tuple[str, ...]]:
+        words = self.vocab.words
+        return [tuple(words[i] for i in row) for row in self.decode(n).tolist()]
+
+    def __getitem__(self, n: int) -> Counter:
+        return Counter(dict(zip(self._tuples(n), self.counts[n].tolist())))
+
+    def get(self, ngram: Tuple[str, ...]) -> int:
+        """ Conteo de un n-grama por búsqueda binaria sobre las claves ordenadas. """
+        n = len(ngram)
+        self._check(n)
+        key = 0
+        for w in ngram:
+            i = self.vocab.ids.get(w)
+            if i is None:
+                return 0
+            key = (key << self.bits) | i
+        keys = self.keys[n]
+        pos = int(np.searchsorted(keys, np.uint64(key)))
+        if pos < len(keys) and int(keys[pos]) == key:
+            return int(self.counts[n][pos])
+        return 0
+
+    def frequencies(self, n: int, join_with: str = " ", limit: int = None, offset: int = 0) -> List[Tuple[str, int]]:
+        self._check(n)
+        counts = self.counts[n]
+        m = offset + limit if limit is not None else len(counts)
+        if m < len(counts):
+            # argpartition: sólo se decodifican los candidatos con conteo >= al m-ésimo mayor (empates incluidos)
+            cand = np.argpartition(-counts, m - 1)[:m] if m > 0 else np.empty(0, dtype=np.int64)
+            threshold = counts[cand].min() if m > 0 else counts.max() + 1
+            idx = np.nonzero(counts >= threshold)[0]
+        else:
+            idx = np.arange(len(counts))
+        words = self.vocab.words
+        rows = self.decode(n)[idx].tolist()
+        items = [(join_with.join(words[i] for i in row), c) for row, c in zip(rows, counts[idx].tolist())]
+        items.sort(key=lambda kv: (-kv[1], kv[0]))
+        return items[offset:m]
+
+    def mle(self, n: int) -> Dict[Tuple[str, ...], float]:
+        if n <= 1:
+            self._check(1)
+            c1 = self.counts[1]
+            total = int(c1.sum()) or 1
+            return dict(zip(self._tuples(1), (c1 / total).tolist()))
+        self._check(n - 1)
+        prefix = self.keys[n] >> np.uint64(self.bits)
+        pos = np.searchsorted(self.keys[n - 1], prefix)
+        denom = self.counts[n - 1][pos]
+        return dict(zip(self._tuples(n), (self.counts[n] / denom).tolist()))
+
+    def next_word_index(self, n: int) -> "NextWordIndex":
+        k = max(n, 1)
+        return NextWordIndex.from_counts(self[k], self[k - 1] if k > 1 else self[1], k, self.num_tokens)
+
+    def language_model(self, n: int, method: str = "kneser_ney") -> "SmoothedLM":
+        return SmoothedLM.from_counts(self, n, method)
+
+def count_ngrams_compact(tokens: List[str], max_n: int, vocab: Vocabulary = None) -> CompactNgramCounts:
+    """ Versión de count_ngrams sobre ids int32 y claves uint64 (requiere NumPy). """
+    if np is None:
+        raise RuntimeError("La representación compacta requiere NumPy (pip install numpy)")
+    if not isinstance(max_n, int) or max_n < 1:
+        raise ValueError("max_n debe ser >= 1")
+    vocab = vocab if vocab is not None else Vocabulary()
+    ids = vocab.encode(tokens).astype(np.uint64)
+    bits = max(1, (len(vocab) - 1).bit_length())
+    if bits * max_n > 64:
+        raise ValueError(f"Vocabulario demasiado grande ({len(vocab)}) para empaquetar {max_n}-gramas en 64 bits")
+    keys, counts = {}, {}
+    N = len(ids)
+    for k in range(1, max_n + 1):
+        m = max(0, N - k + 1)
+        packed = np.zeros(m, dtype=np.uint64)
+        for j in range(k):
+            packed = (packed << np.uint64(bits)) | ids[j:j + m]
+        keys[k], counts[k] = np.unique(packed, return_counts=True)
+    return CompactNgramCounts(vocab, bits, keys, counts, N)
+
+def ngram_frequencies(tokens: List[str], n: int, join_with: str = " ", counts: NgramCounts = None,
+                      limit: int = None, offset: int = 0) -> List[Tuple[str, int]]:
+    """
+    Devuelve lista [("token1 token2", conteo), ...] ordenada desc por conteo.
+    Si se pasa `counts` (de count_ngrams) se reutiliza en lugar de volver a contar `tokens`.
+    Con `limit` devuelve sólo la página [offset, offset+limit) sin ordenar la tabla completa.
+    """
+    if counts is None:
+        counts = count_ngrams(tokens, n)
+    return counts.frequencies(n, join_with, limit, offset)
+
+def mle_conditional_probabilities(tokens: List[str], n: int, counts: NgramCounts = None) -> Dict[Tuple[str, ...], float]:
     """ Devuelve P(w|h) para todos los n-gramas (n>=2). Para n=1 devuelve frecuencias relativas. """
-    if n <= 1:
-        uni = Counter(tokens)
-        total = sum(uni.values()) or 1
-        return {(w,): c/total for w, c in uni.items()}
-    n_counts = Counter(tuple(tokens[i:i+n]) for i in range(len(tokens)-n+1))
-    prefix_counts = Counter(tuple(tokens[i:i+n-1]) for i in range(len(tokens)-n+2))
-    probs: Dict[Tuple[str, ...], float] = {}
+    if counts is None:
+        counts = count_ngrams(tokens, max(n, 1))
+    return counts.mle(n)
+
+def format_prob_table(probs: Dict[Tuple[str, ...], float], join_with: str = " ",
+                      limit: int = None, offset: int = 0) -> List[Tuple[str, float]]:
+    return rank_ngrams(probs.items(), join_with, limit, offset)
+
+# --- Consultas top-k / paginadas ---
+def _rank_key(join_with: str):
+    if join_with == " ":
+        # el espacio ordena antes que cualquier carácter de un token, así que
+        # comparar las tuplas equivale a comparar el texto unido
+        return lambda kv: (-kv[1], kv[0])
+    return lambda kv: (-kv[1], join_with.join(kv[0]))
+
+def iter_ranked(items: Iterable[Tuple[Tuple[str, ...], float]], join_with: str = " ") -> Iterator[Tuple[str, float]]:
+    """
+    Mismo orden que rank_ngrams, pero genera las filas una a una: sólo se ordenan
+    referencias a las tuplas y el texto unido de cada fila se crea al pedirla.
+    """
+    for ng, v in sorted(items, key=_rank_key(join_with)):
+        yield join_with.join(ng), v
+
+def rank_ngrams(items: Iterable[Tuple[Tuple[str, ...], float]], join_with: str = " ",
+                limit: int = None, offset: int = 0) -> List[Tuple[str, float]]:
+    """
+    Ordena [(ngrama, valor)] desc por valor y luego por texto, y devuelve la
+    página [offset, offset+limit). Con `limit` se usa heapq.nsmallest (selección
+    parcial, O(N log k)) en lugar de ordenar todas las filas.
+    """
+    key = _rank_key(join_with)
+    if limit is None:
+        sel = sorted(items, key=key)[offset:]
+    else:
+        sel = heapq.nsmallest(offset + max(0, limit), items, key=key)[offset:]
+    return [(join_with.join(ng), v) for ng, v in sel]
+
+# --- Índice precalculado de conteos (persistible como JSON) ---
+INDEX_VERSION = 1
+
+def _serialize_orders(counts: NgramCounts) -> Dict[str, Dict[str, int]]:
+    return {str(k): {" ".join(ng): cnt for ng, cnt in c.items()} for k, c in counts.orders.items()}
+
+def build_ngram_index(tokens: List[str], max_n: int = 3, boundaries: bool = False) -> Dict:
+    """
+    Construye un índice serializable con los conteos de los órdenes 1..max_n.
+    Si boundaries=True también guarda la variante con fronteras <s>, </s>.
+    """
+    if not isinstance(max_n, int) or max_n < 1:
+        raise ValueError("max_n debe ser >= 1")
+    return build_ngram_index_from_counts(CorpusCounts(tokens, max_n), boundaries)
+
+def build_ngram_index_from_counts(corpus, boundaries: bool = False) -> Dict:
+    """ Igual que build_ngram_index a partir de un CorpusCounts / StreamedCorpusCounts. """
+    index = {
+        "version": INDEX_VERSION,
+        "max_n": corpus.max_n,
+        "num_tokens": corpus.plain.num_tokens,
+        "preview": corpus.preview,
+        "orders": _serialize_orders(corpus.plain),
+    }
+    if boundaries:
+        index["num_tokens_wb"] = corpus.with_bound.num_tokens
+        index["orders_wb"] = _serialize_orders(corpus.with_bound)
+    return index
+
+def index_counts(index: Dict, n: int, with_bound: bool = False) -> Counter:
+    """ Devuelve Counter {tupla: conteo} del orden n guardado en el índice. """
+    key = "orders_wb" if with_bound else "orders"
+    raw = (index.get(key) or {}).get(str(n))
+    if raw is None:
+        raise KeyError(f"El índice no contiene el orden n={n}")
+    return Counter({tuple(k.split(" ")): v for k, v in raw.items()})
+
+def frequencies_from_counts(counts: Counter, join_with: str = " ", limit: int = None, offset: int = 0) -> List[Tuple[str, int]]:
+    """ Igual que ngram_frequencies, pero a partir de un Counter ya calculado. """
+    return rank_ngrams(counts.items(), join_with, limit, offset)
+
+def mle_from_counts(n_counts: Counter, prefix_counts: Counter) -> Dict[Tuple[str, ...], float]:
+    """ P(w|h) = c(h,w) / c(h) a partir de conteos de orden n y n-1 ya calculados. """
+    return dict(iter_mle(n_counts, prefix_counts))
+
+def iter_mle(n_counts: Counter, prefix_counts: Counter) -> Iterator[Tuple[Tuple[str, ...], float]]:
+    """ Genera (ngrama, P(w|h)) sin construir el diccionario completo. """
     for ng, c in n_counts.items():
-        prefix = ng[:-1]
-        denom = prefix_counts.get(prefix, 0)
+        denom = prefix_counts.get(ng[:-1], 0)
         if denom > 0:
-            probs[ng] = c / denom
-    return probs
+            yield ng, c / denom
+
+def mle_from_index(index: Dict, n: int, with_bound: bool = False) -> Dict[Tuple[str, ...], float]:
+    """ Equivalente a mle_conditional_probabilities usando los conteos del índice. """
+    if n <= 1:
+        uni = index_counts(index, 1, with_bound)
+        total = sum(uni.values()) or 1
+        return {w: c/total for w, c in uni.items()}
+    return mle_from_counts(index_counts(index, n, with_bound), index_counts(index, n - 1, with_bound))
+
+# --- Índice historia -> siguiente palabra (consultas en O(k)) ---
+class NextWordIndex:
+    """
+    Para cada historia h (tupla de n-1 tokens) guarda la lista [(palabra, conteo)]
+    ya ordenada desc por conteo y el denominador c(h), de modo que la consulta
+    de las k mejores continuaciones cuesta O(k) sin importar el tamaño del corpus.
+    """
+    def __init__(self, n: int, num_tokens: int = 0):
+        self.n = n
+        self.num_tokens = num_tokens
+        self.next_words: Dict[Tuple[str, ...], List[Tuple[str, int]]] = {}
+        self.totals: Dict[Tuple[str, ...], int] = {}
+
+    @classmethod
+    def from_counts(cls, n_counts: Counter, prefix_counts: Counter, n: int, num_tokens: int = 0) -> "NextWordIndex":
+        idx = cls(n, num_tokens)
+        for ng, c in n_counts.items():
+            idx.next_words.setdefault(tuple(ng[:-1]), []).append((ng[-1], c))
+        for h, lst in idx.next_words.items():
+            lst.sort(key=lambda wc: (-wc[1], wc[0]))
+            # c(h) se toma de los (n-1)-gramas, igual que en mle_conditional_probabilities
+            idx.totals[h] = prefix_counts.get(h, 0) if n > 1 else sum(prefix_counts.values())
+        return idx
+
+    @classmethod
+    def from_tokens(cls, tokens: List[str], n: int) -> "NextWordIndex":
+        return count_ngrams(tokens, max(n, 1)).next_word_index(n)
+
+    @classmethod
+    def from_ngram_index(cls, index: Dict, n: int, with_bound: bool = False) -> "NextWordIndex":
+        k = max(n, 1)
+        n_counts = index_counts(index, k, with_bound)
+        prefix_counts = index_counts(index, k - 1, with_bound) if k > 1 else n_counts
+        num_tokens = index.get("num_tokens_wb" if with_bound else "num_tokens", 0)
+        return cls.from_counts(n_counts, prefix_counts, k, num_tokens)
+
+    def _key(self, history) -> Tuple[str, ...]:
+        return () if self.n <= 1 else tuple(history)
+
+    def top(self, history, k: int = None) -> List[Tuple[str, float]]:
+        """ [(palabra, P(palabra|history))] ordenada desc; k=None devuelve todas. """
+        h = self._key(history)
+        lst = self.next_words.get(h)
+        denom = self.totals.get(h, 0)
+        if not lst or denom <= 0:
+            return []
+        sel = lst if k is None else lst[:k]
+        return [(w, c / denom) for w, c in sel]
+
+    def probs(self, history) -> Dict[str, float]:
+        return dict(self.top(history))
 
-def format_prob_table(probs: Dict[Tuple[str, ...], float], join_with: str = " ") -> List[Tuple[str, float]]:
-    items = [(join_with.join(ng), p) for ng, p in probs.items()]
-    items.sort(key=lambda kv: (-kv[1], kv[0]))
-    return items
+    def table_page(self, limit: int = None, offset: int = 0) -> Tuple[List[Tuple[str, float]], int]:
+        """ Filas [offset, offset+limit) de la tabla P(w|h) ordenada y su número total de filas. """
+        probs = self.conditional_probabilities()
+        return format_prob_table(probs, limit=limit, offset=offset), len(probs)
+
+    def conditional_probabilities(self) -> Dict[Tuple[str, ...], float]:
+        """ Tabla completa P(w|h), igual que mle_conditional_probabilities. """
+        out: Dict[Tuple[str, ...], float] = {}
+        for h, lst in self.next_words.items():
+            denom = self.totals.get(h, 0)
+            if denom > 0:
+                for w, c in lst:
+                    out[h + (w,)] = c / denom
+        return out
+
+# --- Sugerencias al escribir (una consulta por pulsación) ---
+SENTENCE_MARKERS = ("<s>", "</s>")
+
+class Suggester:
+    """
+    Las k siguientes palabras más probables para escribir en vivo, a partir de los
+    NextWordIndex de los órdenes 1..n (ya ordenados, así que cada orden cuesta O(k)).
+    Si la historia completa no se vio se completa con las continuaciones de
+    historias más cortas (retroceso hasta unigramas), y con `prefix` (palabra a
+    medio escribir) sólo se devuelven las palabras que empiezan así; en unigramas
+    el prefijo se busca con bisect sobre el vocabulario ordenado.
+    """
+    def __init__(self, indexes: List["NextWordIndex"]):
+        self.indexes = indexes
+        self.n = len(indexes)
+        self.num_tokens = indexes[0].num_tokens if indexes else 0
+        unigrams = indexes[0].next_words.get((), []) if indexes else []
+        self._vocab = sorted(w for w, _ in unigrams if w not in SENTENCE_MARKERS)
+        self._unigram_counts = dict(unigrams)
+
+    @classmethod
+    def from_counts(cls, counts, n: int) -> "Suggester":
+        return cls([counts.next_word_index(m) for m in range(1, max(n, 1) + 1)])
+
+    @classmethod
+    def from_ngram_index(cls, index: Dict, n: int, with_bound: bool = False) -> "Suggester":
+        return cls([NextWordIndex.from_ngram_index(index, m, with_bound) for m in range(1, max(n, 1) + 1)])
+
+    def _candidates(self, order: int, history: Tuple[str, ...], prefix: str, limit: int) -> Iterator[Tuple[str, int, int]]:
+        nwi = self.indexes[order - 1]
+        h = history[len(history) - (order - 1):] if order > 1 else ()
+        denom = nwi.totals.get(h, 0)
+        if denom <= 0:
+            return
+        if order == 1 and prefix:
+            # sólo hacen falta las `limit` más frecuentes del rango de palabras con ese prefijo
+            lo = bisect_left(self._vocab, prefix)
+            hi = bisect_left(self._vocab, prefix + "\U0010ffff", lo)
+            counts = self._unigram_counts
+            for w in heapq.nsmallest(limit, self._vocab[lo:hi], key=lambda w: (-counts[w], w)):
+                yield w, counts[w], denom
+            return
+        for w, c in nwi.next_words.get(h, ()):
+            if not prefix or w.startswith(prefix):
+                yield w, c, denom
+
+    def suggest(self, history, k: int = 5, prefix: str = "") -> List[Tuple[str, float, int]]:
+        """ [(palabra, P(palabra|historia del orden usado), orden)], del orden más alto al más bajo. """
+        history = tuple(history)
+        out, seen = [], set()
+        for order in range(min(self.n, len(history) + 1), 0, -1):
+            for w, c, denom in self._candidates(order, history, prefix, k + len(seen)):
+                if w in seen or w in SENTENCE_MARKERS:
+                    continue
+                seen.add(w)
+                out.append((w, c / denom, order))
+                if len(out) >= k:
+                    return out
+        return out
+
+# --- Modelos de lenguaje suavizados (compilados una sola vez) ---
+LM_METHODS = ("kneser_ney", "backoff")
+STUPID_BACKOFF_ALPHA = 0.4
+
+def _kn_discount(counts: Counter) -> float:
+    """ Descuento de Ney para un orden: D = n1 / (n1 + 2·n2), o 0.75 si no se puede estimar. """
+    n1 = n2 = 0
+    for c in counts.values():
+        if c == 1:
+            n1 += 1
+        elif c == 2:
+            n2 += 1
+    return n1 / (n1 + 2 * n2) if n1 and n2 else 0.75
+
+class SmoothedLM:
+    """
+    Modelo de lenguaje de orden n con suavizado, compilado a partir de los conteos:
+    "kneser_ney" (Kneser-Ney interpolado, con descuento por orden y conteos de
+    continuación en los órdenes inferiores) o "backoff" (stupid backoff, con
+    puntuaciones relativas sin normalizar).
+    Los términos de cada orden y los pesos de las historias se calculan al
+    construirlo, así que score(w, h) son a lo sumo 2·n consultas a diccionarios
+    y un n-grama no visto no recibe probabilidad cero.
+    Tiene la interfaz de NextWordIndex (top, probs, conditional_probabilities, table_page).
+    """
+    def __init__(self, n: int, method: str = "kneser_ney", num_tokens: int = 0):
+        if method not in LM_METHODS:
+            raise ValueError(f"Método de suavizado desconocido: {method!r} (usa {', '.join(LM_METHODS)})")
+        self.n = n
+        self.method = method
+        self.num_tokens = num_tokens
+        self.terms: Dict[int, Dict[Tuple[str, ...], float]] = {}    # orden -> {ngrama: término}
+        self.weights: Dict[int, Dict[Tuple[str, ...], float]] = {}  # orden -> {historia: peso del orden inferior}
+        self.followers: Dict[Tuple[str, ...], List[str]] = {}       # historia -> palabras vistas detrás
+        self.ranked_words: List[str] = []                            # vocabulario por P(w) desc
+        self.base = 0.0                                              # probabilidad uniforme (orden 0)
+        self._arrays = None
+
+    @classmethod
+    def from_counts(cls, counts: NgramCounts, n: int, method: str = "kneser_ney") -> "SmoothedLM":
+        n = max(n, 1)
+        lm = cls(n, method, counts.num_tokens)
+        orders = {k: counts[k] for k in range(1, n + 1)}
+        for k in range(2, n + 1):
+            for ng in orders[k]:
+                lm.followers.setdefault(ng[:-1], []).append(ng[-1])
+        if method == "backoff":
+            total = sum(orders[1].values()) or 1
+            lm.terms[1] = {ng: c / total for ng, c in orders[1].items()}
+            for k in range(2, n + 1):
+                prefix = orders[k - 1]
+                lm.terms[k] = {ng: c / prefix[ng[:-1]] for ng, c in orders[k].items() if prefix.get(ng[:-1])}
+        else:
+            lm.base = 1.0 / (len(orders[1]) + 1)  # vocabulario + palabra desconocida
+            for k in range(1, n + 1):
+                # orden superior: conteos; inferiores: nº de contextos distintos que preceden al k-grama
+                kc = orders[k] if k == n else Counter(ng[1:] for ng in orders[k + 1])
+                d = _kn_discount(kc)
+                denom, types = Counter(), Counter()
+                for ng, c in kc.items():
+                    denom[ng[:-1]] += c
+                    types[ng[:-1]] += 1
+                lm.terms[k] = {ng: max(c - d, 0.0) / denom[ng[:-1]] for ng, c in kc.items()}
+                lm.weights[k] = {h: d * types[h] / total for h, total in denom.items()}
+        uni = lm.terms[1]
+        lm.ranked_words = sorted((ng[0] for ng in orders[1]), key=lambda w: (-uni.get((w,), 0.0), w))
+        return lm
+
+    @classmethod
+    def from_ngram_index(cls, index: Dict, n: int, with_bound: bool = False, method: str = "kneser_ney") -> "SmoothedLM":
+        k = max(n, 1)
+        orders = {j: index_counts(index, j, with_bound) for j in range(1, k + 1)}
+        num_tokens = index.get("num_tokens_wb" if with_bound else "num_tokens", 0)
+        return cls.from_counts(NgramCounts(orders, num_tokens), k, method)
+
+    def _history(self, history) -> Tuple[str, ...]:
+        return tuple(history)[-(self.n - 1):] if self.n > 1 else ()
+
+    def score(self, word: str, history=()) -> float:
+        """ P(word | history) (o la puntuación de stupid backoff). """
+        h = self._history(history)
+        top = len(h) + 1
+        if self.method == "backoff":
+            factor = 1.0
+            for k in range(top, 0, -1):
+                v = self.terms[k].get(h[len(h) - k + 1:] + (word,))
+                if v is not None:
+                    return factor * v
+                factor *= STUPID_BACKOFF_ALPHA
+            return 0.0
+        p = self.base
+        for k in range(1, top + 1):
+            hk = h[len(h) - k + 1:]
+            p = self.terms[k].get(hk + (word,), 0.0) + self.weights[k].get(hk, 1.0) * p
+        return p
+
+    def top(self, history, k: int = None) -> List[Tuple[str, float]]:
+        """
+        [(palabra, P(palabra|history))] ordenada desc; k=None devuelve todo el vocabulario.
+        Sólo se puntúan las palabras vistas detrás de algún sufijo de la historia y,
+        de las demás (cuya puntuación es proporcional a la de unigramas), las primeras de ranked_words.
+        """
+        h = self._history(history)
+        seen = set()
+        for j in range(1, len(h) + 1):
+            seen.update(self.followers.get(h[len(h) - j:], ()))
+        rest = (w for w in self.ranked_words if w not in seen)
+        candidates = list(seen) + list(rest if k is None else islice(rest, k))
+        scored = sorted(((w, self.score(w, h)) for w in candidates), key=lambda wc: (-wc[1], wc[0]))
+        return scored if k is None else scored[:k]
+
+    def probs(self, history) -> Dict[str, float]:
+        return dict(self.top(history))
+
+    def table_page(self, limit: int = None, offset: int = 0) -> Tuple[List[Tuple[str, float]], int]:
+        probs = self.conditional_probabilities()
+        return format_prob_table(probs, limit=limit, offset=offset), len(probs)
+
+    def arrays(self) -> "ArrayLM":
+        """ Forma vectorizada (NumPy) del modelo, compilada en el primer uso. """
+        if self._arrays is None:
+            self._arrays = ArrayLM(self)
+        return self._arrays
+
+    def conditional_probabilities(self) -> Dict[Tuple[str, ...], float]:
+        """ P(w|h) suavizada de cada n-grama observado de orden n (misma tabla que la MLE). """
+        if self.n <= 1:
+            return {(w,): self.score(w) for w in self.ranked_words}
+        return {h + (w,): self.score(w, h) for h, words in self.followers.items()
+                if len(h) == self.n - 1 for w in words}
+
+class ArrayLM:
+    """
+    Forma vectorizada de un SmoothedLM para puntuar lotes de oraciones. Los
+    n-gramas y las historias de cada orden son claves uint64 ordenadas (ids
+    empaquetados, como en CompactNgramCounts) con sus términos y pesos en arrays
+    paralelos: cada orden se evalúa para todas las posiciones del lote con una
+    sola búsqueda binaria (np.searchsorted).
+    """
+    def __init__(self, lm: SmoothedLM):
+        if np is None:
+            raise RuntimeError("La puntuación por lotes requiere NumPy (pip install numpy)")
+        self.n, self.method, self.base = lm.n, lm.method, lm.base
+        self.vocab = Vocabulary()
+        for w in lm.ranked_words:
+            self.vocab.add(w)
+        # id de las palabras desconocidas y del relleno: no aparece en ninguna clave
+        self.missing = len(self.vocab)
+        self.bits = max(1, self.missing.bit_length())
+        if self.bits * self.n > 64:
+            raise ValueError(f"Vocabulario demasiado grande ({len(self.vocab)}) para empaquetar {self.n}-gramas en 64 bits")
+        self.terms = {k: self._table(t) for k, t in lm.terms.items()}
+        self.weights = {k: self._table(t) for k, t in lm.weights.items()}
+
+    def _table(self, table: Dict[Tuple[str, ...], float]):
+        ids, bits = self.vocab.ids, self.bits
+        if all(len(ng) <= 1 for ng in table):
+            # unigramas e historias de una palabra: array denso indexado por id (NaN = ausente)
+            dense = np.full(self.missing + 1, np.nan)
+            for ng, v in table.items():
+                dense[ids[ng[0]] if ng else 0] = v
+            return dense
+        def pack(ngram):
+            key = 0
+            for w in ngram:
+                key = (key << bits) | ids[w]
+            return key
+        keys = np.fromiter((pack(ng) for ng in table), dtype=np.uint64, count=len(table))
+        vals = np.fromiter(table.values(), dtype=np.float64, count=len(table))
+        order = np.argsort(keys)
+        return keys[order], vals[order]
+
+    @staticmethod
+    def _lookup(table, keys, default: float):
+        if not isinstance(table, tuple):
+            out = table[keys.astype(np.intp)]
+            out[np.isnan(out)] = default
+            return out
+        tkeys, tvals = table
+        out = np.full(len(keys), default, dtype=np.float64)
+        if len(tkeys):
+            pos = np.minimum(np.searchsorted(tkeys, keys), len(tkeys) - 1)
+            hit = tkeys[pos] == keys
+            out[hit] = tvals[pos[hit]]
+        return out
+
+    def _keys(self, ids, targets, k: int, last: int):
+        """ Claves de las ventanas ids[t-k+1 .. t-k+last] para cada posición t. """
+        key = np.zeros(len(targets), dtype=np.uint64)
+        bits = np.uint64(self.bits)
+        for j in range(last):
+            key = (key << bits) | ids[targets - (k - 1) + j]
+        return key
+
+    def score_batch(self, sentences: List[List[str]], boundaries: bool = True):
+        """
+        Log-probabilidad (ln) y número de tokens puntuados de cada oración.
+        Con fronteras cada oración se puntúa como <s> <s> tokens </s> (igual que
+        los conteos con fronteras, sin los signos . ! ?). Devuelve dos arrays de
+        longitud len(sentences): (logprobs, tokens).
+        """
+        n, pad, missing = self.n, self.n - 1, self.missing
+        head = ["<s>", "<s>"] if boundaries else []
+        tail = ["</s>"] if boundaries else []
+        if boundaries:
+            sentences = [list(filterfalse(SENTENCE_END.__contains__, sent)) for sent in sentences]
+        # relleno ("" nunca es un token) + fronteras + tokens, codificado con dict.get en C
+        prefix = [""] * pad + head
+        parts = []
+        for sent in sentences:
+            parts += (prefix, sent, tail)
+        lengths = np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences)) + len(head) + len(tail)
+        block = lengths + pad
+        ids_arr = np.fromiter(map(self.vocab.ids.get, chain.from_iterable(parts), repeat(missing)),
+                              dtype=np.uint64, count=int(block.sum()))
+        starts = np.cumsum(block) - block
+        # posición de cada token dentro de su oración (el relleno queda en negativo)
+        pos = np.arange(len(ids_arr)) - np.repeat(starts, block) - pad
+        targets = np.nonzero(pos >= len(head))[0]
+        sent_idx = np.repeat(np.arange(len(sentences)), block)[targets]
+        avail = np.minimum(pad, pos[targets])  # tokens reales disponibles como historia
+
+        if self.method == "backoff":
+            p = np.zeros(len(targets))
+            resolved = np.zeros(len(targets), dtype=bool)
+            for k in range(n, 0, -1):
+                v = self._lookup(self.terms[k], self._keys(ids_arr, targets, k, k), np.nan)
+                new = ~resolved & (avail >= k - 1) & ~np.isnan(v)
+                p[new] = v[new] * STUPID_BACKOFF_ALPHA ** (avail[new] + 1 - k)
+                resolved |= new
+        else:
+            # una historia con relleno o palabras desconocidas no está en la tabla:
+            # término 0 y peso 1, igual que SmoothedLM.score con una historia más corta
+            p = np.full(len(targets), self.base)
+            for k in range(1, n + 1):
+                term = self._lookup(self.terms[k], self._keys(ids_arr, targets, k, k), 0.0)
+                weight = self._lookup(self.weights[k], self._keys(ids_arr, targets, k, k - 1), 1.0)
+                p = term + weight * p
+        logp = np.log(np.maximum(p, np.finfo(np.float64).tiny))
+        return (np.bincount(sent_idx, weights=logp, minlength=len(sentences)).astype(np.float64),
+                np.bincount(sent_idx, minlength=len(sentences)))
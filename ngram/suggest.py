@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+from .presets import get_preset
+from .services import Suggester, _split_sentences
+from .tokenizers import get_tokenizer
+
+try:
+    from lenguaje_natural import catalogo
+except Exception:
+    catalogo = None
+
+# Sugerencias al escribir (/ngrams/autocomplete/suggest, bench_suggest): cómo se
+# interpreta lo escrito hasta ahora y qué modelo responde por cada corpus.
+AUTOCOMPLETE_TOKENIZER = "autocompletar"
+# Modelos de documentos y archivos del catálogo ya construidos (LRU); los de los
+# presets viven en ngram.presets. Con ASGI o un servidor con hilos varias
+# peticiones lo usan a la vez: se consulta y se modifica bajo _suggesters_lock.
+SUGGEST_CACHE_SIZE = 16
+_suggesters = OrderedDict()
+_suggesters_lock = threading.Lock()
+
+def sentences(text: str):
+    """ Oraciones (listas de tokens) de `text` con el tokenizador del autocompletado. """
+    return _split_sentences(get_tokenizer(AUTOCOMPLETE_TOKENIZER)(text))
+
+def suggest_query(q: str, n: int, with_bound: bool):
+    """
+    (historia, prefijo) de lo escrito hasta ahora: si el texto no termina en espacio
+    o puntuación, la última palabra está a medio escribir y es el prefijo. Con
+    fronteras, la historia es la oración en curso tras <s> <s>.
+    """
+    tokens = get_tokenizer(AUTOCOMPLETE_TOKENIZER)(q)
+    prefix = ""
+    if tokens and q[-1:].isalnum() and tokens[-1] not in (".", "!", "?"):
+        prefix = tokens.pop()
+    if with_bound:
+        closed = not tokens or tokens[-1] in (".", "!", "?")
+        current = [] if closed else _split_sentences(tokens)[-1]
+        tokens = ["<s>", "<s>"] + current
+    return tuple(tokens[-(n - 1):]) if n > 1 else (), prefix
+
+def get_suggester(corpus: str, n: int, with_bound: bool):
+    """Suggester del corpus: preset (precargado al iniciar) o entrada del catálogo (construido una vez). None si no existe."""
+    preset = get_preset(corpus)
+    if preset is not None:
+        return preset.suggester(AUTOCOMPLETE_TOKENIZER, n, with_bound)
+    entry = catalogo.get(corpus) if catalogo else None
+    if entry is None:
+        return None
+    key = (entry.key, entry.sha256, n, with_bound)
+    with _suggesters_lock:
+        hit = _suggesters.get(key)
+        if hit is not None:
+            _suggesters.move_to_end(key)
+            return hit
+    # se construye fuera del candado: si dos peticiones lo construyen a la vez, se queda el primero
+    built = Suggester.from_ngram_index(entry.ngram_index(n), n, with_bound)
+    with _suggesters_lock:
+        hit = _suggesters.setdefault(key, built)
+        _suggesters.move_to_end(key)
+        while len(_suggesters) > SUGGEST_CACHE_SIZE:
+            _suggesters.popitem(last=False)
+    return hit
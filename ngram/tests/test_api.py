@@ -0,0 +1,101 @@
+import json, unittest
+from unittest import mock
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ngram import views
+from ngram.services import np
+
+TEXTO = "el perro come. el gato come. el perro duerme. el gato duerme en la casa."
+
+
+@unittest.skipIf(np is None, "requiere numpy")
+class PerplexityApiTests(TestCase):
+    def post(self, **payload):
+        return self.client.post(reverse("ngram:perplexity_api"), json.dumps(payload), content_type="application/json")
+
+    def test_kneser_ney(self):
+        r = self.post(sentences=["el perro come", "el gato duerme", ""], text=TEXTO, n=2)
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual((data["modelo"], data["num_sentences"]), ("kneser_ney", 3))
+        self.assertGreater(data["perplexity"], 1)
+        self.assertEqual([s["tokens"] for s in data["scores"]], [4, 4, 1])
+
+    def test_backoff_rechazado(self):
+        r = self.post(sentences=["el perro come"], text=TEXTO, n=2, modelo="backoff")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("kneser_ney", r.json()["error"])
+
+    def test_modelo_desconocido(self):
+        self.assertEqual(self.post(sentences=["el perro"], text=TEXTO, modelo="mle").status_code, 400)
+
+    def test_fronteras_debe_ser_booleano(self):
+        for valor in ("false", 0, None):
+            r = self.post(sentences=["el perro"], text=TEXTO, fronteras=valor)
+            self.assertEqual(r.status_code, 400)
+            self.assertIn("fronteras", r.json()["error"])
+        con, sin = (self.post(sentences=["el perro come"], text=TEXTO, n=2, fronteras=v).json() for v in (True, False))
+        self.assertEqual((con["tokens"], sin["tokens"]), (4, 3))
+
+
+@override_settings(NGRAM_POOL_WORKERS=0)
+class BulkApiTests(TestCase):
+    async def post(self, body, content_type="application/json", query=""):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return await self.async_client.post(reverse("ngram:ngrams_bulk_api") + query, body, content_type=content_type)
+
+    async def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        return chunks, [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+
+    async def test_arreglo_json(self):
+        docs = [
+            {"id": "a", "text": "el perro come. el perro duerme", "n": 2, "limit": 1},
+            {"tokens": ["x", 1, "x", 1], "n": 2},
+            {"text": "sin n"},
+            "no es un objeto",
+            {"text": "a b", "n": 2, "offset": -1},
+            {"text": "", "n": 2},
+        ]
+        _, out = await self.lines(await self.post(docs))
+        self.assertEqual([o["id"] for o in out], ["a", 1, 2, 3, 4, 5])
+        self.assertEqual(out[0], {"id": "a", "n": 2, "total": 5, "offset": 0, "limit": 1, "frequencies": [["el perro", 2]]})
+        self.assertEqual(out[1]["frequencies"], [["x 1", 2], ["1 x", 1]])
+        self.assertEqual(out[2]["error"], "Debes enviar un entero 'n' >= 2")
+        self.assertEqual(out[3]["error"], "Cada documento debe ser un objeto JSON")
+        self.assertEqual(out[4]["error"], "'limit' y 'offset' deben ser enteros >= 0")
+        self.assertEqual(out[5]["error"], "Debes enviar 'tokens' o 'text'.")
+
+    async def test_objeto_con_documents_y_n_por_defecto(self):
+        _, out = await self.lines(await self.post({"documents": [{"text": "a b a b"}]}, query="?n=2"))
+        self.assertEqual(out[0]["frequencies"], [["a b", 2], ["b a", 1]])
+
+    async def test_ndjson(self):
+        body = "\n".join([json.dumps({"id": "x", "text": "a b a"}), "", "no es json", "[1, 2]",
+                          json.dumps({"tokens": ["a", "b"]})]) + "\n"
+        _, out = await self.lines(await self.post(body, "application/x-ndjson", "?n=2"))
+        self.assertEqual([o["id"] for o in out], ["x", 1, 2, 3])
+        self.assertEqual(out[0]["total"], 2)
+        self.assertEqual((out[1]["error"], out[2]["error"]), ("JSON inválido", "Cada línea debe ser un objeto JSON"))
+        self.assertEqual(out[3]["frequencies"], [["a b", 1]])
+
+    async def test_lotes(self):
+        docs = [{"text": f"uno dos {i}", "n": 2} for i in range(5)]
+        with mock.patch.object(views, "BULK_BATCH_SIZE", 2):
+            chunks, out = await self.lines(await self.post(docs))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual([o["id"] for o in out], list(range(5)))
+        self.assertEqual(out[4]["frequencies"], [["dos 4", 1], ["uno dos", 1]])
+
+    async def test_errores_de_la_peticion(self):
+        for body, query in (("{mal", ""), ({"documents": "x"}, ""), ("42", ""), ([], "?n=dos")):
+            r = await self.post(body, query=query)
+            self.assertEqual(r.status_code, 400, (body, query))
@@ -25,4 +25,176 @@ def test_ngram_frequencies_counts():
 def test_default_simple_tokenize():
     text = "Hola, mundo! Hola?"
     tokens = default_simple_tokenize(text)
-    assert tokens == ["hola", "mundo", "hola"]
\ No newline at end of file
+    assert tokens == ["hola", "mundo", "hola"]
+
+def test_mle_from_index_matches_direct_computation():
+    from ngram.services import build_ngram_index, mle_from_index, mle_conditional_probabilities
+    tokens = default_simple_tokenize("el perro come. el gato come. el perro duerme.")
+    index = build_ngram_index(tokens, max_n=3, boundaries=True)
+    assert mle_from_index(index, 2) == mle_conditional_probabilities(tokens, 2)
+    assert mle_from_index(index, 3) == mle_conditional_probabilities(tokens, 3)
+    assert index["num_tokens"] == len(tokens)
+    assert "<s> <s> el" in index["orders_wb"]["3"]
+
+
+def test_next_word_index_matches_brute_force():
+    from collections import Counter
+    from ngram.services import NextWordIndex, mle_conditional_probabilities
+    tokens = default_simple_tokenize("el perro come. el gato come. el perro duerme. el perro")
+    idx = NextWordIndex.from_tokens(tokens, 2)
+    prefix = Counter(tokens)
+    expected = {ng[1]: c / prefix[("el")] for ng, c in Counter(zip(tokens, tokens[1:])).items() if ng[0] == "el"}
+    assert idx.probs(("el",)) == expected
+    assert idx.top(("el",), k=1) == [("perro", 3 / 4)]
+    assert idx.top(("nada",)) == []
+    assert idx.conditional_probabilities() == mle_conditional_probabilities(tokens, 2)
+
+
+def test_count_ngrams_single_pass_matches_per_order():
+    from collections import Counter
+    from ngram.services import count_ngrams, CorpusCounts, add_sentence_boundaries, _split_sentences
+    tokens = default_simple_tokenize("a b a c. a b! c")
+    counts = count_ngrams(tokens, 3)
+    for k in (1, 2, 3):
+        assert counts[k] == Counter(generate_ngrams_from_tokens(tokens, k))
+    corpus = CorpusCounts(tokens, 2)
+    wb = add_sentence_boundaries(_split_sentences(tokens))
+    assert corpus.with_bound[2] == Counter(generate_ngrams_from_tokens(wb, 2))
+    assert ngram_frequencies(None, 2, counts=counts) == ngram_frequencies(tokens, 2)
+
+
+def test_compact_counts_match_counter_outputs():
+    pytest.importorskip("numpy")
+    from ngram.services import count_ngrams, format_prob_table
+    tokens = default_simple_tokenize("el perro come. el gato come. el perro duerme.")
+    plain, compact = count_ngrams(tokens, 3), count_ngrams(tokens, 3, compact=True)
+    for k in (1, 2, 3):
+        assert compact.frequencies(k) == plain.frequencies(k)
+        assert format_prob_table(compact.mle(k)) == format_prob_table(plain.mle(k))
+    assert compact.get(("el", "perro")) == 2
+    assert compact.get(("perro", "vuela")) == 0
+
+
+def test_streamed_counts_match_in_memory_counts(tmp_path):
+    from ngram.services import count_file, CorpusCounts
+    text = "El perro come. El gato come!\nEl perro duerme y el gato no? fin" * 20
+    path = tmp_path / "corpus.txt"
+    path.write_text(text, encoding="utf-8")
+    full = CorpusCounts(default_simple_tokenize(text), 3)
+    streamed = count_file(str(path), 3, boundaries=True, chunk_size=7)
+    for k in (1, 2, 3):
+        assert streamed.plain[k] == full.plain[k]
+        assert streamed.with_bound[k] == full.with_bound[k]
+    assert streamed.preview == full.preview
+
+
+def test_parallel_file_counts_match_serial(tmp_path):
+    from ngram.services import count_file, count_file_parallel
+    text = " ".join(["el perro come.", "el gato come!", "el perro duerme y el gato no?"] * 50)
+    path = tmp_path / "corpus.txt"
+    path.write_text(text, encoding="utf-8")
+    serial = count_file(str(path), 3, boundaries=True)
+    for shards in (1, 3, 17):
+        par = count_file_parallel(str(path), 3, boundaries=True, workers=2, shards=shards)
+        for k in (1, 2, 3):
+            assert par.plain[k] == serial.plain[k]
+            assert par.with_bound[k] == serial.with_bound[k]
+        assert par.plain.num_tokens == serial.plain.num_tokens
+
+
+def test_top_k_pages_match_full_sorted_table():
+    from ngram.services import count_ngrams, rank_ngrams, mle_conditional_probabilities, format_prob_table
+    tokens = default_simple_tokenize("a b a c a b d b a c e a b " * 7)
+    counts = count_ngrams(tokens, 2)
+    full = ngram_frequencies(None, 2, counts=counts)
+    for offset, limit in ((0, 1), (0, 3), (2, 4), (5, 100), (100, 5)):
+        assert ngram_frequencies(None, 2, counts=counts, limit=limit, offset=offset) == full[offset:offset + limit]
+    probs = mle_conditional_probabilities(tokens, 2)
+    assert format_prob_table(probs, limit=3, offset=1) == format_prob_table(probs)[1:4]
+    assert rank_ngrams({("b",): 2, ("a",): 2, ("c",): 3}.items(), limit=2) == [("c", 3), ("a", 2)]
+
+
+def test_tokenize_many_matches_single_text_tokenizers():
+    from ngram.tokenizers import tokenize_many, simple_tokenize, DOC_SEP
+    from lenguaje_natural.utils import clean_and_tokenize
+    texts = ["El perro come. ¡El GATO no!", "", "<s> Árbol, niño; pingüino?", f"uno{DOC_SEP}dos", None, "Los de la casa están bien"]
+    for profile, single in (("simple", default_simple_tokenize), ("autocompletar", simple_tokenize), ("limpio", clean_and_tokenize)):
+        expected = [single(t or "") for t in texts]
+        assert tokenize_many(texts, profile=profile) == expected
+        tokens, offsets = tokenize_many(texts, profile=profile, flat=True)
+        assert [tokens[offsets[i]:offsets[i + 1]] for i in range(len(texts))] == expected
+    assert tokenize_many([]) == []
+    assert tokenize_many([], flat=True) == ([], [0])
+
+
+def test_streamed_rows_match_ranked_tables():
+    from ngram.services import count_ngrams, iter_ranked, iter_mle, format_prob_table
+    tokens = default_simple_tokenize("a b a c a b d b a c e a b " * 7)
+    counts = count_ngrams(tokens, 2)
+    assert list(iter_ranked(counts[2].items())) == ngram_frequencies(None, 2, counts=counts)
+    assert list(iter_ranked(iter_mle(counts[2], counts[1]), join_with="_")) == format_prob_table(counts.mle(2), join_with="_")
+
+
+def test_smoothed_lm_normalized_and_top_k_exact():
+    from ngram.services import count_ngrams, SmoothedLM
+    tokens = default_simple_tokenize("el perro come . el gato come . el perro duerme mucho . un gato duerme " * 3)
+    counts = count_ngrams(tokens, 3)
+    for method in ("kneser_ney", "backoff"):
+        lm = SmoothedLM.from_counts(counts, 3, method)
+        for history in [(), ("el",), ("el", "perro"), ("un", "perro"), ("zz", "yy")]:
+            brute = sorted(((w, lm.score(w, history)) for w in lm.ranked_words), key=lambda wc: (-wc[1], wc[0]))
+            assert lm.top(history, 3) == brute[:3]
+            assert lm.top(history) == brute
+            assert lm.score("come", history) > 0
+            if method == "kneser_ney":
+                assert sum(p for _, p in brute) + lm.score("desconocida", history) == pytest.approx(1.0)
+    # n-grama no visto: MLE da 0, el modelo suavizado no
+    assert counts.mle(3).get(("un", "perro", "come"), 0) == 0
+    assert counts.language_model(3).score("come", ("un", "perro")) > 0
+
+def test_array_lm_batch_matches_scalar_scores():
+    import math, sys
+    from ngram.services import count_ngrams, SmoothedLM
+    tokens = default_simple_tokenize("<s> <s> el perro come </s> <s> <s> el gato come </s> <s> <s> un gato duerme </s> " * 2)
+    sentences = [default_simple_tokenize(s) for s in ("el perro duerme", "un perro come mucho", "zz", "")]
+    for method in ("kneser_ney", "backoff"):
+        lm = SmoothedLM.from_counts(count_ngrams(tokens, 3), 3, method)
+        logprobs, counts = lm.arrays().score_batch(sentences, boundaries=True)
+        for sent, lp, c in zip(sentences, logprobs, counts):
+            seq = ["<s>", "<s>"] + sent + ["</s>"]
+            expected = sum(math.log(max(lm.score(w, tuple(seq[max(0, i - 2):i])), sys.float_info.min))
+                           for i, w in enumerate(seq) if i >= 2)
+            assert c == len(sent) + 1
+            assert lp == pytest.approx(expected)
+
+def test_mapped_model_matches_next_word_index(tmp_path):
+    from ngram.services import build_ngram_index, NextWordIndex, format_prob_table
+    from ngram.mapped import write_model, open_model
+    tokens = default_simple_tokenize("el perro come. el gato come. el perro duerme mucho. un gato duerme. ñandú come " * 2)
+    index = build_ngram_index(tokens, 3, boundaries=True)
+    write_model(str(tmp_path / "modelo.ngm"), index)
+    model = open_model(str(tmp_path / "modelo.ngm"))
+    for with_bound in (False, True):
+        for n in (1, 2, 3):
+            expected = NextWordIndex.from_ngram_index(index, n, with_bound)
+            mapped = model.next_word_index(n, with_bound)
+            assert mapped.num_tokens == expected.num_tokens
+            for history in list(expected.next_words) + [("zz",) * (n - 1)]:
+                assert mapped.top(history) == expected.top(history)
+                assert mapped.top(history, 2) == expected.top(history, 2)
+            probs = expected.conditional_probabilities()
+            assert mapped.conditional_probabilities() == probs
+            assert mapped.table_page(5, 3) == (format_prob_table(probs, limit=5, offset=3), len(probs))
+
+def test_suggester_backoff_and_prefix():
+    from ngram.services import count_ngrams, Suggester
+    tokens = ["<s>", "<s>"] + default_simple_tokenize("el perro come. el perro duerme. el gato come mucho") + ["</s>"]
+    suggester = Suggester.from_counts(count_ngrams(tokens, 3), 3)
+    assert suggester.suggest(("el", "perro"), 2) == [("come", 0.5, 3), ("duerme", 0.5, 3)]
+    # historia no vista: se retrocede hasta unigramas
+    words = suggester.suggest(("zz", "yy"), 3)
+    assert [o for _, _, o in words] == [1, 1, 1] and words[0][0] == "el"
+    # palabra a medio escribir: sólo las que empiezan así, sin repetir entre órdenes
+    assert [w for w, _, _ in suggester.suggest(("el", "gato"), 5, "c")] == ["come"]
+    assert [w for w, _, _ in suggester.suggest(("zz",), 5, "m")] == ["mucho"]
+    assert all(w not in ("<s>", "</s>") for w, _, _ in suggester.suggest(("mucho",), 50))
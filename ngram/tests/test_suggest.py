@@ -0,0 +1,86 @@
+import sys, threading, unittest
+from unittest import mock
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.test import SimpleTestCase
+from ngram import suggest
+from ngram.services import CorpusCounts, build_ngram_index_from_counts
+from ngram.tokenizers import get_tokenizer
+
+TEXTO = "el perro come carne. el gato come pescado. el perro duerme."
+
+
+class Entrada:
+    """ Entrada del catálogo con el índice ya contado en memoria. """
+    def __init__(self, key):
+        self.key, self.sha256 = key, f"sha-{key}"
+    def ngram_index(self, n=None):
+        tokens = get_tokenizer(suggest.AUTOCOMPLETE_TOKENIZER)(TEXTO)
+        return build_ngram_index_from_counts(CorpusCounts(tokens, 3), boundaries=True)
+
+
+class Catalogo:
+    def get(self, key):
+        return Entrada(key) if key.startswith("doc") else None
+
+
+class SuggestQueryTests(SimpleTestCase):
+    def test_prefijo_e_historia(self):
+        self.assertEqual(suggest.suggest_query("el pe", 3, False), (("el",), "pe"))
+        self.assertEqual(suggest.suggest_query("el perro ", 3, False), (("el", "perro"), ""))
+        self.assertEqual(suggest.suggest_query("el perro come", 2, False), (("perro",), "come"))
+        self.assertEqual(suggest.suggest_query("", 1, False), ((), ""))
+
+    def test_fronteras_usan_la_oracion_en_curso(self):
+        self.assertEqual(suggest.suggest_query("el gato come. el pe", 3, True), (("<s>", "el"), "pe"))
+        self.assertEqual(suggest.suggest_query("el gato come.", 3, True), (("<s>", "<s>"), ""))
+        self.assertEqual(suggest.suggest_query("", 3, True), (("<s>", "<s>"), ""))
+
+    def test_sentences(self):
+        self.assertEqual(suggest.sentences("Hola mundo. ¿Qué tal? bien"), [["hola", "mundo"], ["qué", "tal"], ["bien"]])
+
+
+class GetSuggesterTests(SimpleTestCase):
+    def setUp(self):
+        for name, value in (("catalogo", Catalogo()), ("SUGGEST_CACHE_SIZE", 4)):
+            patcher = mock.patch.object(suggest, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        suggest._suggesters.clear()
+        self.addCleanup(suggest._suggesters.clear)
+
+    def test_preset_y_corpus_inexistente(self):
+        self.assertIsNotNone(suggest.get_suggester("literario", 2, True))
+        self.assertIsNone(suggest.get_suggester("no-existe", 2, True))
+
+    def test_lru(self):
+        primero = suggest.get_suggester("doc1", 2, True)
+        self.assertIs(suggest.get_suggester("doc1", 2, True), primero)
+        self.assertEqual([w for w, _, _ in primero.suggest(("perro",), 2)], ["come", "duerme"])
+        for i in range(2, 7):
+            suggest.get_suggester(f"doc{i}", 2, True)
+        self.assertEqual(len(suggest._suggesters), 4)
+        self.assertNotIn(("doc1", "sha-doc1", 2, True), suggest._suggesters)
+
+    def test_peticiones_concurrentes(self):
+        errores = []
+        def pedir(i):
+            try:
+                for j in range(30):
+                    s = suggest.get_suggester(f"doc{(i + j) % 7}", 2, j % 2 == 0)
+                    s.suggest(("el",), 3)
+            except Exception as ex:
+                errores.append(ex)
+        # cambios de hilo mucho más frecuentes para que las carreras aparezcan
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        hilos = [threading.Thread(target=pedir, args=(i,)) for i in range(8)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        self.assertEqual(errores, [])
+        self.assertLessEqual(len(suggest._suggesters), 4)
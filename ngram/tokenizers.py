@@ -0,0 +1,116 @@
+import re
+from itertools import filterfalse
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+# Registro de tokenizadores con nombre. Cada vista elige uno explícitamente
+# (get_tokenizer("limpio"), ...) y la función se importa una sola vez, al
+# iniciar (NgramConfig.ready) o en su primer uso.
+# NGRAM_TOKENIZERS = {"nombre": "ruta.a.funcion"} añade o reemplaza entradas y
+# NGRAM_DEFAULT_TOKENIZER elige el que usan /ngrams/, /ngrams/api/ y /ngrams/mle/.
+BUILTIN_TOKENIZERS = {
+    "simple": "ngram.services.default_simple_tokenize",
+    "autocompletar": "ngram.tokenizers.simple_tokenize",
+    "limpio": "lenguaje_natural.utils.clean_and_tokenize",
+}
+
+_registry: Dict[str, Callable[[str], List[str]]] = {}
+
+def simple_tokenize(text: str):
+    """Tokenizador del autocompletado: minúsculas, palabras, <s>/</s> y . ! ? sueltos."""
+    if not text:
+        return []
+    # minúsculas, separar por no-letras, preservar <s> y </s>
+    text = text.strip().lower()
+    text = re.sub(r"\s+", " ", text)
+    # Tokenización rústica por palabras con tildes y dígitos
+    toks = re.findall(r"<\/?s>|[\wáéíóúñü]+|[\.\!\?]", text, flags=re.IGNORECASE)
+    # Quitar puntos sueltos del final de oración (se usarán para split opcional simple)
+    return [t for t in toks if t]
+
+def tokenizer_paths() -> Dict[str, str]:
+    paths = dict(BUILTIN_TOKENIZERS)
+    paths.update(getattr(settings, "NGRAM_TOKENIZERS", {}) or {})
+    return paths
+
+def default_tokenizer_name() -> str:
+    return getattr(settings, "NGRAM_DEFAULT_TOKENIZER", "simple")
+
+def register(name: str, func: Callable[[str], List[str]]) -> None:
+    _registry[name] = func
+
+def get_tokenizer(name: str = None) -> Callable[[str], List[str]]:
+    """Devuelve la función registrada como `name` (por defecto NGRAM_DEFAULT_TOKENIZER)."""
+    name = name or default_tokenizer_name()
+    func = _registry.get(name)
+    if func is None:
+        path = tokenizer_paths().get(name)
+        if path is None:
+            raise ImproperlyConfigured(f"Tokenizador desconocido: {name!r}")
+        try:
+            func = import_string(path)
+        except ImportError as ex:
+            raise ImproperlyConfigured(f"No se pudo importar el tokenizador {name!r} ({path}): {ex}")
+        _registry[name] = func
+    return func
+
+def load_tokenizers() -> Dict[str, Callable[[str], List[str]]]:
+    """Resuelve todos los tokenizadores configurados (se llama al iniciar)."""
+    return {name: get_tokenizer(name) for name in tokenizer_paths()}
+
+# --- Tokenización por lotes ---
+# Cada perfil es una regex de una sola pasada (y, opcionalmente, un conjunto de
+# palabras vacías) que da exactamente los mismos tokens que su tokenizador de un
+# texto: "simple" y "autocompletar" (en minúsculas, [\wáé...] es \w) y "limpio"
+# (palabras de 3+ letras fuera de STOPWORDS_ES).
+TOKENIZE_PROFILES = {
+    "simple": (r"<\/?s>|\w+|[.!?]", None),
+    "autocompletar": (r"<\/?s>|\w+|[.!?]", None),
+    "limpio": (r"\w{3,}", "lenguaje_natural.utils.STOPWORDS_ES"),
+}
+# Separador de documentos dentro del lote (no es \w ni signo: nunca es parte de un token)
+DOC_SEP = "\x1e"
+
+_profiles = {}
+
+def _profile(name: str):
+    prof = _profiles.get(name)
+    if prof is None:
+        if name not in TOKENIZE_PROFILES:
+            raise ImproperlyConfigured(f"Perfil de tokenización desconocido: {name!r}")
+        pattern, stopwords = TOKENIZE_PROFILES[name]
+        prof = (re.compile(f"{pattern}|{DOC_SEP}"), import_string(stopwords) if stopwords else None)
+        _profiles[name] = prof
+    return prof
+
+def tokenize_many(texts: Iterable[str], profile: str = "simple", flat: bool = False
+                  ) -> Union[List[List[str]], Tuple[List[str], List[int]]]:
+    """
+    Tokeniza un lote de textos con una sola pasada de la regex del perfil sobre
+    todos ellos (unidos por DOC_SEP), en lugar de una llamada al tokenizador por documento.
+    Devuelve una lista de listas de tokens o, con flat=True, (tokens, offsets):
+    los tokens del documento i son tokens[offsets[i]:offsets[i + 1]].
+    """
+    texts = [t if isinstance(t, str) else str(t or "") for t in texts]
+    regex, stopwords = _profile(profile)
+    joined = DOC_SEP.join(texts)
+    if joined.count(DOC_SEP) != max(len(texts) - 1, 0):
+        # algún texto ya contiene el separador; para el tokenizador equivale a un espacio
+        joined = DOC_SEP.join(t.replace(DOC_SEP, " ") for t in texts)
+    toks = regex.findall(joined.lower())
+    if stopwords:
+        toks = list(filterfalse(stopwords.__contains__, toks))
+
+    # posiciones de los separadores: list.index recorre en C
+    cuts, start = [], 0
+    for _ in range(len(texts) - 1):
+        start = toks.index(DOC_SEP, start)
+        cuts.append(start)
+        start += 1
+    if flat:
+        offsets = [0] + [j - k for k, j in enumerate(cuts)] + [len(toks) - len(cuts)]
+        return list(filterfalse(DOC_SEP.__eq__, toks)), offsets if texts else [0]
+    bounds = [-1] + cuts + [len(toks)]
+    return [toks[bounds[i] + 1:bounds[i + 1]] for i in range(len(texts))]
@@ -7,5 +7,10 @@ urlpatterns = [
     path("mle/", views.ngrams_mle_view, name="ngrams_mle"),
     path("", views.ngrams_view, name="ngrams"),
     path("api/", views.ngrams_api, name="ngrams_api"),
+    path("api/bulk/", views.ngrams_bulk_api, name="ngrams_bulk_api"),
+    path("api/perplejidad/", views.perplexity_api, name="perplexity_api"),
     path("autocomplete/", views.autocomplete_view, name="autocomplete"),
+    path("autocomplete/suggest", views.suggest_api, name="suggest_api"),
+    path("cache/", views.cache_stats_api, name="cache_stats"),
+    path("export/", views.export_view, name="export"),
 ]
\ No newline at end of file
@@ -1,55 +1,66 @@
-import json
-from django.http import JsonResponse, HttpRequest, HttpResponse
+import json, math, time
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.http import require_http_methods
 
-from pathlib import Path
+from .presets import all_presets, get_preset, preset_max_n
 
 def get_preset_corpora():
     """
     Devuelve un dict con corpus de ejemplo para precargar desde la UI.
     Claves: 'literario', 'tecnico'. Cada entrada: {'label': 'Texto literario'|'Texto técnico', 'text': '...'}
+    Los textos vienen de ngram.presets (cargados al iniciar, recargados si cambia el archivo).
     """
-    base = Path(__file__).resolve().parents[1] / "docs"
-    data = {}
-    try:
-        txt = (base / "corpus_julieta_fierro.txt").read_text(encoding="utf-8")
-    except Exception:
-        txt = ""
-    data["literario"] = {"label": "Texto literario", "text": txt}
-    try:
-        txt2 = (base / "corpus_tecnico_algoritmos.txt").read_text(encoding="utf-8")
-    except Exception:
-        txt2 = ""
-    data["tecnico"] = {"label": "Texto técnico", "text": txt2}
-    return data
-
-from .services import default_simple_tokenize, ngram_frequencies, mle_conditional_probabilities, format_prob_table, _split_sentences, add_sentence_boundaries
-
-def _maybe_use_project_tokenizer(text: str):
-    """
-    Intenta usar una función de tokenización del proyecto si está disponible.
-    Busca nombres comunes y, si falla, usa el fallback simple.
-    """
-    candidates = [
-        # rutas potenciales (ajustables según el proyecto)
-        "nlp.tokenize",
-        "nlp.preprocessing.tokenize",
-        "preprocess.tokenize",
-        "text.preprocessing.tokenize",
-        "utils.tokenize",
-        "core.tokenize",
-    ]
-    for dotted in candidates:
-        try:
-            module_name, func_name = dotted.rsplit(".", 1)
-            mod = __import__(module_name, fromlist=[func_name])
-            func = getattr(mod, func_name, None)
-            if callable(func):
-                return func(text)
-        except Exception:
-            continue
-    return default_simple_tokenize(text)
+    return {key: {"label": p.label, "text": p.text} for key, p in all_presets().items()}
+
+from .tokenizers import get_tokenizer, default_tokenizer_name, tokenize_many, TOKENIZE_PROFILES
+from .services import np, mle_conditional_probabilities, format_prob_table, _split_sentences, add_sentence_boundaries, NextWordIndex, SmoothedLM, CorpusCounts, count_ngrams, count_ngram_order, index_counts, iter_mle, iter_ranked, count_file
+from .export import export_response, EXPORT_FORMATS
+from .cache import cached_result, acached_result, cache_stats, text_digest, tokens_digest
+from .pool import run_in_pool
+from .suggest import AUTOCOMPLETE_TOKENIZER, get_suggester, suggest_query
+
+def _default_tokenize(text: str):
+    """Tokenizador de /ngrams/, /ngrams/api/ y /ngrams/mle/ (NGRAM_DEFAULT_TOKENIZER)."""
+    return get_tokenizer()(text)
+
+def _frequencies_page(tokens, n: int, limit: int = None, offset: int = 0):
+    """
+    Página [offset, offset+limit) de la tabla de frecuencias de orden n, elegida
+    con la selección top-k (sin ordenar la tabla completa), con su total de filas
+    y el número de tokens.
+    """
+    counts = count_ngram_order(tokens, n)
+    return {"num_tokens": counts.num_tokens, "total": len(counts[n]),
+            "frequencies": counts.frequencies(n, limit=limit, offset=offset)}
+
+def _cached_frequencies(text: str, n: int, tokens=None, limit: int = None, offset: int = 0):
+    """_frequencies_page del texto (o de los tokens), reutilizada entre peticiones."""
+    if tokens:
+        digest, tokenizer = tokens_digest(tokens), "tokens"
+        compute = lambda: _frequencies_page(tokens, n, limit, offset)
+    else:
+        digest, tokenizer = text_digest(text), default_tokenizer_name()
+        compute = lambda: _frequencies_page(_default_tokenize(text), n, limit, offset)
+    return cached_result("freq", digest, n, compute, tokenizer=tokenizer, page=(offset, limit))
+
+def _frequencies_job(text: str, n: int, tokenizer: str, tokens=None, limit: int = None, offset: int = 0):
+    """Trabajo del pool: tokeniza (si hace falta) y devuelve la página pedida (_frequencies_page)."""
+    return _frequencies_page(tokens or get_tokenizer(tokenizer)(text), n, limit, offset)
+
+async def _acached_frequencies(text: str, n: int, tokens=None, limit: int = None, offset: int = 0):
+    """Versión async de _cached_frequencies: el cálculo se espera en el pool de procesos."""
+    if tokens:
+        digest, tokenizer = tokens_digest(tokens), "tokens"
+    else:
+        digest, tokenizer = text_digest(text), default_tokenizer_name()
+    compute = lambda: run_in_pool(_frequencies_job, text, n, default_tokenizer_name(), tokens, limit, offset)
+    return await acached_result("freq", digest, n, compute, tokenizer=tokenizer, page=(offset, limit))
+
+# Filas mostradas en /ngrams/ (el resto, en la descarga)
+NGRAMS_VIEW_ROWS = 100
 
 @require_http_methods(["GET", "POST"])
 def ngrams_view(request: HttpRequest) -> HttpResponse:
@@ -82,26 +93,27 @@ def ngrams_view(request: HttpRequest) -> HttpResponse:
             n_val = int(n)
             if n_val < 2:
                 raise ValueError("n debe ser >= 2")
-            tokens = _maybe_use_project_tokenizer(text)
-            freqs = ngram_frequencies(tokens, n_val)
-            # Orden descendente por frecuencia
-            sorted_items = sorted(freqs.items(), key=lambda kv: (-kv[1], kv[0]))
-            context["frequencies"] = sorted_items
+            # Orden descendente por frecuencia; la tabla completa se descarga en /ngrams/export/
+            page = _cached_frequencies(text, n_val, limit=NGRAMS_VIEW_ROWS)
+            context["frequencies"] = page["frequencies"]
+            context["total"] = page["total"]
         except Exception as ex:
             context["error"] = str(ex)
 
-    ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "julieta"); ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "literario"); return render(request, "ngram/ngrams.html", context)
+    context.setdefault("preset_corpora", get_preset_corpora()); context.setdefault("default_corpus_choice", "literario"); return render(request, "ngram/ngrams.html", context)
 
 @require_http_methods(["POST"])
-def ngrams_api(request: HttpRequest) -> JsonResponse:
+async def ngrams_api(request: HttpRequest) -> JsonResponse:
     """
-    Endpoint JSON. Cuerpo esperado (application/json):
+    Endpoint JSON (async: el conteo se ejecuta en el pool de procesos). Cuerpo esperado (application/json):
     {
         "tokens": ["hola","mundo",...],  # opcional si se envía "text"
         "text": "texto libre",           # opcional si se envían tokens
-        "n": 2
+        "n": 2,
+        "limit": 100,                    # opcional: tamaño de página (por defecto todas)
+        "offset": 0                      # opcional
     }
-    Devuelve: {"n": 2, "frequencies": [["hola mundo", 3], ...]}
+    Devuelve: {"n": 2, "total": 120, "offset": 0, "limit": 100, "frequencies": [["hola mundo", 3], ...]}
     """
     try:
         payload = json.loads(request.body.decode("utf-8"))
@@ -117,23 +129,246 @@ def ngrams_api(request: HttpRequest) -> JsonResponse:
     if n < 2:
         return JsonResponse({"error": "n debe ser >= 2"}, status=400)
 
-    if not tokens and text:
-        tokens = _maybe_use_project_tokenizer(text)
-    if not tokens:
+    limit = payload.get("limit")
+    offset = payload.get("offset", 0)
+    if (limit is not None and (not isinstance(limit, int) or limit < 0)) or not isinstance(offset, int) or offset < 0:
+        return JsonResponse({"error": "'limit' y 'offset' deben ser enteros >= 0"}, status=400)
+
+    if tokens is not None and not isinstance(tokens, list):
+        return JsonResponse({"error": "'tokens' debe ser una lista"}, status=400)
+    # como en /ngrams/api/bulk/: los tokens que no son texto (números) se convierten
+    tokens = [str(t) for t in tokens] if tokens else None
+    if not tokens and not text:
         return JsonResponse({"error": "Debes enviar 'tokens' o 'text'."}, status=400)
 
     try:
-        freqs = ngram_frequencies(tokens, n)
-        sorted_items = sorted(freqs.items(), key=lambda kv: (-kv[1], kv[0]))
-        return JsonResponse({"n": n, "frequencies": sorted_items})
+        page = await _acached_frequencies(text, n, tokens=tokens, limit=limit, offset=offset)
+        if not page["num_tokens"]:
+            # el texto no produjo ningún token
+            return JsonResponse({"error": "Debes enviar 'tokens' o 'text'."}, status=400)
+        return JsonResponse({"n": n, "total": page["total"], "offset": offset, "limit": limit,
+                             "frequencies": page["frequencies"]})
     except Exception as ex:
         return JsonResponse({"error": str(ex)}, status=500)
 
+# Documentos que se tokenizan juntos (tokenize_many) en /ngrams/api/bulk/
+BULK_BATCH_SIZE = 256
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/jsonl", "application/x-jsonlines"}
+
+def _bulk_documents(request: HttpRequest, payload=None):
+    """
+    Itera (documento, error) del cuerpo: el arreglo ya leído (`payload`) o NDJSON,
+    un documento por línea, leído a medida que llega. Una línea inválida produce
+    su error en su posición, sin cortar el lote.
+    """
+    if payload is None:
+        lines = (line.strip() for line in request)
+        for line in lines:
+            if not line:
+                continue
+            try:
+                doc = json.loads(line.decode("utf-8"))
+            except Exception:
+                yield None, "JSON inválido"
+                continue
+            yield (doc, None) if isinstance(doc, dict) else (None, "Cada línea debe ser un objeto JSON")
+    else:
+        for doc in payload:
+            yield (doc, None) if isinstance(doc, dict) else (None, "Cada documento debe ser un objeto JSON")
+
+def _bulk_text(doc: dict):
+    """Texto a tokenizar del documento, o None si trae 'tokens' (o nada)."""
+    text = doc.get("text")
+    return text if not doc.get("tokens") and isinstance(text, str) and text else None
+
+def _bulk_result(doc: dict, tokens, default_n):
+    """Resultado (dict) de un documento del lote: frecuencias de orden n, paginadas."""
+    n = doc.get("n", default_n)
+    limit = doc.get("limit")
+    offset = doc.get("offset", 0)
+    if not isinstance(n, int) or n < 2:
+        return {"error": "Debes enviar un entero 'n' >= 2"}
+    if (limit is not None and (not isinstance(limit, int) or limit < 0)) or not isinstance(offset, int) or offset < 0:
+        return {"error": "'limit' y 'offset' deben ser enteros >= 0"}
+    if not tokens:
+        return {"error": "Debes enviar 'tokens' o 'text'."}
+    counts = count_ngram_order(tokens, n)
+    return {"n": n, "total": len(counts[n]), "offset": offset, "limit": limit,
+            "frequencies": counts.frequencies(n, limit=limit, offset=offset)}
+
+def _bulk_lines(batch, position: int, default_n, name: str) -> str:
+    """
+    Trabajo del pool: tokeniza juntos (en una sola pasada) los textos de un lote
+    de (documento, error) y devuelve sus líneas NDJSON, una por documento y en orden.
+    `position` es la posición del primer documento del lote en la petición.
+    """
+    texts = [t for t in (_bulk_text(doc) for doc, error in batch if doc is not None) if t is not None]
+    if name in TOKENIZE_PROFILES:
+        tokenized = iter(tokenize_many(texts, profile=name))
+    else:
+        tokenized = map(get_tokenizer(name), texts)
+    lines = []
+    for doc, error in batch:
+        doc_id = doc.get("id", position) if doc is not None else position
+        position += 1
+        if error is None:
+            if _bulk_text(doc) is not None:
+                tokens = next(tokenized)
+            else:
+                tokens = [str(t) for t in doc.get("tokens") or []]
+            try:
+                out = _bulk_result(doc, tokens, default_n)
+            except Exception as ex:
+                out = {"error": str(ex)}
+        else:
+            out = {"error": error}
+        lines.append(json.dumps({"id": doc_id, **out}, ensure_ascii=False) + "\n")
+    return "".join(lines)
+
+async def _bulk_stream(docs, default_n):
+    """
+    Generador async de la respuesta: cada lote de BULK_BATCH_SIZE documentos se
+    cuenta en el pool de procesos y sus líneas se envían en cuanto están listas.
+    (Un generador síncrono, bajo ASGI, se consumiría entero antes de enviar nada.)
+    """
+    name = default_tokenizer_name()
+    position = 0
+    while True:
+        batch = list(islice(docs, BULK_BATCH_SIZE))
+        if not batch:
+            break
+        yield await run_in_pool(_bulk_lines, batch, position, default_n, name)
+        position += len(batch)
+
+@require_http_methods(["POST"])
+async def ngrams_bulk_api(request: HttpRequest):
+    """
+    Endpoint por lotes (async: los lotes se cuentan en el pool de procesos). Cuerpo: NDJSON (Content-Type: application/x-ndjson), un
+    documento por línea, o un arreglo JSON (también {"documents": [...]}):
+        {"id": "doc-1", "text": "texto libre", "n": 2, "limit": 10}
+        {"id": "doc-2", "tokens": ["hola", "mundo"], "n": 2}
+    ?n= da el n por defecto. La respuesta es NDJSON en streaming, una línea por
+    documento y en el mismo orden:
+        {"id": "doc-1", "n": 2, "total": 40, "offset": 0, "limit": 10, "frequencies": [["hola mundo", 3], ...]}
+        {"id": 7, "error": "..."}
+    """
+    default_n = request.GET.get("n")
+    try:
+        default_n = int(default_n) if default_n is not None else None
+    except ValueError:
+        return JsonResponse({"error": "'n' debe ser un entero"}, status=400)
+    if request.content_type not in NDJSON_CONTENT_TYPES:
+        try:
+            payload = json.loads(request.body.decode("utf-8"))
+        except Exception:
+            return JsonResponse({"error": "JSON inválido"}, status=400)
+        if isinstance(payload, dict):
+            payload = payload.get("documents")
+        if not isinstance(payload, list):
+            return JsonResponse({"error": "Envía un arreglo de documentos o NDJSON"}, status=400)
+    else:
+        payload = None
+    return StreamingHttpResponse(_bulk_stream(_bulk_documents(request, payload), default_n),
+                                 content_type="application/x-ndjson; charset=utf-8")
+
+@require_http_methods(["GET"])
+def cache_stats_api(request: HttpRequest) -> JsonResponse:
+    """Contadores de aciertos/fallos de la caché de resultados de n-gramas (de este proceso)."""
+    return JsonResponse(cache_stats())
+
+# Filas por página en las tablas de probabilidades
+MLE_PAGE_SIZE = 100
+
+# Modelo de las tablas MLE y del autocompletado: MLE sin suavizar (NextWordIndex)
+# o un SmoothedLM compilado; ambos tienen la misma interfaz (top, conditional_probabilities)
+MODELOS = [
+    ("mle", "MLE (sin suavizado)"),
+    ("kneser_ney", "Kneser-Ney interpolado"),
+    ("backoff", "Stupid backoff"),
+]
+
+def _parse_modelo(value) -> str:
+    return value if value in dict(MODELOS) else "mle"
+
+def _next_word_model(counts, n: int, modelo: str = "mle"):
+    """ NextWordIndex (modelo="mle") o SmoothedLM de orden n a partir de unos NgramCounts. """
+    return counts.next_word_index(n) if modelo == "mle" else counts.language_model(n, modelo)
+
+def _mle_tables_job(text: str, n: int, tokenizer: str, modelo: str = "mle", offset: int = 0, limit: int = MLE_PAGE_SIZE):
+    """
+    Trabajo del pool: ((tokens, página de la tabla de probabilidades, total de filas)
+    sin fronteras, ídem con fronteras); el texto se tokeniza y cuenta una sola vez
+    y cada página se elige con la selección top-k, sin ordenar la tabla completa.
+    """
+    corpus = CorpusCounts(get_tokenizer(tokenizer)(text), n)
+    tables = []
+    for counts in (corpus.counts(False), corpus.counts(True)):
+        if modelo == "mle":
+            probs = mle_conditional_probabilities(None, n, counts=counts)
+        else:
+            probs = counts.language_model(n, modelo).conditional_probabilities()
+        tables.append((counts.num_tokens, format_prob_table(probs, limit=limit, offset=offset), len(probs)))
+    return tuple(tables)
+
+async def _acached_mle_page(text: str, n: int, modelo: str = "mle", offset: int = 0):
+    """
+    Devuelve ((tokens, página, total) sin fronteras, ídem con fronteras) de la
+    página que empieza en `offset`, usando la caché de resultados; si falta alguna
+    variante se calculan ambas en el pool.
+    """
+    digest, tokenizer = text_digest(text), default_tokenizer_name()
+    kind = "mle" if modelo == "mle" else f"lm-{modelo}"
+    page = (offset, MLE_PAGE_SIZE)
+    job = []
+
+    async def compute(with_bound):
+        if not job:
+            job.append(await run_in_pool(_mle_tables_job, text, n, tokenizer, modelo, offset, MLE_PAGE_SIZE))
+        return job[0][int(with_bound)]
+
+    return (
+        await acached_result(kind, digest, n, lambda: compute(False), boundaries=False, tokenizer=tokenizer, page=page),
+        await acached_result(kind, digest, n, lambda: compute(True), boundaries=True, tokenizer=tokenizer, page=page),
+    )
+
+def _document_mle_tables(corpus_id: str, n: int, offset: int, modelo: str = "mle"):
+    """
+    Página de las tablas de probabilidades de un DocumentoLN guardado a partir de sus
+    índices precalculados: (tokens_nb, tabla_nb, tokens_wb, tabla_wb, total de filas).
+    LookupError si el documento no existe; ValueError si su índice no cubre el orden n.
+    """
+    try:
+        doc = DocumentoLN.objects.get(id=int(corpus_id))
+    except (DocumentoLN.DoesNotExist, ValueError):
+        raise LookupError("El corpus seleccionado no existe.")
+    nwi_nb = load_next_word_index(doc, n, modelo=modelo)
+    nwi_wb = load_next_word_index(doc, n, with_bound=True, modelo=modelo)
+    if nwi_nb is None or nwi_wb is None:
+        n_max = doc.indices.filter(tokenizador="simple").values_list("n_max", flat=True).first()
+        if n_max is None:
+            raise ValueError("El documento seleccionado no tiene índice de n-gramas (ejecuta manage.py backfill_lenguaje).")
+        raise ValueError(f"El documento seleccionado sólo tiene índice hasta n={n_max}; elige un n menor o igual.")
+    table_nb, total_nb = nwi_nb.table_page(MLE_PAGE_SIZE, offset)
+    table_wb, total_wb = nwi_wb.table_page(MLE_PAGE_SIZE, offset)
+    return nwi_nb.num_tokens, table_nb, nwi_wb.num_tokens, table_wb, max(total_nb, total_wb)
+
+def _preset_mle_table(choice: str, n: int, usar_fronteras: bool, modelo: str = "mle"):
+    """(etiqueta, primera página de la tabla de probabilidades, tokens) del preset `choice`."""
+    preset = get_preset(choice)
+    if preset is None:
+        return "Corpus seleccionado", [], 0
+    tokenizer = default_tokenizer_name()
+    return (preset.label, preset.prob_table(tokenizer, n, usar_fronteras, limit=MLE_PAGE_SIZE, modelo=modelo),
+            preset.size(tokenizer, n))
+
+
 @require_http_methods(["GET", "POST"])
-def ngrams_mle_view(request: HttpRequest) -> HttpResponse:
+async def ngrams_mle_view(request: HttpRequest) -> HttpResponse:
     """
     Página para calcular probabilidades condicionales (MLE) de n-gramas,
     con y sin fronteras de oración <s>, </s>.
+    Si se elige un documento guardado (corpus_id) se usan sus conteos precalculados;
+    si no, el texto se cuenta en el pool de procesos y la vista sólo espera el resultado.
     """
     ctx = {"result": None, "error": None}
     if request.method == "POST":
@@ -144,11 +379,6 @@ def ngrams_mle_view(request: HttpRequest) -> HttpResponse:
             presets = get_preset_corpora()
             if choice in presets and presets[choice].get("text"):
                 text = presets[choice]["text"]
-        if not text:
-            choice = request.POST.get("corpus_choice")
-            presets = get_preset_corpora()
-            if choice in presets and presets[choice]:
-                text = presets[choice]
         # Manejo de archivo subido (txt)
         uploaded_file = request.FILES.get("corpus_file")
         if uploaded_file and uploaded_file.name.endswith(".txt"):
@@ -156,7 +386,7 @@ def ngrams_mle_view(request: HttpRequest) -> HttpResponse:
                 text = uploaded_file.read().decode("utf-8")
             except Exception:
                 ctx["error"] = "No se pudo leer el archivo de texto. Asegúrate que sea UTF-8."
-                ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "julieta"); ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "literario"); ctx.pop('comparison', None); return render(request, "ngram/ngrams_mle.html", ctx)
+                return await _arender_mle(request, ctx)
 
         n_str = request.POST.get("n", "2")
         try:
@@ -165,91 +395,118 @@ def ngrams_mle_view(request: HttpRequest) -> HttpResponse:
                 raise ValueError("n debe ser >= 2")
         except Exception:
             ctx["error"] = "Debes indicar un entero n >= 2."
-            ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "julieta"); ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "literario"); ctx.pop('comparison', None); return render(request, "ngram/ngrams_mle.html", ctx)
+            return await _arender_mle(request, ctx)
+        try:
+            page = max(1, int(request.POST.get("page", "1")))
+        except ValueError:
+            page = 1
 
-        # Tokenización
         # Bandera para usar fronteras de oración <s> y </s>
         flag = (request.POST.get('usar_fronteras') or request.GET.get('usar_fronteras'))
         if flag is None:
             usar_fronteras = True
         else:
             usar_fronteras = str(flag).strip().lower() in {'1', 'true', 'on', 'sí', 'si', 'yes', 'y'}
+        modelo = _parse_modelo(request.POST.get("modelo"))
+
+        # Documento guardado: usar su índice precalculado en lugar de re-tokenizar
+        offset = (page - 1) * MLE_PAGE_SIZE
+        document_tables = None
+        corpus_id = (request.POST.get("corpus_id") or "").strip()
+        if corpus_id and DocumentoLN and load_next_word_index:
+            # un documento que no puede dar las tablas es un error, no un texto vacío
+            try:
+                document_tables = await sync_to_async(_document_mle_tables)(corpus_id, n, offset, modelo)
+            except LookupError as ex:
+                ctx["error"] = str(ex)
+                return await _arender_mle(request, ctx, status=404)
+            except ValueError as ex:
+                ctx["error"] = str(ex)
+                return await _arender_mle(request, ctx, status=400)
+            except Exception as ex:
+                ctx["error"] = f"No se pudo cargar el corpus seleccionado: {ex}"
+                return await _arender_mle(request, ctx, status=500)
 
-        tokens = _maybe_use_project_tokenizer(text)
-
-        # Caso 1: sin fronteras
         try:
-            probs_no_bound = mle_conditional_probabilities(tokens, n)
-            table_no_bound = format_prob_table(probs_no_bound)
+            if document_tables is not None:
+                size_no_bound, table_no_bound, size_with_bound, table_with_bound, total_rows = document_tables
+            else:
+                # Página pedida en caché (por contenido)
+                (size_no_bound, table_no_bound, total_nb), (size_with_bound, table_with_bound, total_wb) = \
+                    await _acached_mle_page(text, n, modelo, offset)
+                total_rows = max(total_nb, total_wb)
         except Exception as ex:
-            ctx["error"] = f"Error (sin fronteras): {ex}"
-            ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "julieta"); ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "literario"); 
-        # --- Comparación MLE: A = preset seleccionado; B = texto subido/personalizado ---
-        choice = request.POST.get("corpus_choice") or ctx.get("default_corpus_choice", "literario")
-        presets = get_preset_corpora()
-        preset_label = presets.get(choice, {}).get("label", "Corpus seleccionado")
-        preset_text = presets.get(choice, {}).get("text", "")
-
-        custom_text = text
+            ctx["error"] = f"Error: {ex}"
+            return await _arender_mle(request, ctx)
 
-        tokens_preset = _maybe_use_project_tokenizer(preset_text)
-        tokens_custom = _maybe_use_project_tokenizer(custom_text)
-
-        if n < 2:
-            raise ValueError("n debe ser >= 2")
-
-        # Caso sin/ con fronteras para ambos
+        # --- Comparación MLE: A = preset seleccionado; B = texto subido/personalizado ---
+        # El lado A sale de los presets precalculados; sólo se calcula el texto personalizado
+        choice = request.POST.get("corpus_choice") or "literario"
         try:
-            probs_preset = mle_conditional_probabilities(tokens_preset if not usar_fronteras else add_sentence_boundaries(_split_sentences(tokens_preset)), n)
-            table_a = format_prob_table(probs_preset)
+            preset_label, table_a, size_a = await sync_to_async(_preset_mle_table)(choice, n, usar_fronteras, modelo)
         except Exception as e:
-            table_a = []
+            preset_label, table_a, size_a = "Corpus seleccionado", [], 0
             ctx["error_a"] = f"Error (A): {e}"
 
-        try:
-            probs_custom = mle_conditional_probabilities(tokens_custom if not usar_fronteras else add_sentence_boundaries(_split_sentences(tokens_custom)), n)
-            table_b = format_prob_table(probs_custom)
-        except Exception as e:
-            table_b = []
-            ctx["error_b"] = f"Error (B): {e}"
-
         ctx.update({
             "comparison": {
-                "a": {"label": preset_label, "choice": choice, "probs": table_a, "size": len(tokens_preset)},
-                "b": {"label": "Texto personalizado", "probs": table_b, "size": len(tokens_custom)},
+                "a": {"label": preset_label, "choice": choice, "probs": table_a, "size": size_a},
+                "b": {"label": "Documento seleccionado" if document_tables is not None else "Texto personalizado",
+                      "probs": table_with_bound if usar_fronteras else table_no_bound,
+                      "size": size_with_bound if usar_fronteras else size_no_bound},
                 "n": n,
                 "usar_fronteras": usar_fronteras,
             }
         })
 
-        ctx.pop('comparison', None); return render(request, "ngram/ngrams_mle.html", ctx)
-
-        # Caso 2: con fronteras
-        try:
-            sent_tokens = _split_sentences(text)
-            tokens_with_bounds = add_sentence_boundaries(sent_tokens)
-            probs_with_bound = mle_conditional_probabilities(tokens_with_bounds, n)
-            table_with_bound = format_prob_table(probs_with_bound)
-        except Exception as ex:
-            ctx["error"] = f"Error (con fronteras): {ex}"
-            ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "julieta"); ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "literario"); ctx.pop('comparison', None); return render(request, "ngram/ngrams_mle.html", ctx)
-
         ctx["result"] = {
             "n": n,
-            "tokens_no_bound": tokens,
-            "tokens_with_bound": tokens_with_bounds,
+            "size_no_bound": size_no_bound,
+            "size_with_bound": size_with_bound,
             "probs_no_bound": table_no_bound,
-            "probs_with_bound": table_with_bound
+            "probs_with_bound": table_with_bound,
+            "page": page,
+            "prev_page": page - 1 if page > 1 else None,
+            "next_page": page + 1 if page * MLE_PAGE_SIZE < total_rows else None,
+            "total_rows": total_rows,
+            "modelo": modelo,
+            "modelo_label": dict(MODELOS)[modelo],
         }
-    ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "julieta"); ctx.setdefault("preset_corpora", get_preset_corpora()); ctx.setdefault("default_corpus_choice", "literario"); ctx.pop('comparison', None); return render(request, "ngram/ngrams_mle.html", ctx)
+    return await _arender_mle(request, ctx)
+
+
+def _render_mle(request, ctx, status=200):
+    ctx.setdefault("preset_corpora", get_preset_corpora())
+    ctx.setdefault("default_corpus_choice", "literario")
+    ctx.setdefault("documentos", _recent_documents())
+    ctx.setdefault("modelos", MODELOS)
+    return render(request, "ngram/ngrams_mle.html", ctx, status=status)
+
+# _recent_documents consulta la base de datos: desde las vistas async se renderiza en un hilo
+_arender_mle = sync_to_async(_render_mle)
+
+
+def _recent_documents(limit=50):
+    """ [(id, etiqueta)] de los últimos DocumentoLN guardados, para los selectores de corpus. """
+    if not catalogo:
+        return []
+    try:
+        return catalogo.choices(limit=limit, kinds=("documento",))
+    except Exception:
+        return []
 
 
 # === Autocompletar con n-gramas (MLE) ===
 from django import forms
 try:
     from lenguaje_natural.models import DocumentoLN
+    from lenguaje_natural.indices import load_next_word_index, load_index
+    from lenguaje_natural import catalogo
 except Exception:
     DocumentoLN = None
+    load_next_word_index = None
+    load_index = None
+    catalogo = None
 
 class AutocompleteForm(forms.Form):
     contexto = forms.CharField(
@@ -261,84 +518,129 @@ class AutocompleteForm(forms.Form):
     n = forms.ChoiceField(label="Orden del n-grama", choices=[("1","1 (unigramas)"),("2","2 (bigramas)"),("3","3 (trigramas)")], initial="2")
     usar_fronteras = forms.BooleanField(label="Activar fronteras de oración <s> y </s>", required=False, initial=True)
     corpus_id = forms.ChoiceField(label="Corpus", required=False)
-def __init__(self, *args, **kwargs):
+    modelo = forms.ChoiceField(label="Modelo", choices=MODELOS, initial="mle", required=False)
+    def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         opciones = [("", "— Texto personalizado (escribir o subir .txt) —")]
-        if DocumentoLN:
+        if catalogo:
             try:
-                qs = DocumentoLN.objects.order_by("-created_at")[:50]
-                for doc in qs:
-                    opciones.append((str(doc.id), f"{doc.nombre_original or os.path.basename(doc.archivo.name)} ({doc.created_at:%Y-%m-%d})"))
+                opciones += catalogo.choices(limit=50)
             except Exception:
                 pass
         self.fields["corpus_id"].choices = opciones
         self.fields["contexto"].widget.attrs.update({"placeholder": "Escribe aquí tu texto parcial, por ejemplo: 'el perro'"})
         self.fields["contexto"].widget.attrs["required"] = False
 
-# Tokenizador básico y utilidades locales (no dependemos de servicios truncados)
-import re
-def simple_tokenize(text: str):
-    if not text:
-        return []
-    # minúsculas, separar por no-letras, preservar <s> y </s>
-    text = text.strip().lower()
-    text = re.sub(r"\s+", " ", text)
-    # Tokenización rústica por palabras con tildes y dígitos
-    toks = re.findall(r"<\/?s>|[\wáéíóúñü]+|[\.\!\?]", text, flags=re.IGNORECASE)
-    # Quitar puntos sueltos del final de oración (se usarán para split opcional simple)
-    return [t for t in toks if t]
-
-def split_sentences(tokens):
-    # dividir por ., !, ? simples
-    sents, cur = [], []
-    for t in tokens:
-        if t in {".","!","?"}:
-            if cur:
-                sents.append(cur); cur=[]
-        else:
-            cur.append(t)
-    if cur:
-        sents.append(cur)
-    return sents
+def mle_next_word_probs(tokens, n, history):
+    """ Devuelve dict {palabra: prob} para la siguiente palabra, según MLE. """
+    return NextWordIndex.from_tokens(tokens, n).probs(history)
 
-def add_sentence_boundaries(sent_tokens):
-    with_bounds = []
-    for sent in sent_tokens:
-        with_bounds.extend(["<s>", "<s>"] + sent + ["</s>"])
-    return with_bounds
+def lm_next_word_probs(tokens, n, history, method="kneser_ney"):
+    """ Igual que mle_next_word_probs con un modelo suavizado (SmoothedLM): ninguna palabra queda con probabilidad cero. """
+    return count_ngrams(tokens, max(n, 1)).language_model(n, method).probs(history)
 
-from collections import Counter
 
-def ngram_counts(tokens, n):
-    if n == 1:
-        # unigrama: contamos palabras
-        return Counter(tokens)
-    return Counter(tuple(tokens[i:i+n]) for i in range(len(tokens)-n+1))
+# Filas mostradas en las tablas de probabilidades y en las comparaciones
+AUTOCOMPLETE_TABLE_ROWS = 100
+COMPARISON_ROWS = 30
 
-def mle_next_word_probs(tokens, n, history):
-    """ Devuelve dict {palabra: prob} para la siguiente palabra, según MLE. """
-    if n <= 1:
-        # Sugerir por frecuencia absoluta (unigrama)
-        uni = ngram_counts(tokens, 1)
-        total = sum(uni.values()) or 1
-        return {w: c/total for w,c in uni.items()}
-    # Para n >= 2
-    ngrams = ngram_counts(tokens, n)
-    prefix_counts = Counter(tuple(tokens[i:i+n-1]) for i in range(len(tokens)-n+2))
-    # Filtrar n-gramas que empatan con el history
-    cand = {}
-    for ng, c in ngrams.items():
-        if ng[:-1] == history:
-            denom = prefix_counts.get(history, 0)
-            if denom > 0:
-                cand[ng[-1]] = c/denom
-    return cand
-
-
-def autocomplete_view(request: HttpRequest) -> HttpResponse:
+
+def _autocomplete_source(corpus_id: str, n: int, modelo: str = "mle"):
+    """
+    Corpus base del autocompletado: (texto, índices (sin, con fronteras) o None, error).
+    El corpus se busca en el catálogo (lenguaje_natural.catalogo), que ya tiene los
+    modelos; sólo un documento sin índice obliga a leer su archivo. Consulta la
+    base de datos, por eso la vista async lo ejecuta en un hilo.
+    """
+    corpus_text, indexes, error = "", None, None
+    if corpus_id and catalogo:
+        try:
+            entry = catalogo.get(corpus_id)
+            if entry is None:
+                return corpus_text, indexes, "El corpus seleccionado no existe."
+            indexes = (entry.next_word_index(n, modelo=modelo), entry.next_word_index(n, with_bound=True, modelo=modelo))
+            if None in indexes:
+                indexes = None
+                corpus_text = entry.read_text()
+        except Exception as ex:
+            indexes, error = None, f"No se pudo leer el corpus seleccionado: {ex}"
+    return corpus_text, indexes, error
+
+def _autocomplete_tables(nwi_nb, nwi_wb, contexto: str, n: int, k: int = None):
+    """
+    Historia, sugerencia y tablas de probabilidades (pasos 4 a 6 del autocompletado).
+    `k` limita las continuaciones listadas (un modelo suavizado puntúa todo el vocabulario).
+    """
+    tokenize = get_tokenizer(AUTOCOMPLETE_TOKENIZER)
+
+    # 4) History segun contexto (el contexto se tokeniza una sola vez para ambas variantes)
+    ctx_tokens_nb = tokenize(contexto)
+    hist_nb = tuple(ctx_tokens_nb[-(n-1):]) if n >= 2 and len(ctx_tokens_nb) >= (n-1) else tuple(ctx_tokens_nb)
+
+    ctx_tokens_wb = add_sentence_boundaries(_split_sentences(ctx_tokens_nb))
+    hist_wb = tuple(ctx_tokens_wb[-(n-1):]) if n >= 2 and len(ctx_tokens_wb) >= (n-1) else tuple(ctx_tokens_wb)
+
+    # 5) Probabilidades MLE para siguiente palabra (ya ordenadas por el índice)
+    tabla_nb = [(w, p) for (w, p) in nwi_nb.top(hist_nb, k) if w not in ("<s>", "</s>")]
+    tabla_wb = nwi_wb.top(hist_wb, k)
+    sugerencia = (tabla_nb[0][0] if tabla_nb else (tabla_wb[0][0] if tabla_wb else "(sin sugerencia)"))
+
+    # 6) Tablas de probabilidades (sólo las primeras filas; el total se informa aparte)
+    full_nb, total_nb = nwi_nb.table_page(AUTOCOMPLETE_TABLE_ROWS)
+    full_wb, total_wb = nwi_wb.table_page(AUTOCOMPLETE_TABLE_ROWS)
+    return {
+        "history": list(hist_wb),
+        "sugerencia": sugerencia,
+        "probs_no_bound": tabla_nb,
+        "probs_with_bound": tabla_wb,
+        "full_no_bound": full_nb,
+        "full_with_bound": full_wb,
+        "total_no_bound": total_nb,
+        "total_with_bound": total_wb,
+        "num_tokens_corpus": nwi_nb.num_tokens,
+        "num_tokens_with_bound": nwi_wb.num_tokens,
+    }
+
+def _autocomplete_job(corpus_text: str, contexto: str, n: int, modelo: str = "mle", k: int = None):
+    """Trabajo del pool: tokeniza y cuenta el corpus base (paso 3) y calcula las tablas."""
+    corpus = CorpusCounts(get_tokenizer(AUTOCOMPLETE_TOKENIZER)(corpus_text), n)
+    return _autocomplete_tables(_next_word_model(corpus.plain, n, modelo), _next_word_model(corpus.with_bound, n, modelo),
+                                contexto, n, k)
+
+def _autocomplete_comparisons(choice: str, n: int, resultado, modelo: str = "mle"):
+    """Comparación de textos (preset A vs corpus base B) sin y con fronteras."""
+    # Corpus A: preset con conteos y tablas precalculados (ngram.presets)
+    preset = get_preset(choice) or get_preset("literario")
+    preset_label = preset.label
+
+    # El corpus B es el corpus base (documento, archivo o contexto): se reutilizan sus tablas
+    custom_nb = {"probs": resultado["full_no_bound"][:COMPARISON_ROWS], "size": resultado["num_tokens_corpus"]}
+    custom_wb = {"probs": resultado["full_with_bound"][:COMPARISON_ROWS], "size": resultado["num_tokens_with_bound"]}
+
+    comparison_nb = {
+        "a": {"label": preset_label, "probs": preset.prob_table(AUTOCOMPLETE_TOKENIZER, n, False, limit=COMPARISON_ROWS, modelo=modelo),
+              "size": preset.size(AUTOCOMPLETE_TOKENIZER, n)},
+        "b": {"label": "Texto personalizado", **custom_nb},
+        "n": n,
+    }
+    comparison_wb = {
+        "a": {"label": preset_label, "probs": preset.prob_table(AUTOCOMPLETE_TOKENIZER, n, True, limit=COMPARISON_ROWS, modelo=modelo),
+              "size": preset.size(AUTOCOMPLETE_TOKENIZER, n, True)},
+        "b": {"label": "Texto personalizado", **custom_wb},
+        "n": n,
+    }
+    return comparison_nb, comparison_wb
+
+
+async def autocomplete_view(request: HttpRequest) -> HttpResponse:
+    """
+    Autocompletado con n-gramas (async). Los índices de un documento guardado se
+    cargan en un hilo; un corpus de texto se tokeniza y cuenta en el pool de procesos.
+    """
     ctx = {}
     if request.method == "POST":
-        form = AutocompleteForm(request.POST, request.FILES)
+        form = await sync_to_async(AutocompleteForm)(request.POST, request.FILES)
+        ctx["form"] = form
         if form.is_valid():
             # 1) Entradas
             contexto = form.cleaned_data.get("contexto", "") or ""
@@ -354,106 +656,280 @@ def autocomplete_view(request: HttpRequest) -> HttpResponse:
             n = int(form.cleaned_data.get("n", 2))
             usar_fronteras = bool(form.cleaned_data.get("usar_fronteras"))
             corpus_id = (form.cleaned_data.get("corpus_id") or "").strip()
-
-            # 2) Construir corpus base
-            corpus_text = ""
-            if corpus_id and corpus_id.startswith("fs:"):
-                try:
-                    from django.conf import settings
-                    import os
-                    base_media = getattr(settings, "MEDIA_ROOT", None) or os.path.join(settings.BASE_DIR, "media")
-                    fpath = os.path.join(base_media, "lenguaje", corpus_id.split(":", 1)[1])
-                    with open(fpath, "r", encoding="utf-8", errors="ignore") as fh:
-                        corpus_text = fh.read()
-                except Exception as ex:
-                    ctx["error"] = f"No se pudo leer el corpus del sistema de archivos: {ex}"
-            elif corpus_id and DocumentoLN:
-                try:
-                    doc = DocumentoLN.objects.get(id=int(corpus_id))
-                    fpath = doc.archivo.path
-                    with open(fpath, "r", encoding="utf-8", errors="ignore") as fh:
-                        corpus_text = fh.read()
-                except Exception as ex:
-                    ctx["error"] = f"No se pudo leer el corpus seleccionado: {ex}"
-            if not corpus_text:
+            modelo = _parse_modelo(form.cleaned_data.get("modelo"))
+            k = None if modelo == "mle" else AUTOCOMPLETE_TABLE_ROWS
+
+            # 2) Construir corpus base (o cargar su índice precalculado)
+            corpus_text, indexes, error = await sync_to_async(_autocomplete_source)(corpus_id, n, modelo)
+            if error:
+                ctx["error"] = error
+            if not corpus_text and indexes is None:
                 # fallback: usar el propio contexto como mini corpus
                 corpus_text = contexto or ""
 
-            # 3) Tokenización con y sin fronteras
-            tokens_no_bound = simple_tokenize(corpus_text)
-            tokens_with_bound = add_sentence_boundaries(split_sentences(simple_tokenize(corpus_text)))
-
-            # 4) History segun contexto
-            ctx_tokens_nb = simple_tokenize(contexto)
-            hist_nb = tuple(ctx_tokens_nb[-(n-1):]) if n >= 2 and len(ctx_tokens_nb) >= (n-1) else tuple(ctx_tokens_nb)
-
-            ctx_tokens_wb = add_sentence_boundaries(split_sentences(simple_tokenize(contexto)))
-            hist_wb = tuple(ctx_tokens_wb[-(n-1):]) if n >= 2 and len(ctx_tokens_wb) >= (n-1) else tuple(ctx_tokens_wb)
-
-            # 5) Probabilidades MLE para siguiente palabra
-            probs_no_bound = mle_next_word_probs(tokens_no_bound, n, hist_nb)
-            probs_with_bound = mle_next_word_probs(tokens_with_bound, n, hist_wb)
-
-            # 6) Tablas completas (para mostrar) y top-k
-            full_nb = format_prob_table(mle_conditional_probabilities(tokens_no_bound, n), join_with=" ")
-            full_wb = format_prob_table(mle_conditional_probabilities(tokens_with_bound, n), join_with=" ")
-
-            tabla_nb = sorted([(w, p) for (w, p) in probs_no_bound.items() if w not in ("<s>", "</s>")], key=lambda kv: (-kv[1], kv[0]))
-            tabla_wb = sorted(probs_with_bound.items(), key=lambda kv: (-kv[1], kv[0]))
-            sugerencia = (tabla_nb[0][0] if tabla_nb else (tabla_wb[0][0] if tabla_wb else "(sin sugerencia)"))
-
-            ctx["form"] = form
-            ctx["resultado"] = {
-                "n": n,
-                "usar_fronteras": usar_fronteras,
-                "history": list(hist_wb),
-                "sugerencia": sugerencia,
-                "probs_no_bound": tabla_nb,
-                "probs_with_bound": tabla_wb,
-                "full_no_bound": full_nb,
-                "full_with_bound": full_wb,
-                "num_tokens_corpus": len(tokens_no_bound),
-            }
+            # 3) a 6) Con índice, sólo consultas (en un hilo); sin índice, conteo completo en el pool
+            if indexes is not None:
+                resultado = await sync_to_async(_autocomplete_tables)(*indexes, contexto, n, k)
+            else:
+                resultado = await run_in_pool(_autocomplete_job, corpus_text, contexto, n, modelo, k)
+            resultado.update({"n": n, "usar_fronteras": usar_fronteras, "modelo": modelo,
+                              "modelo_label": dict(MODELOS)[modelo]})
+            ctx["resultado"] = resultado
 
             # 7) Comparación de textos (Literario vs Personalizado) para NB/WB — se mantiene Autocomplete con/ sin fronteras
             try:
-                presets = get_preset_corpora()
                 choice = (request.POST.get("corpus_choice") or "").strip() or "literario"
-                preset = presets.get(choice) or next(iter(presets.values()), {})
-                preset_label = preset.get("label", "Texto literario")
-                preset_text = preset.get("text", "") or ""
-                custom_text = corpus_text or contexto or ""
-
-                tokens_preset_nb = simple_tokenize(preset_text)
-                tokens_custom_nb = simple_tokenize(custom_text)
-                tokens_preset_wb = add_sentence_boundaries(split_sentences(tokens_preset_nb))
-                tokens_custom_wb = add_sentence_boundaries(split_sentences(tokens_custom_nb))
-
-                from .services import mle_conditional_probabilities as _mle, format_prob_table as _fmt
-
-                ctx["comparison_nb"] = {
-                    "a": {"label": preset_label, "probs": _fmt(_mle(tokens_preset_nb, n)), "size": len(tokens_preset_nb)},
-                    "b": {"label": "Texto personalizado", "probs": _fmt(_mle(tokens_custom_nb, n)), "size": len(tokens_custom_nb)},
-                    "n": n,
-                }
-                ctx["comparison_wb"] = {
-                    "a": {"label": preset_label, "probs": _fmt(_mle(tokens_preset_wb, n)), "size": len(tokens_preset_wb)},
-                    "b": {"label": "Texto personalizado", "probs": _fmt(_mle(tokens_custom_wb, n)), "size": len(tokens_custom_wb)},
-                    "n": n,
-                }
+                ctx["comparison_nb"], ctx["comparison_wb"] = await sync_to_async(_autocomplete_comparisons)(choice, n, resultado, modelo)
             except Exception as _ex:
                 ctx.setdefault("error_comparison", str(_ex))
+    else:
+        ctx["form"] = await sync_to_async(AutocompleteForm)(initial={"n": "2", "usar_fronteras": True})
+    ctx.setdefault("preset_corpora", get_preset_corpora())
+    ctx.setdefault("default_corpus_choice", "literario")
+    return await sync_to_async(render)(request, "ngram/autocomplete.html", ctx)
+
 
-            ctx.setdefault("preset_corpora", get_preset_corpora())
-            ctx.setdefault("default_corpus_choice", "literario")
-            return render(request, "ngram/autocomplete.html", ctx)
+# === Sugerencias al escribir: /ngrams/autocomplete/suggest ===
+SUGGEST_DEFAULT_K = 5
+SUGGEST_MAX_K = 50
+SUGGEST_DEFAULT_CORPUS = "literario"
+
+@require_http_methods(["GET"])
+def suggest_api(request: HttpRequest) -> JsonResponse:
+    """
+    Las k siguientes palabras más probables para lo escrito hasta ahora, pensado
+    para consultarse en cada pulsación. Parámetros (GET):
+        corpus     preset ("literario", "tecnico") o clave del catálogo (id de documento, "fs:<ruta>")
+        q          texto escrito; si termina a media palabra, ésta se completa
+        k          número de sugerencias (por defecto 5, máximo 50)
+        n          orden del modelo (por defecto NGRAM_INDEX_MAX_N)
+        fronteras  0|1 (por defecto 1): la historia es la oración en curso
+    Devuelve: {"corpus": ..., "n": 3, "history": ["el"], "prefix": "ga",
+               "suggestions": [{"word": "gato", "prob": 0.5, "order": 2}, ...], "timing_ms": 0.08}
+    El modelo de cada corpus se construye una vez y se guarda en memoria.
+    """
+    start = time.perf_counter()
+    data = request.GET
+    corpus = (data.get("corpus") or SUGGEST_DEFAULT_CORPUS).strip()
+    q = data.get("q", "")
+    max_n = preset_max_n()
+    try:
+        k = int(data.get("k", SUGGEST_DEFAULT_K))
+        n = int(data.get("n", max_n))
+    except ValueError:
+        return JsonResponse({"error": "'k' y 'n' deben ser enteros"}, status=400)
+    if not 1 <= k <= SUGGEST_MAX_K:
+        return JsonResponse({"error": f"'k' debe estar entre 1 y {SUGGEST_MAX_K}"}, status=400)
+    if not 1 <= n <= max_n:
+        return JsonResponse({"error": f"'n' debe estar entre 1 y {max_n}"}, status=400)
+    with_bound = str(data.get("fronteras", "1")).strip().lower() in {"1", "true", "on", "sí", "si", "yes", "y"}
+    try:
+        suggester = get_suggester(corpus, n, with_bound)
+    except Exception as ex:
+        return JsonResponse({"error": f"No se pudo cargar el corpus: {ex}"}, status=500)
+    if suggester is None:
+        return JsonResponse({"error": "Corpus no encontrado"}, status=404)
+    history, prefix = suggest_query(q, n, with_bound)
+    suggestions = [{"word": w, "prob": p, "order": order} for w, p, order in suggester.suggest(history, k, prefix)]
+    return JsonResponse({
+        "corpus": corpus,
+        "n": n,
+        "history": list(history),
+        "prefix": prefix,
+        "suggestions": suggestions,
+        "timing_ms": round((time.perf_counter() - start) * 1000, 3),
+    })
+
+def _export_text(request: HttpRequest) -> str:
+    """Texto del formulario: textarea, archivo .txt subido o, si no hay, el preset elegido."""
+    data = request.POST if request.method == "POST" else request.GET
+    text = data.get("text", "")
+    uploaded_file = request.FILES.get("corpus_file")
+    if not text and uploaded_file and uploaded_file.name.endswith(".txt"):
+        text = uploaded_file.read().decode("utf-8", errors="ignore")
+    if not text:
+        preset = get_preset(data.get("corpus_choice") or "")
+        text = preset.text if preset else ""
+    return text
+
+def _export_table(request: HttpRequest):
+    """
+    Valida los parámetros y prepara las filas a exportar (síncrono: lee el
+    formulario, la base y los índices). Devuelve una JsonResponse de error o
+    la tupla (rows, header, formato, filename).
+    """
+    data = request.POST if request.method == "POST" else request.GET
+    tabla = data.get("tabla", "frecuencias")
+    formato = data.get("formato", "csv")
+    with_bound = str(data.get("fronteras", "")).strip().lower() in {"1", "true", "on", "sí", "si", "yes", "y"}
+    modelo = _parse_modelo(data.get("modelo")) if tabla == "mle" else "mle"
+    try:
+        n = int(data.get("n", "2"))
+    except ValueError:
+        n = 0
+    if tabla not in ("frecuencias", "mle") or formato not in EXPORT_FORMATS:
+        return JsonResponse({"error": "tabla debe ser frecuencias|mle y formato csv|ndjson"}, status=400)
+    if n < (2 if tabla == "mle" else 1):
+        return JsonResponse({"error": "n inválido"}, status=400)
+
+    # Conteos de orden n (y n-1 para MLE) desde el índice del documento, un preset o el texto
+    counts = None
+    corpus_id = (data.get("corpus_id") or "").strip()
+    if corpus_id and DocumentoLN:
+        try:
+            doc = DocumentoLN.objects.get(id=int(corpus_id))
+        except Exception:
+            return JsonResponse({"error": "Corpus no encontrado"}, status=404)
+        index = load_index(doc, default_tokenizer_name(), n) if load_index else None
+        if index is not None and (not with_bound or "orders_wb" in index):
+            n_counts = index_counts(index, n, with_bound)
+            prefix_counts = index_counts(index, n - 1, with_bound) if n > 1 else None
         else:
-            ctx["form"] = form
-            ctx.setdefault("preset_corpora", get_preset_corpora())
-            ctx.setdefault("default_corpus_choice", "literario")
-            return render(request, "ngram/autocomplete.html", ctx)
+            # sin índice: se cuenta el archivo por bloques
+            counts = count_file(doc.archivo.path, n, tokenize=get_tokenizer(), boundaries=with_bound).counts(with_bound)
+    else:
+        text = _export_text(request)
+        if not text:
+            return JsonResponse({"error": "Debes enviar un texto, un archivo o un corpus"}, status=400)
+        counts = CorpusCounts(_default_tokenize(text), n).counts(with_bound)
+    if counts is not None:
+        n_counts, prefix_counts = counts[n], (counts[n - 1] if n > 1 else None)
+
+    if tabla == "frecuencias":
+        rows, header = iter_ranked(n_counts.items()), ("ngrama", "frecuencia")
+    elif modelo == "mle":
+        rows, header = iter_ranked(iter_mle(n_counts, prefix_counts)), ("ngrama", "probabilidad")
+    else:
+        lm = counts.language_model(n, modelo) if counts is not None else SmoothedLM.from_ngram_index(index, n, with_bound, modelo)
+        rows, header = iter_ranked(lm.conditional_probabilities().items()), ("ngrama", "probabilidad")
+    suffix = ("_fronteras" if with_bound else "") + ("" if modelo == "mle" else f"_{modelo}")
+    return rows, header, formato, f"{tabla}_n{n}{suffix}"
+
+@require_http_methods(["GET", "POST"])
+async def export_view(request: HttpRequest):
+    """
+    Descarga la tabla completa en streaming (CSV o NDJSON).
+    Parámetros: tabla=frecuencias|mle, formato=csv|ndjson, n, fronteras=0|1,
+    modelo (para tabla=mle: mle|kneser_ney|backoff) y la fuente: corpus_id
+    (índice del documento), text / corpus_file o corpus_choice (preset).
+    (async: las filas se generan en un hilo y se envían por bloques)
+    """
+    table = await sync_to_async(_export_table)(request)
+    if isinstance(table, HttpResponse):
+        return table
+    return export_response(*table, asynchronous=True)
+
+
+# Oraciones por petición en /ngrams/api/perplejidad/
+PERPLEXITY_MAX_SENTENCES = 100000
+# Modelos con los que la perplejidad tiene sentido: los de LM_METHODS que dan
+# probabilidades normalizadas (stupid backoff no)
+PERPLEXITY_METHODS = ("kneser_ney",)
+
+def _perplexity_model(payload, n: int, with_bound: bool, modelo: str, tokenizer: str) -> SmoothedLM:
+    """SmoothedLM del corpus pedido: documento (índice en caché), texto o preset (compilado una vez)."""
+    corpus_id = payload.get("corpus_id")
+    if corpus_id not in (None, ""):
+        if not DocumentoLN:
+            raise LookupError("Corpus no encontrado")
+        try:
+            doc = DocumentoLN.objects.get(id=int(corpus_id))
+        except (DocumentoLN.DoesNotExist, TypeError, ValueError):
+            raise LookupError("Corpus no encontrado")
+        lm = load_next_word_index(doc, n, with_bound, tokenizador=tokenizer, modelo=modelo) if load_next_word_index else None
+        if lm is None:
+            # sin índice: se cuenta el archivo por bloques
+            counts = count_file(doc.archivo.path, n, tokenize=get_tokenizer(tokenizer), boundaries=with_bound).counts(with_bound)
+            lm = counts.language_model(n, modelo)
+        return lm
+    text = payload.get("text")
+    if text:
+        return CorpusCounts(get_tokenizer(tokenizer)(text), n).counts(with_bound).language_model(n, modelo)
+    preset = get_preset(payload.get("corpus") or "literario")
+    if preset is None:
+        raise LookupError("Corpus no encontrado")
+    return preset.language_model(tokenizer, n, with_bound, modelo)
+
+@require_http_methods(["POST"])
+def perplexity_api(request: HttpRequest) -> JsonResponse:
+    """
+    Puntúa un lote de oraciones con un modelo suavizado compilado (ArrayLM):
+    todas las oraciones se codifican a ids y se evalúan juntas con NumPy.
+    Cuerpo esperado (application/json):
+    {
+        "sentences": ["el perro come", ...],
+        "corpus": "literario",      # preset; o "corpus_id": 3 (documento) o "text": "corpus libre"
+        "n": 3,                     # opcional
+        "modelo": "kneser_ney",     # opcional: solo kneser_ney (backoff no da probabilidades: 400)
+        "fronteras": true           # opcional: puntuar <s> <s> oración </s>
+    }
+    Devuelve: {"n": 3, "modelo": ..., "num_sentences": 2, "tokens": 9, "logprob": -31.2,
+               "perplexity": 32.1, "timing_ms": {"model": ..., "tokenize": ..., "score": ..., "total": ...},
+               "scores": [{"logprob": -12.3, "tokens": 4, "perplexity": 21.7}, ...]}
+    Logaritmos naturales; perplejidad = exp(-logprob / tokens).
+    """
+    if np is None:
+        return JsonResponse({"error": "La puntuación por lotes requiere numpy"}, status=501)
+    start = time.perf_counter()
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "Se esperaba un objeto JSON"}, status=400)
+
+    sentences = payload.get("sentences")
+    if not isinstance(sentences, list) or not all(isinstance(s, str) for s in sentences):
+        return JsonResponse({"error": "'sentences' debe ser una lista de textos"}, status=400)
+    if len(sentences) > PERPLEXITY_MAX_SENTENCES:
+        return JsonResponse({"error": f"Como máximo {PERPLEXITY_MAX_SENTENCES} oraciones por petición"}, status=400)
+    n = payload.get("n", 3)
+    if not isinstance(n, int) or n < 1:
+        return JsonResponse({"error": "'n' debe ser un entero >= 1"}, status=400)
+    modelo = payload.get("modelo", "kneser_ney")
+    if modelo == "backoff":
+        return JsonResponse({"error": "'backoff' (stupid backoff) da puntajes que no suman 1, no probabilidades: "
+                                      "su perplejidad no tiene sentido. Usa 'kneser_ney'."}, status=400)
+    if modelo not in PERPLEXITY_METHODS:
+        return JsonResponse({"error": f"'modelo' debe ser uno de: {', '.join(PERPLEXITY_METHODS)}"}, status=400)
+    with_bound = payload.get("fronteras", True)
+    if not isinstance(with_bound, bool):
+        return JsonResponse({"error": "'fronteras' debe ser true o false"}, status=400)
+    tokenizer = default_tokenizer_name()
+
+    try:
+        arrays = _perplexity_model(payload, n, with_bound, modelo, tokenizer).arrays()
+    except LookupError as ex:
+        return JsonResponse({"error": str(ex)}, status=404)
+    except Exception as ex:
+        return JsonResponse({"error": str(ex)}, status=500)
+    t_model = time.perf_counter()
+    if tokenizer in TOKENIZE_PROFILES:
+        tokens = tokenize_many(sentences, profile=tokenizer)
     else:
-        ctx["form"] = AutocompleteForm(initial={"n": "2", "usar_fronteras": True})
-        ctx.setdefault("preset_corpora", get_preset_corpora())
-        ctx.setdefault("default_corpus_choice", "literario")
-        return render(request, "ngram/autocomplete.html", ctx)
+        tokenize = get_tokenizer(tokenizer)
+        tokens = [tokenize(s) for s in sentences]
+    t_tokenize = time.perf_counter()
+    logprobs, counts = arrays.score_batch(tokens, boundaries=with_bound)
+    perplexities = np.exp(-logprobs / np.maximum(counts, 1))
+    t_score = time.perf_counter()
+
+    total_lp, total_tokens = float(logprobs.sum()), int(counts.sum())
+    scores = [{"logprob": lp, "tokens": c, "perplexity": ppl if c else None}
+              for lp, c, ppl in zip(logprobs.tolist(), counts.tolist(), perplexities.tolist())]
+    ms = lambda a, b: round((b - a) * 1000, 3)
+    return JsonResponse({
+        "n": n,
+        "modelo": modelo,
+        "num_sentences": len(sentences),
+        "tokens": total_tokens,
+        "logprob": total_lp,
+        "perplexity": math.exp(-total_lp / total_tokens) if total_tokens else None,
+        "timing_ms": {
+            "model": ms(start, t_model),
+            "tokenize": ms(t_model, t_tokenize),
+            "score": ms(t_tokenize, t_score),
+            "total": ms(start, time.perf_counter()),
+        },
+        "scores": scores,
+    })
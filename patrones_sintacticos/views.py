@@ -1,5 +1,6 @@
 
-import re, io
+import re, io, os
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_protect
@@ -7,21 +8,30 @@ from django.core.files.base import ContentFile
 from .models import DocumentoPatrones
 from .lexer import scan
 from .parser import Parser, ParseError
+from ngram.pool import run_in_pool
+from trabajos.cola import encolar, en_segundo_plano
 
 def index(request):
     return render(request, "patrones_sintacticos/index.html")
 
-@csrf_protect
-def upload(request):
-    if request.method != "POST" or "file" not in request.FILES:
-        return render(request, "patrones_sintacticos/index.html", {"error": "Sube un archivo .txt con código para analizar."}, status=400)
-    f = request.FILES["file"]
-    raw = f.read()
-    try:
-        content = raw.decode("utf-8")
-    except Exception:
-        content = raw.decode("latin-1", errors="ignore")
+def pp(node, depth=0, out=None):
+    out = out or []
+    if node is None:
+        return out
+    if hasattr(node, "name"):
+        out.append("  " * depth + node.name)
+        for ch in getattr(node, "children", []):
+            pp(ch, depth+1, out)
+    else:
+        out.append("  " * depth + str(node))
+    return out
 
+def analizar(content):
+    """
+    Análisis léxico y sintáctico de `content`: (tokens, conteos por tipo, árbol
+    impreso o None, error de parseo o None, TSV de tokens). Se ejecuta en el pool
+    de procesos de ngram.pool, por eso todo lo que devuelve es serializable.
+    """
     tokens = scan(content)
     counts = {}
     for t in tokens:
@@ -35,32 +45,55 @@ def upload(request):
     except ParseError as e:
         parse_error = {"message": e.message, "line": e.line, "col": e.col, "expected": e.expected}
 
-    doc = DocumentoPatrones(nombre_original=f.name, reservadas=counts.get("PALABRA_RESERVADA",0), variables=counts.get("IDENTIFICADOR",0))
-    doc.save()
-    doc.archivo.save(f.name, ContentFile(raw), save=False)
-
     lines = ["tipo\tlexema\tlinea\tcolumna"]
     for t in tokens:
         safe_lex = t.lexeme.replace("\t", "\\t").replace("\n", "\\n")
         lines.append(f"{t.type}\t{safe_lex}\t{t.line}\t{t.col}")
     tsv = "\n".join(lines).encode("utf-8")
-    out_name = f.name.rsplit('.',1)[0] + "_tokens.tsv"
+
+    parse_tree_lines = pp(parse_tree) if parse_tree else None
+    return tokens, counts, parse_tree_lines, parse_error, tsv
+
+def decodificar(raw):
+    try:
+        return raw.decode("utf-8")
+    except Exception:
+        return raw.decode("latin-1", errors="ignore")
+
+def guardar_documento(nombre, raw, counts=None, tsv=None):
+    """Guarda el archivo original y, si ya se analizó, sus conteos y el TSV de tokens."""
+    doc = DocumentoPatrones(nombre_original=nombre)
+    doc.save()
+    doc.archivo.save(nombre, ContentFile(raw), save=False)
+    if counts is None:
+        doc.save()
+        return doc
+    return guardar_analisis(doc, counts, tsv)
+
+def guardar_analisis(doc, counts, tsv):
+    doc.reservadas = counts.get("PALABRA_RESERVADA",0)
+    doc.variables = counts.get("IDENTIFICADOR",0)
+    out_name = (doc.nombre_original or os.path.basename(doc.archivo.name)).rsplit('.',1)[0] + "_tokens.tsv"
     doc.archivo_transformado.save(out_name, ContentFile(tsv), save=False)
     doc.save()
+    return doc
 
-    def pp(node, depth=0, out=None):
-        out = out or []
-        if node is None:
-            return out
-        if hasattr(node, "name"):
-            out.append("  " * depth + node.name)
-            for ch in getattr(node, "children", []):
-                pp(ch, depth+1, out)
-        else:
-            out.append("  " * depth + str(node))
-        return out
+@csrf_protect
+async def upload(request):
+    if request.method != "POST" or "file" not in request.FILES:
+        return await sync_to_async(render)(request, "patrones_sintacticos/index.html", {"error": "Sube un archivo .txt con código para analizar."}, status=400)
+    f = request.FILES["file"]
+    raw = f.read()
 
-    parse_tree_lines = pp(parse_tree) if parse_tree else None
+    # Archivo grande: se guarda y se analiza en la cola de trabajos; se responde con su id
+    if en_segundo_plano(f.size):
+        doc = await sync_to_async(guardar_documento)(f.name, raw)
+        trabajo = await sync_to_async(encolar)("patrones.analizar", documento=doc.id)
+        return await sync_to_async(render)(request, "patrones_sintacticos/index.html", {"trabajo": trabajo}, status=202)
+
+    # lexer y parser en el pool de procesos; guardar en la base de datos, en un hilo
+    tokens, counts, parse_tree_lines, parse_error, tsv = await run_in_pool(analizar, decodificar(raw))
+    doc = await sync_to_async(guardar_documento)(f.name, raw, counts, tsv)
 
     ctx = {
         "counts": counts,
@@ -86,4 +119,4 @@ def upload(request):
             "factor → ( exp ) | número | identificador",
         ]
     }
-    return render(request, "patrones_sintacticos/index.html", ctx)
+    return await sync_to_async(render)(request, "patrones_sintacticos/index.html", ctx)
@@ -2,3 +2,8 @@ import os
 from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema.settings')
 application = get_asgi_application()
+
+# Presets de /ngrams/ leídos y contados al arrancar el servidor web, antes de la
+# primera petición (sólo aquí: no en los comandos ni en los procesos del pool)
+from ngram.presets import preload  # noqa: E402
+preload()
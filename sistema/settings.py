@@ -16,6 +16,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'lenguaje_natural',
     'patrones_sintacticos',
+    'trabajos',
 ]
 
 MIDDLEWARE = [
@@ -53,6 +54,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # los procesos de `procesar_trabajos` escriben a la vez: las transacciones
+        # toman el bloqueo de escritura al empezar y esperan hasta `timeout` segundos
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
@@ -71,3 +75,60 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+# N-gramas: orden máximo de los índices precalculados por documento y
+# procesos para el conteo paralelo de archivos grandes (1 = secuencial)
+NGRAM_INDEX_MAX_N = 3
+NGRAM_WORKERS = 1
+
+# Modelos binarios de los documentos (ngram.mapped), abiertos con mmap y
+# compartidos por todos los procesos: None = MEDIA_ROOT/modelos
+NGRAM_MODEL_DIR = None
+
+# Corpus global (lenguaje_natural.corpus_global): los conteos de cada documento se
+# suman al guardar su índice y se restan al borrarlo
+LENGUAJE_CORPUS_GLOBAL = True
+
+# Tokenizador cuyos conteos por documento se materializan en ConteoNgramaLN
+LENGUAJE_CONTEOS_TOKENIZADOR = "limpio"
+
+# Catálogo de corpus de los selectores (lenguaje_natural.catalogo): segundos tras
+# los que se vuelve a recorrer MEDIA_ROOT/lenguaje (las altas y bajas de
+# documentos lo invalidan antes)
+LENGUAJE_CATALOGO_TTL = 60
+
+# Caché de resultados de n-gramas (ngram.cache). LocMemCache expulsa primero la
+# entrada usada hace más tiempo (LRU) y, con CULL_FREQUENCY == MAX_ENTRIES, de una
+# en una. Para compartirla entre procesos basta con usar FileBasedCache.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "ngram": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ngram-resultados",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 256, "CULL_FREQUENCY": 256},
+    },
+}
+NGRAM_CACHE_ALIAS = "ngram"
+# MAX_ENTRIES limita cuántas entradas hay, no su tamaño: un resultado que
+# serializado ocupa más de NGRAM_CACHE_MAX_BYTES se calcula pero no se guarda
+NGRAM_CACHE_MAX_BYTES = 1024 * 1024
+
+# Tokenizadores con nombre (ngram.tokenizers): entradas extra {"nombre": "ruta.a.funcion"}
+# y el que usan /ngrams/, /ngrams/api/ y /ngrams/mle/
+NGRAM_TOKENIZERS = {}
+NGRAM_DEFAULT_TOKENIZER = "simple"
+
+# Pool de procesos de las vistas async (ngram.pool): None = un proceso por CPU,
+# 0 = hilos en lugar de procesos
+NGRAM_POOL_WORKERS = None
+
+# Cola de trabajos (trabajos.cola): los archivos de al menos TRABAJOS_UMBRAL_BYTES
+# se analizan en segundo plano (None = nunca); `procesar_trabajos` usa
+# TRABAJOS_WORKERS procesos (None = uno por CPU) y vuelve a encolar los trabajos
+# en curso desde hace más de TRABAJOS_MAX_DURACION segundos (hasta TRABAJOS_MAX_INTENTOS veces;
+# después los marca como fallidos)
+TRABAJOS_UMBRAL_BYTES = 1024 * 1024
+TRABAJOS_WORKERS = None
+TRABAJOS_MAX_DURACION = 3600
+TRABAJOS_MAX_INTENTOS = 3
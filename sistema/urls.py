@@ -11,4 +11,5 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('lenguaje/', include('lenguaje_natural.urls')),
     path('patrones/', include('patrones_sintacticos.urls')),
+    path('trabajos/', include('trabajos.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import Trabajo
+@admin.register(Trabajo)
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "estado", "intentos", "trabajador", "created_at", "finished_at")
+    list_filter = ("estado", "tipo")
+    readonly_fields = ("created_at", "started_at", "finished_at")
@@ -0,0 +1,4 @@
+from django.apps import AppConfig
+class TrabajosConfig(AppConfig):
+    default_auto_field = 'django.db.models.AutoField'
+    name = 'trabajos'
@@ -0,0 +1,116 @@
+import json, multiprocessing, os, socket
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+import django
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Trabajo
+
+# Cola de trabajos en la propia base de datos, sin broker externo: las vistas
+# encolan el análisis de archivos grandes y responden enseguida con el id del
+# trabajo; `manage.py procesar_trabajos` los reclama y ejecuta en un pool de
+# procesos. Cada tipo de trabajo es una función importable que recibe los
+# parámetros guardados y devuelve un resultado serializable a JSON.
+# TRABAJOS_TAREAS = {"tipo": "ruta.a.funcion"} añade o reemplaza entradas.
+TAREAS = {
+    "lenguaje.ingestar": "trabajos.tareas.ingestar_lenguaje",
+    "patrones.analizar": "trabajos.tareas.analizar_patrones",
+}
+
+def tareas():
+    paths = dict(TAREAS)
+    paths.update(getattr(settings, "TRABAJOS_TAREAS", {}) or {})
+    return paths
+
+def get_tarea(tipo):
+    path = tareas().get(tipo)
+    if path is None:
+        raise ImproperlyConfigured(f"Tipo de trabajo desconocido: {tipo!r}")
+    return import_string(path)
+
+def en_segundo_plano(size) -> bool:
+    """¿Un archivo de `size` bytes se analiza en la cola? (TRABAJOS_UMBRAL_BYTES; None = nunca)"""
+    umbral = getattr(settings, "TRABAJOS_UMBRAL_BYTES", 1024 * 1024)
+    return umbral is not None and (size or 0) >= umbral
+
+def workers() -> int:
+    workers = getattr(settings, "TRABAJOS_WORKERS", None)
+    return max(1, (os.cpu_count() or 1) if workers is None else int(workers))
+
+def nombre_trabajador() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def encolar(tipo, **parametros) -> Trabajo:
+    """Crea un trabajo pendiente de tipo `tipo`; `parametros` deben poder guardarse como JSON."""
+    if tipo not in tareas():
+        raise ImproperlyConfigured(f"Tipo de trabajo desconocido: {tipo!r}")
+    return Trabajo.objects.create(tipo=tipo, parametros_json=json.dumps(parametros, ensure_ascii=False))
+
+def reclamar(trabajador, limite=1):
+    """
+    Toma hasta `limite` trabajos pendientes (o abandonados: en curso desde hace
+    más de TRABAJOS_MAX_DURACION segundos) y los devuelve marcados como en curso.
+    Las filas se bloquean con SELECT ... FOR UPDATE SKIP LOCKED donde la base lo
+    admite, y cada una se toma con un UPDATE condicional sobre su estado: dos
+    trabajadores nunca ejecutan el mismo trabajo (en SQLite la transacción de
+    escritura los serializa). Los abandonados que ya agotaron
+    TRABAJOS_MAX_INTENTOS pasan a fallidos en la misma transacción.
+    """
+    ahora = timezone.now()
+    max_duracion = getattr(settings, "TRABAJOS_MAX_DURACION", 3600)
+    max_intentos = getattr(settings, "TRABAJOS_MAX_INTENTOS", 3)
+    vencidos = Q(estado=Trabajo.EN_CURSO, started_at__lt=ahora - timedelta(seconds=max_duracion))
+    abandonados = vencidos & Q(intentos__lt=max_intentos)
+    tomados = []
+    with transaction.atomic():
+        Trabajo.objects.filter(vencidos, intentos__gte=max_intentos).update(
+            estado=Trabajo.FALLIDO, finished_at=ahora,
+            error=f"Abandonado: sin terminar tras {max_intentos} intentos de {max_duracion} s como máximo")
+        candidatos = list(
+            Trabajo.objects.select_for_update(skip_locked=True)
+            .filter(Q(estado=Trabajo.PENDIENTE) | abandonados)
+            .order_by("created_at", "id")
+            .values_list("id", "estado", "started_at")[:limite]
+        )
+        for tid, estado, started_at in candidatos:
+            if Trabajo.objects.filter(id=tid, estado=estado, started_at=started_at).update(
+                    estado=Trabajo.EN_CURSO, trabajador=trabajador, started_at=ahora,
+                    finished_at=None, intentos=F("intentos") + 1):
+                tomados.append(tid)
+    return list(Trabajo.objects.filter(id__in=tomados).order_by("created_at", "id"))
+
+def ejecutar(tipo, parametros_json):
+    """Se ejecuta en el proceso del pool: corre la tarea y devuelve su resultado en JSON."""
+    resultado = get_tarea(tipo)(**json.loads(parametros_json or "{}"))
+    return json.dumps(resultado, ensure_ascii=False)
+
+def terminar(trabajo, resultado_json=None, error=None) -> bool:
+    """
+    Guarda el resultado (o el error) del intento `trabajo`, con un UPDATE
+    condicional como en reclamar: sólo si el trabajo sigue en curso con el mismo
+    trabajador y started_at. Si otro trabajador lo reclamó después (se pasó de
+    TRABAJOS_MAX_DURACION) o ya terminó, el resultado viejo se descarta y
+    devuelve False.
+    """
+    estado = Trabajo.FALLIDO if error else Trabajo.TERMINADO
+    finished_at = timezone.now()
+    guardado = Trabajo.objects.filter(
+        id=trabajo.id, trabajador=trabajo.trabajador, started_at=trabajo.started_at, estado=Trabajo.EN_CURSO,
+    ).update(estado=estado, resultado_json=resultado_json or "", error=error or "", finished_at=finished_at)
+    if guardado:
+        trabajo.estado, trabajo.finished_at = estado, finished_at
+        trabajo.resultado_json, trabajo.error = resultado_json or "", error or ""
+    return bool(guardado)
+
+def executor(max_workers=None):
+    """
+    Pool de procesos del trabajador. Se usa "spawn": cada proceso abre sus propias
+    conexiones a la base de datos en lugar de heredar las del padre.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers or workers(),
+                               mp_context=multiprocessing.get_context("spawn"),
+                               initializer=django.setup)
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+from trabajos import cola
+
+class Command(BaseCommand):
+    help = "Reclama los trabajos pendientes de la cola (trabajos.Trabajo) y los ejecuta en un pool de procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Procesos del pool (por defecto settings.TRABAJOS_WORKERS o uno por CPU).")
+        parser.add_argument("--intervalo", type=float, default=1.0,
+                            help="Segundos entre consultas a la cola cuando no hay trabajos.")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Termina cuando la cola queda vacía en lugar de seguir esperando.")
+
+    def handle(self, *args, **options):
+        workers = options.get("workers") or cola.workers()
+        intervalo = options["intervalo"]
+        nombre = cola.nombre_trabajador()
+        en_curso = {}
+        hechos = fallidos = 0
+        self.stdout.write(f"Trabajador {nombre} con {workers} procesos")
+
+        def recoger(futuros):
+            nonlocal hechos, fallidos
+            for fut in futuros:
+                trabajo = en_curso.pop(fut)
+                try:
+                    resultado_json = fut.result()
+                except Exception as ex:
+                    if cola.terminar(trabajo, error=f"{type(ex).__name__}: {ex}"):
+                        fallidos += 1
+                        self.stdout.write(self.style.WARNING(f"Trabajo {trabajo.id} ({trabajo.tipo}) falló: {ex}"))
+                    else:
+                        self.descartado(trabajo)
+                    continue
+                if cola.terminar(trabajo, resultado_json=resultado_json):
+                    hechos += 1
+                    self.stdout.write(self.style.SUCCESS(f"Trabajo {trabajo.id} ({trabajo.tipo}) terminado"))
+                else:
+                    self.descartado(trabajo)
+
+        with cola.executor(workers) as pool:
+            try:
+                while True:
+                    nuevos = []
+                    if len(en_curso) < workers:
+                        try:
+                            nuevos = cola.reclamar(nombre, workers - len(en_curso))
+                        except OperationalError:
+                            # base de datos ocupada por otro trabajador: se reintenta en la siguiente vuelta
+                            pass
+                    for trabajo in nuevos:
+                        en_curso[pool.submit(cola.ejecutar, trabajo.tipo, trabajo.parametros_json)] = trabajo
+                    if not en_curso:
+                        if options["una_vez"]:
+                            break
+                        time.sleep(intervalo)
+                        continue
+                    listos, _ = wait(en_curso, timeout=intervalo, return_when=FIRST_COMPLETED)
+                    recoger(listos)
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING("Interrumpido: esperando a los trabajos en curso..."))
+                recoger(wait(en_curso).done)
+        self.stdout.write(self.style.SUCCESS(f"Listo. Terminados: {hechos}. Fallidos: {fallidos}"))
+
+    def descartado(self, trabajo):
+        self.stdout.write(self.style.WARNING(
+            f"Trabajo {trabajo.id} ({trabajo.tipo}): resultado descartado, otro trabajador lo reclamó o ya terminó"))
@@ -0,0 +1,19 @@
+from django.db import models
+class Trabajo(models.Model):
+    """Análisis pendiente en la cola local: lo reclama y ejecuta `manage.py procesar_trabajos`."""
+    PENDIENTE, EN_CURSO, TERMINADO, FALLIDO = "pendiente", "en_curso", "terminado", "fallido"
+    ESTADOS = [(PENDIENTE, "Pendiente"), (EN_CURSO, "En curso"), (TERMINADO, "Terminado"), (FALLIDO, "Fallido")]
+    tipo = models.CharField(max_length=64)
+    estado = models.CharField(max_length=16, choices=ESTADOS, default=PENDIENTE)
+    parametros_json = models.TextField(default="{}")
+    resultado_json = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    trabajador = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    class Meta:
+        indexes = [models.Index(fields=["estado", "created_at"])]
+    def __str__(self):
+        return f"Trabajo {self.id} {self.tipo} ({self.estado})"
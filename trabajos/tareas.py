@@ -0,0 +1,27 @@
+from lenguaje_natural.indices import ingest_document
+from patrones_sintacticos.models import DocumentoPatrones
+from patrones_sintacticos.views import analizar, decodificar, guardar_analisis
+
+# Tareas de la cola (trabajos.cola.TAREAS): reciben los parámetros del trabajo
+# y devuelven un dict serializable a JSON, que se guarda como su resultado.
+
+def ingestar_lenguaje(nombre, path):
+    """Registra el archivo subido a /lenguaje/ como DocumentoLN y precalcula sus índices."""
+    doc = ingest_document(nombre, path)
+    return {"documento": doc.id, "nombre": nombre, "sha256": doc.sha256, "tokens_preview": doc.tokens_preview}
+
+def analizar_patrones(documento):
+    """Análisis léxico y sintáctico de un DocumentoPatrones ya guardado."""
+    doc = DocumentoPatrones.objects.get(id=documento)
+    with doc.archivo.open("rb") as fh:
+        raw = fh.read()
+    tokens, counts, parse_tree_lines, parse_error, tsv = analizar(decodificar(raw))
+    guardar_analisis(doc, counts, tsv)
+    return {
+        "documento": doc.id,
+        "counts": counts,
+        "num_tokens": len(tokens),
+        "parse_tree": parse_tree_lines,
+        "parse_error": parse_error,
+        "download_url": doc.archivo_transformado.url if doc.archivo_transformado else None,
+    }
@@ -0,0 +1,156 @@
+import json, unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from trabajos import cola
+from trabajos.models import Trabajo
+
+# Tareas de prueba (TRABAJOS_TAREAS las registra por su ruta)
+def tarea_eco(**parametros):
+    return {"eco": parametros}
+
+def tarea_falla(**parametros):
+    raise ValueError("archivo ilegible")
+
+TAREAS_PRUEBA = {
+    "prueba.eco": "trabajos.tests.test_cola.tarea_eco",
+    "prueba.falla": "trabajos.tests.test_cola.tarea_falla",
+}
+
+
+class Instantanea:
+    """Candidatos ya leídos por un trabajador antes de que otro tome alguno (carrera entre SELECT y UPDATE)."""
+    def __init__(self, filas):
+        self.filas = filas
+    def filter(self, *args, **kwargs):
+        return self
+    def order_by(self, *campos):
+        return self
+    def values_list(self, *campos):
+        return self
+    def __getitem__(self, item):
+        return self.filas[item]
+
+
+@override_settings(TRABAJOS_TAREAS=TAREAS_PRUEBA, TRABAJOS_MAX_DURACION=60, TRABAJOS_MAX_INTENTOS=3)
+class ReclamarTests(TestCase):
+    def abandonar(self, trabajo, intentos=1, hace=timedelta(minutes=5)):
+        Trabajo.objects.filter(id=trabajo.id).update(
+            estado=Trabajo.EN_CURSO, trabajador="caido:1", intentos=intentos, started_at=timezone.now() - hace)
+
+    def test_encolar_tipo_desconocido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cola.encolar("no.existe")
+        self.assertFalse(Trabajo.objects.exists())
+
+    def test_reclama_pendientes_en_orden_y_con_limite(self):
+        primero, segundo, tercero = (cola.encolar("prueba.eco", i=i) for i in range(3))
+        tomados = cola.reclamar("w:1", limite=2)
+        self.assertEqual([t.id for t in tomados], [primero.id, segundo.id])
+        for t in tomados:
+            self.assertEqual((t.estado, t.trabajador, t.intentos), (Trabajo.EN_CURSO, "w:1", 1))
+            self.assertIsNotNone(t.started_at)
+        # los ya tomados no se vuelven a entregar
+        self.assertEqual([t.id for t in cola.reclamar("w:2", limite=5)], [tercero.id])
+        self.assertEqual(cola.reclamar("w:3"), [])
+
+    def test_pide_skip_locked_y_no_toma_lo_que_otro_ya_reclamo(self):
+        primero, segundo = cola.encolar("prueba.eco"), cola.encolar("prueba.eco")
+        vistos = list(Trabajo.objects.order_by("id").values_list("id", "estado", "started_at"))
+        cola.reclamar("otro:1", limite=1)
+        with mock.patch.object(Trabajo.objects, "select_for_update", return_value=Instantanea(vistos)) as sfu:
+            tomados = cola.reclamar("w:1", limite=2)
+        sfu.assert_called_once_with(skip_locked=True)
+        self.assertEqual([t.id for t in tomados], [segundo.id])
+        self.assertEqual(Trabajo.objects.get(id=primero.id).trabajador, "otro:1")
+
+    def test_reclama_abandonados(self):
+        trabajo = cola.encolar("prueba.eco")
+        self.abandonar(trabajo)
+        tomados = cola.reclamar("w:1")
+        self.assertEqual([t.id for t in tomados], [trabajo.id])
+        self.assertEqual((tomados[0].trabajador, tomados[0].intentos), ("w:1", 2))
+        self.assertGreater(tomados[0].started_at, timezone.now() - timedelta(minutes=1))
+
+    def test_no_reclama_en_curso_reciente(self):
+        trabajo = cola.encolar("prueba.eco")
+        self.abandonar(trabajo, hace=timedelta(seconds=10))
+        self.assertEqual(cola.reclamar("w:1"), [])
+
+    def test_respeta_max_intentos(self):
+        agotado, reintentable = cola.encolar("prueba.eco"), cola.encolar("prueba.eco")
+        self.abandonar(agotado, intentos=3)
+        self.abandonar(reintentable, intentos=2)
+        self.assertEqual([t.id for t in cola.reclamar("w:1", limite=5)], [reintentable.id])
+        self.assertEqual(Trabajo.objects.get(id=reintentable.id).intentos, 3)
+        self.abandonar(reintentable, intentos=3)
+        self.assertEqual(cola.reclamar("w:1", limite=5), [])
+
+    def test_abandonados_agotados_pasan_a_fallidos(self):
+        agotado, reciente = cola.encolar("prueba.eco"), cola.encolar("prueba.eco")
+        self.abandonar(agotado, intentos=3)
+        self.abandonar(reciente, intentos=3, hace=timedelta(seconds=10))
+        self.assertEqual(cola.reclamar("w:1", limite=5), [])
+        agotado.refresh_from_db(); reciente.refresh_from_db()
+        self.assertEqual(agotado.estado, Trabajo.FALLIDO)
+        self.assertIn("3 intentos", agotado.error)
+        self.assertIsNotNone(agotado.finished_at)
+        # el último intento todavía puede terminar
+        self.assertEqual(reciente.estado, Trabajo.EN_CURSO)
+
+
+@override_settings(TRABAJOS_TAREAS=TAREAS_PRUEBA)
+class EjecucionTests(TestCase):
+    def test_ejecutar_devuelve_json(self):
+        self.assertEqual(json.loads(cola.ejecutar("prueba.eco", '{"a": 1}')), {"eco": {"a": 1}})
+        with self.assertRaises(ImproperlyConfigured):
+            cola.ejecutar("no.existe", "{}")
+
+    def test_terminar_guarda_resultado_o_error(self):
+        cola.encolar("prueba.eco"), cola.encolar("prueba.falla")
+        hecho, fallido = cola.reclamar("w:1", limite=2)
+        self.assertTrue(cola.terminar(hecho, resultado_json='{"ok": true}'))
+        self.assertTrue(cola.terminar(fallido, error="ValueError: archivo ilegible"))
+        hecho.refresh_from_db(); fallido.refresh_from_db()
+        self.assertEqual((hecho.estado, hecho.resultado_json, hecho.error), (Trabajo.TERMINADO, '{"ok": true}', ""))
+        self.assertEqual((fallido.estado, fallido.resultado_json), (Trabajo.FALLIDO, ""))
+        self.assertEqual(fallido.error, "ValueError: archivo ilegible")
+        self.assertIsNotNone(hecho.finished_at)
+        self.assertIsNotNone(fallido.finished_at)
+
+    @override_settings(TRABAJOS_MAX_DURACION=60)
+    def test_terminar_descarta_intentos_viejos(self):
+        cola.encolar("prueba.eco")
+        viejo, = cola.reclamar("w:1")
+        Trabajo.objects.filter(id=viejo.id).update(started_at=timezone.now() - timedelta(minutes=5))
+        viejo.refresh_from_db()
+        nuevo, = cola.reclamar("w:2")
+        # el primer trabajador termina tarde: su resultado no pisa el intento en curso
+        self.assertFalse(cola.terminar(viejo, resultado_json='{"viejo": true}'))
+        self.assertEqual(Trabajo.objects.get(id=nuevo.id).estado, Trabajo.EN_CURSO)
+        self.assertTrue(cola.terminar(nuevo, resultado_json='{"nuevo": true}'))
+        self.assertFalse(cola.terminar(nuevo, error="repetido"))
+        nuevo.refresh_from_db()
+        self.assertEqual((nuevo.estado, nuevo.resultado_json, nuevo.error), (Trabajo.TERMINADO, '{"nuevo": true}', ""))
+
+    def test_procesar_trabajos_registra_resultados_y_fallos(self):
+        hecho = cola.encolar("prueba.eco", nombre="a.txt")
+        fallido = cola.encolar("prueba.falla")
+        # hilos en lugar de procesos "spawn": la base de pruebas vive en esta conexión
+        with mock.patch.object(cola, "executor", lambda workers: ThreadPoolExecutor(workers)):
+            call_command("procesar_trabajos", "--una-vez", "--workers", "2", stdout=mock.MagicMock())
+        hecho.refresh_from_db(); fallido.refresh_from_db()
+        self.assertEqual(hecho.estado, Trabajo.TERMINADO)
+        self.assertEqual(json.loads(hecho.resultado_json), {"eco": {"nombre": "a.txt"}})
+        self.assertEqual(fallido.estado, Trabajo.FALLIDO)
+        self.assertEqual(fallido.error, "ValueError: archivo ilegible")
+        self.assertEqual(fallido.intentos, 1)
@@ -0,0 +1,54 @@
+import json, unittest
+from django.apps import apps
+
+if not apps.ready:
+    raise unittest.SkipTest("Pruebas de Django: se ejecutan con `python manage.py test`")
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from trabajos import cola
+from trabajos.models import Trabajo
+
+
+@override_settings(TRABAJOS_TAREAS={"prueba.eco": "trabajos.tests.test_cola.tarea_eco"})
+class EstadoResultadoTests(TestCase):
+    def setUp(self):
+        self.trabajo = cola.encolar("prueba.eco", nombre="a.txt")
+
+    def test_estado(self):
+        r = self.client.get(reverse("trabajos:estado", args=[self.trabajo.id]))
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual((data["id"], data["tipo"], data["estado"], data["intentos"]),
+                         (self.trabajo.id, "prueba.eco", Trabajo.PENDIENTE, 0))
+        self.assertIsNone(data["started_at"])
+        self.assertEqual(data["resultado_url"], reverse("trabajos:resultado", args=[self.trabajo.id]))
+
+    def test_inexistente(self):
+        for nombre in ("trabajos:estado", "trabajos:resultado"):
+            self.assertEqual(self.client.get(reverse(nombre, args=[self.trabajo.id + 100])).status_code, 404)
+
+    def test_resultado_pendiente_y_en_curso(self):
+        url = reverse("trabajos:resultado", args=[self.trabajo.id])
+        r = self.client.get(url)
+        self.assertEqual((r.status_code, r.json()["estado"]), (202, Trabajo.PENDIENTE))
+        cola.reclamar("w:1")
+        r = self.client.get(url)
+        self.assertEqual((r.status_code, r.json()["estado"]), (202, Trabajo.EN_CURSO))
+
+    def test_resultado_terminado(self):
+        self.trabajo, = cola.reclamar("w:1")
+        cola.terminar(self.trabajo, resultado_json=json.dumps({"documento": 7, "nombre": "a.txt"}))
+        r = self.client.get(reverse("trabajos:resultado", args=[self.trabajo.id]))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {"documento": 7, "nombre": "a.txt"})
+
+    def test_resultado_fallido(self):
+        self.trabajo, = cola.reclamar("w:1")
+        cola.terminar(self.trabajo, error="ValueError: archivo ilegible")
+        r = self.client.get(reverse("trabajos:resultado", args=[self.trabajo.id]))
+        self.assertEqual(r.status_code, 500)
+        self.assertEqual((r.json()["estado"], r.json()["error"]), (Trabajo.FALLIDO, "ValueError: archivo ilegible"))
+
+    def test_solo_get(self):
+        self.assertEqual(self.client.post(reverse("trabajos:estado", args=[self.trabajo.id])).status_code, 405)
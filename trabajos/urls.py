@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = "trabajos"
+
+urlpatterns = [
+    path("<int:trabajo_id>/", views.estado, name="estado"),
+    path("<int:trabajo_id>/resultado/", views.resultado, name="resultado"),
+]
@@ -0,0 +1,44 @@
+import json
+from django.http import JsonResponse, HttpRequest
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+from .models import Trabajo
+
+def _iso(dt):
+    return dt.isoformat() if dt else None
+
+def _estado(trabajo):
+    return {
+        "id": trabajo.id,
+        "tipo": trabajo.tipo,
+        "estado": trabajo.estado,
+        "intentos": trabajo.intentos,
+        "created_at": _iso(trabajo.created_at),
+        "started_at": _iso(trabajo.started_at),
+        "finished_at": _iso(trabajo.finished_at),
+        "error": trabajo.error or None,
+        "resultado_url": reverse("trabajos:resultado", args=[trabajo.id]),
+    }
+
+@require_http_methods(["GET"])
+def estado(request: HttpRequest, trabajo_id: int) -> JsonResponse:
+    """Estado de un trabajo de la cola: pendiente, en_curso, terminado o fallido."""
+    try:
+        trabajo = Trabajo.objects.get(id=trabajo_id)
+    except Trabajo.DoesNotExist:
+        return JsonResponse({"error": "Trabajo no encontrado"}, status=404)
+    return JsonResponse(_estado(trabajo))
+
+@require_http_methods(["GET"])
+def resultado(request: HttpRequest, trabajo_id: int) -> JsonResponse:
+    """
+    Resultado (JSON) de un trabajo terminado. Mientras no termina responde 202
+    con su estado; si falló, 500 con el error.
+    """
+    try:
+        trabajo = Trabajo.objects.get(id=trabajo_id)
+    except Trabajo.DoesNotExist:
+        return JsonResponse({"error": "Trabajo no encontrado"}, status=404)
+    if trabajo.estado == Trabajo.TERMINADO:
+        return JsonResponse(json.loads(trabajo.resultado_json or "null"), safe=False)
+    return JsonResponse(_estado(trabajo), status=500 if trabajo.estado == Trabajo.FALLIDO else 202)